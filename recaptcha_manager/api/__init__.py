@@ -4,16 +4,23 @@ assert isinstance(configuration.USE_DILL, bool), "config value must be a boolean
 if configuration.USE_DILL:
     import multiprocess as multiprocessing
     import multiprocess.managers
+    import multiprocess.shared_memory
 else:
     import multiprocessing
     import multiprocessing.managers
+    import multiprocessing.shared_memory
 
-from .manager import AutoManager, ManualManager
+from .manager import AutoManager, ManualManager, ManagerServer
 from .services import AntiCaptcha, TwoCaptcha, CapMonster, BaseService
+from .router import ServiceRouter
 from .exceptions import Exhausted
 from .generators import generate_queue
+from .estimators import Estimator, EWMA, SlidingWindow
+from .controller import HorizonController
+from .forecasters import Forecaster, TimeOfDayProfile, HoltWinters
 
 
-__all__ = ['generate_queue', 'AutoManager', 'ManualManager', 'AntiCaptcha', 'TwoCaptcha', 'CapMonster', 'BaseService',
-           'Exhausted', 'multiprocessing']
+__all__ = ['generate_queue', 'AutoManager', 'ManualManager', 'ManagerServer', 'AntiCaptcha', 'TwoCaptcha', 'CapMonster',
+           'BaseService', 'ServiceRouter', 'Exhausted', 'Estimator', 'EWMA', 'SlidingWindow',
+           'HorizonController', 'Forecaster', 'TimeOfDayProfile', 'HoltWinters', 'multiprocessing']
 
@@ -0,0 +1,222 @@
+import asyncio
+import collections
+import functools
+import queue
+import threading
+import weakref
+import recaptcha_manager.api.exceptions
+
+
+def _run(func, *args):
+    """Runs a short blocking call, such as one to the manager server, in the default executor of the running loop"""
+
+    return asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+
+def _settle(future, result, error):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
+
+
+def dispatcher(manager):
+    """
+    Returns the dispatcher serving the coroutines of the running event loop which wait for answers from the manager.
+    Managers have one for each event loop they are used from
+
+    :param manager: The manager, or a proxy of it
+    :rtype: Dispatcher
+    """
+
+    loop = asyncio.get_running_loop()
+
+    # Stored in the __dict__ of the manager directly, as setting attributes of proxies sets them in the server instead
+    dispatchers = manager.__dict__.get('_dispatchers')
+    if dispatchers is None:
+        dispatchers = manager.__dict__['_dispatchers'] = weakref.WeakKeyDictionary()
+    if loop not in dispatchers:
+        dispatchers[loop] = Dispatcher(manager)
+    return dispatchers[loop]
+
+
+class _Watcher:
+    """
+    Makes the calls of a dispatcher which wait for the manager to change, and can therefore block for long, in a daemon
+    thread of its own. Unlike the threads of the default executor, it never holds up closing the event loop or exiting
+    the interpreter. The thread quits once it has been idle for a while, and is started again when needed
+    """
+
+    IDLE = 60
+
+    def __init__(self):
+        self._calls = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, func, *args):
+        """
+        Makes the call in the thread
+
+        :return: A future of the event loop for the outcome of the call
+        :rtype: asyncio.Future
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._calls.put((loop, future, func, args))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, daemon=True)
+                self._thread.start()
+        return future
+
+    def _work(self):
+        while True:
+            try:
+                loop, future, func, args = self._calls.get(timeout=self.IDLE)
+            except queue.Empty:
+                with self._lock:
+                    if self._calls.empty():
+                        self._thread = None
+                        return
+                continue
+
+            try:
+                result, error = func(*args), None
+            except Exception as e:
+                result, error = None, e
+
+            try:
+                loop.call_soon_threadsafe(_settle, future, result, error)
+            except RuntimeError:
+                # The loop was closed in the meantime, so nobody is waiting for the outcome anymore
+                pass
+
+
+class Dispatcher:
+    """
+    Serves the coroutines of an event loop which wait for answers from a manager, so that any number of them can wait
+    without holding a thread each.
+
+    Waiters are queued by key, the batch_id for ManualManager, and served in the order they arrived. A single task of
+    the event loop takes answers for them from the manager, one call at a time, until there are none left. It then
+    waits for the manager to notify a change, such as an answer being delivered or the manager being stopped, before
+    trying again. Waiting for the change is the only call which can block for long, and is made in a thread of its own.
+
+    Managers implement the calls made through the dispatcher: begin_wait(), poll_request() and end_wait(), which
+    correspond to the start of get_request(), a single check for an answer in its loop, and giving up on time out. An
+    answer taken for a coroutine which timed out while it was being taken is given back through return_request().
+
+    :meta private:
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+
+        # Futures of the coroutines waiting for an answer, along with the arguments to poll the manager with, by key
+        self._waiters = {}
+
+        self._task = None
+        self._poked = asyncio.Event()
+
+        # Version of the manager when it was last known to have changed, and the pending call waiting for the next
+        # change, if any. See BaseRequest.watch()
+        self._version = None
+        self._watch = None
+        self._watcher = _Watcher()
+
+    async def get_request(self, key, args, max_block=0):
+        """
+        Waits for an answer from the manager
+
+        :param key: Waiters with the same key wait for the same answers
+        :param tuple args: Arguments which the calls to the manager are made with
+        :param int max_block: Maximum time to wait in seconds, 0 to wait until an answer arrives
+        :rtype: dict
+        """
+
+        state = await _run(self.manager.begin_wait, *args)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, collections.deque()).append((future, state, args))
+        self._wake()
+
+        try:
+            return await asyncio.wait_for(future, max_block or None)
+        except asyncio.TimeoutError:
+            await _run(self.manager.end_wait, state, *args)
+            raise recaptcha_manager.api.exceptions.TimeOutError from None
+
+    def _wake(self):
+        """Makes sure a newly queued waiter is served, even if answers are already available"""
+
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._dispatch())
+        else:
+            self._poked.set()
+
+    async def _dispatch(self):
+        try:
+            while self._waiters:
+                self._poked.clear()
+                await self._serve()
+                if not self._waiters:
+                    break
+
+                # Sleep until the manager changes, or until another waiter is queued
+                if self._watch is None:
+                    self._watch = self._watcher.submit(self.manager.watch, self._version)
+                poked = asyncio.ensure_future(self._poked.wait())
+                await asyncio.wait({self._watch, poked}, return_when=asyncio.FIRST_COMPLETED)
+                poked.cancel()
+
+                if self._watch.done():
+                    watch, self._watch = self._watch, None
+                    self._version = watch.result()
+
+        except Exception as e:
+            # The manager could not be reached, so none of the waiters can be served
+            for waiters in self._waiters.values():
+                for future, _, _ in waiters:
+                    _settle(future, None, e)
+            self._waiters.clear()
+
+        finally:
+            self._task = None
+
+    async def _serve(self):
+        """Hands out answers to the waiters, in order, until there are none left for them"""
+
+        for key in list(self._waiters):
+            waiters = self._waiters[key]
+
+            while waiters:
+                future, state, args = waiters[0]
+                if future.done():
+                    waiters.popleft()
+                    continue
+
+                try:
+                    answer = await _run(self.manager.poll_request, state, *args)
+                except Exception as e:
+                    waiters.popleft()
+                    _settle(future, None, e)
+                    continue
+
+                if answer is None:
+                    break
+
+                waiters.popleft()
+                if not future.done():
+                    future.set_result(answer)
+                    continue
+
+                # The coroutine timed out while the answer was being taken, so it goes back to the manager for the next
+                # waiter, whether it is a coroutine of this loop or not
+                await _run(self.manager.return_request, state, answer, *args)
+
+            if not waiters:
+                del self._waiters[key]
@@ -0,0 +1,114 @@
+import time
+from ctypes import c_int, c_double
+from recaptcha_manager.api import multiprocessing
+
+
+class CircuitBreaker:
+    """
+    Stops a service from taking new requests while its solving service is failing, so that other services sharing the
+    request_queue can take them instead. Shared by all worker processes of a service.
+
+    The circuit starts closed, where requests are taken as usual. After failure_threshold failures in a row (timeouts,
+    connection errors, server errors or the service reporting it has no free workers), the circuit opens and no new
+    requests are taken. Once recovery_time seconds have passed, the circuit is half-open, and a single request is let
+    through as a probe. If the probe succeeds the circuit closes, otherwise it opens again for twice as long, up to
+    max_recovery_time seconds. A probe whose outcome is not known after recovery_time seconds, because the request
+    was cancelled before being sent for example, is given up on and another one is let through.
+
+    :meta private:
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+    STATES = ('closed', 'open', 'half-open')
+
+    def __init__(self, failure_threshold=5, recovery_time=30, max_recovery_time=300):
+        assert failure_threshold >= 1, "failure_threshold cannot be less than 1"
+        assert 0 < recovery_time <= max_recovery_time, "recovery_time must be positive and at most max_recovery_time"
+
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.max_recovery_time = max_recovery_time
+
+        self._state = multiprocessing.Value(c_int, self.CLOSED)
+        self._failures = multiprocessing.Value(c_int, 0, lock=False)
+        self._opened_at = multiprocessing.Value(c_double, 0, lock=False)
+        self._recovery = multiprocessing.Value(c_double, recovery_time, lock=False)
+
+        # Time at which the probe being waited on was let through, 0 if there is none
+        self._probed_at = multiprocessing.Value(c_double, 0, lock=False)
+
+    def _lock(self):
+        return self._state.get_lock()
+
+    @property
+    def state(self):
+        """
+        The state of the circuit: 'closed', 'open' or 'half-open'
+
+        :rtype: str
+        """
+
+        with self._lock():
+            self._check_recovery()
+            return self.STATES[self._state.value]
+
+    def _check_recovery(self):
+        if self._state.value == self.OPEN and time.time() >= self._opened_at.value + self._recovery.value:
+            self._state.value = self.HALF_OPEN
+            self._probed_at.value = 0
+
+    def _open(self):
+        self._state.value = self.OPEN
+        self._opened_at.value = time.time()
+        self._probed_at.value = 0
+
+    def admits(self):
+        """
+        Whether a new request can be taken. While half-open, only admits a single probe until release() is called or
+        its outcome is recorded
+
+        :rtype: bool
+        """
+
+        with self._lock():
+            self._check_recovery()
+            if self._state.value == self.CLOSED:
+                return True
+            if self._state.value == self.HALF_OPEN and time.time() >= self._probed_at.value + self.recovery_time:
+                self._probed_at.value = time.time()
+                return True
+            return False
+
+    def release(self):
+        """
+        Gives back the probe admitted while half-open, if no request was taken after all
+        """
+
+        with self._lock():
+            self._probed_at.value = 0
+
+    def record_success(self):
+        with self._lock():
+            self._failures.value = 0
+            if self._state.value == self.HALF_OPEN:
+                self._state.value = self.CLOSED
+                self._recovery.value = self.recovery_time
+
+    def record_failure(self):
+        """
+        Records a failure
+
+        :return: Whether this failure opened the circuit
+        :rtype: bool
+        """
+
+        with self._lock():
+            self._failures.value += 1
+            if self._state.value == self.HALF_OPEN:
+                self._recovery.value = min(self._recovery.value * 2, self.max_recovery_time)
+                self._open()
+                return True
+            if self._state.value == self.CLOSED and self._failures.value >= self.failure_threshold:
+                self._open()
+                return True
+            return False
@@ -0,0 +1,100 @@
+import time
+
+
+class HorizonController:
+    """
+    Tunes the horizon of an AutoManager, the number of seconds worth of captchas it keeps available or being solved,
+    from how long your program waits for captchas and how many of them expire before being used.
+
+    Every interval seconds, the horizon is raised if captchas were waited for longer than target_wait seconds on
+    average, since more captchas must be kept to have them ready in time. Otherwise, it is lowered if more than
+    target_expired of the captchas solved in the meantime expired, since fewer are needed than are kept. If both
+    targets are met, the horizon is still lowered slowly, so that it settles on the smallest inventory which keeps
+    waiting times within target_wait.
+
+    An instance passed to :meth:`~recaptcha_manager.api.manager.AutoManager.create` serves as a template, a copy of
+    which is made for the manager.
+
+    :param float target_wait: Longest acceptable average time to wait for a captcha, in seconds
+    :param float target_expired: Largest acceptable fraction of captchas expiring before being used
+    :param float horizon: Horizon to start with, in seconds
+    :param float min_horizon: Smallest horizon allowed
+    :param float max_horizon: Largest horizon allowed. Defaults to how long captchas stay valid
+    :param float interval: Seconds between adjustments
+    :param float gain: Fraction by which the horizon is raised or lowered at once
+    """
+
+    def __init__(self, target_wait=1, target_expired=0.05, horizon=30, min_horizon=5, max_horizon=None,
+                 interval=10, gain=0.2):
+        assert target_wait >= 0, "target_wait cannot be negative"
+        assert 0 <= target_expired < 1, "target_expired must be between 0 and 1"
+        assert 0 < min_horizon <= horizon, "horizon must be at least min_horizon, which must be positive"
+        assert max_horizon is None or horizon <= max_horizon, "horizon cannot be more than max_horizon"
+        assert interval > 0, "interval must be positive"
+        assert 0 < gain < 1, "gain must be between 0 and 1"
+
+        self.target_wait = target_wait
+        self.target_expired = target_expired
+        self.horizon = horizon
+        self.min_horizon = min_horizon
+        self.max_horizon = max_horizon
+        self.interval = interval
+        self.gain = gain
+
+        # Waits observed since the last adjustment, and the counters of the manager at the time
+        self._wait_total = 0.0
+        self._wait_count = 0
+        self._last_time = None
+        self._last_used = 0
+        self._last_expired = 0
+
+    def observe_wait(self, waited, count=1):
+        """
+        Records the time waited for captchas
+
+        :param float waited: Seconds waited
+        :param int count: Number of captchas received after waiting that long
+        """
+
+        self._wait_total += waited * count
+        self._wait_count += count
+
+    def update(self, used, expired, now=None):
+        """
+        Adjusts the horizon if interval seconds passed since the last adjustment
+
+        :param int used: Total number of captchas used so far
+        :param int expired: Total number of captchas expired so far
+        :param float now: The current time. Defaults to time.time()
+        :return: The horizon
+        :rtype: float
+        """
+
+        if now is None:
+            now = time.time()
+
+        if self._last_time is None:
+            self._last_time, self._last_used, self._last_expired = now, used, expired
+            return self.horizon
+        if now - self._last_time < self.interval:
+            return self.horizon
+
+        new_used, new_expired = used - self._last_used, expired - self._last_expired
+
+        # Nothing to learn from if no captchas were used or expired in the meantime
+        if new_used + new_expired > 0:
+            waited = self._wait_total / self._wait_count if self._wait_count else 0
+            if waited > self.target_wait:
+                self.horizon *= 1 + self.gain
+            elif new_expired / (new_used + new_expired) > self.target_expired:
+                self.horizon *= 1 - self.gain
+            else:
+                self.horizon *= 1 - self.gain / 4
+
+            self.horizon = max(self.horizon, self.min_horizon)
+            if self.max_horizon is not None:
+                self.horizon = min(self.horizon, self.max_horizon)
+
+        self._wait_total, self._wait_count = 0.0, 0
+        self._last_time, self._last_used, self._last_expired = now, used, expired
+        return self.horizon
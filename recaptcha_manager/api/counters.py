@@ -0,0 +1,221 @@
+import os
+import struct
+import threading
+from recaptcha_manager.api import multiprocessing
+
+
+def _attach(name):
+    """
+    Attaches to an existing shared memory block by name, leaving its cleanup to the process which created it.
+
+    Before Python 3.13, SharedMemory registers every block it attaches to with the resource tracker of the attaching
+    process, which frees the block when that process exits (see https://bugs.python.org/issue39959). The documented
+    workaround is to unregister it right after attaching.
+    """
+
+    try:
+        return multiprocessing.shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = multiprocessing.shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            multiprocessing.resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _pid_alive(pid):
+    """Checks whether a process with the given pid is still running. Errs on the side of reporting it alive"""
+
+    if os.name == 'posix':
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+
+    import ctypes
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+    if not handle:
+        return False
+    try:
+        code = ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return True
+        return code.value == 259  # STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+class SharedCounters:
+    """
+    Block of integer counters stored in shared memory, which can be read and updated from any process without going
+    through a manager server.
+
+    The block is split into rows, and every process that wants to update the counters writes only to its own row.
+    The value of a counter is the sum of that counter over all rows. Since each row has a single writer, updates are
+    atomic without needing a lock shared between processes. Rows are handed out by the process which created the
+    block, so a process only needs to ask for a row once, and only if it intends to write.
+
+    At most MAX_WRITERS processes can hold a row at once. When rows run out, the rows of processes which have exited
+    are folded into the row of the creating process and handed out again.
+
+    :meta private:
+    """
+
+    FIELDS = ('ReqsInQueue', 'ReqsInUnsolvedList', 'ReqsSolved', 'ReqsUsed', 'expired', 'stop_new_requests',
+              'finished')
+    MAX_WRITERS = 1024
+    _ITEM = struct.calcsize('q')
+
+    # Blocks already attached by this process, so that every proxy received does not attach again
+    _attached = {}
+    _attached_lock = threading.Lock()
+
+    def __init__(self, shm, claim=None, owner=False):
+        self._shm = shm
+        self._claim = claim
+        self._owner = owner
+        self._pid = os.getpid()
+        self._row = None
+        self._lock = threading.Lock()
+        self._row_size = len(self.FIELDS)
+        self._row_format = '{}q'.format(self._row_size)
+        self._index = {field: i for i, field in enumerate(self.FIELDS)}
+
+        # Only used by the owner, to know which process holds which row and which rows can be handed out again
+        self._row_pids = {}
+        self._free_rows = []
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @classmethod
+    def create(cls):
+        """
+        Creates a new counter block. The creating process is responsible for handing out rows to other processes
+        through :meth:`claim_row`
+        """
+
+        size = cls._ITEM * (1 + cls.MAX_WRITERS * len(cls.FIELDS))
+        shm = multiprocessing.shared_memory.SharedMemory(create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        inst = cls(shm, owner=True)
+        inst._row = inst.claim_row()
+        return inst
+
+    @classmethod
+    def attach(cls, name, claim):
+        """
+        Attaches to an existing counter block, reusing the attachment if this process already has one.
+
+        :param str name: Name of the shared memory block
+        :param callable claim: Called with the pid of this process the first time it updates a counter. Should return
+                               the index of a row reserved for it
+        """
+
+        key = (os.getpid(), name)
+        with cls._attached_lock:
+            inst = cls._attached.get(key)
+            if inst is None:
+                inst = cls(_attach(name), claim=claim)
+                cls._attached[key] = inst
+        return inst
+
+    def claim_row(self, pid=None):
+        """
+        Reserves a row for a process. Can only be called in the process that created the block.
+
+        :param int pid: The process the row is reserved for. Defaults to the calling process
+        :rtype: int
+        """
+
+        if not self._owner:
+            raise RuntimeError("Rows can only be handed out by the process which created the counters")
+
+        with self._lock:
+            if not self._free_rows:
+                self._reclaim_rows()
+
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = struct.unpack_from('q', self._shm.buf, 0)[0]
+                if row >= self.MAX_WRITERS:
+                    raise RuntimeError("Too many processes are updating these counters at once (maximum {})"
+                                       .format(self.MAX_WRITERS))
+                struct.pack_into('q', self._shm.buf, 0, row + 1)
+
+            self._row_pids[row] = os.getpid() if pid is None else pid
+        return row
+
+    def _reclaim_rows(self):
+        """
+        Folds the rows of processes which have exited into the row of this process, and marks them free
+        """
+
+        for row, pid in list(self._row_pids.items()):
+            if row == self._row or _pid_alive(pid):
+                continue
+
+            dead = struct.unpack_from(self._row_format, self._shm.buf, self._offset(row))
+            own = struct.unpack_from(self._row_format, self._shm.buf, self._offset(self._row))
+            struct.pack_into(self._row_format, self._shm.buf, self._offset(self._row),
+                             *[a + b for a, b in zip(own, dead)])
+            struct.pack_into(self._row_format, self._shm.buf, self._offset(row), *([0] * self._row_size))
+
+            del self._row_pids[row]
+            self._free_rows.append(row)
+
+    def _offset(self, row):
+        return self._ITEM * (1 + row * self._row_size)
+
+    def add(self, **deltas):
+        """
+        Adds the provided values to the counters, using the row owned by this process
+        """
+
+        with self._lock:
+
+            # A forked child inherits the row of its parent, and must get one of its own before writing
+            if self._pid != os.getpid():
+                if self._owner:
+                    raise RuntimeError("Counters cannot be updated from a forked child of the process which created "
+                                       "them")
+                self._pid = os.getpid()
+                self._row = None
+
+            if self._row is None:
+                self._row = self._claim(self._pid)
+
+            offset = self._offset(self._row)
+            row = list(struct.unpack_from(self._row_format, self._shm.buf, offset))
+            for field, delta in deltas.items():
+                row[self._index[field]] += delta
+            struct.pack_into(self._row_format, self._shm.buf, offset, *row)
+
+    def get(self, field):
+        """
+        Returns the current value of a counter
+
+        :rtype: int
+        """
+
+        rows = struct.unpack_from('q', self._shm.buf, 0)[0]
+        values = struct.unpack_from('{}q'.format(rows * self._row_size), self._shm.buf, self._offset(0))
+        return sum(values[self._index[field]::self._row_size])
+
+    def unlink(self):
+        """
+        Frees the block. Only the creating process should call this, once the counters are no longer needed
+        """
+
+        # Processes attaching to the block may have removed it from the resource tracker this process shares with
+        # them (see _attach), which unlink() expects it to be registered with
+        if os.name == 'posix':
+            multiprocessing.resource_tracker.register(self._shm._name, 'shared_memory')
+
+        self._shm.close()
+        self._shm.unlink()
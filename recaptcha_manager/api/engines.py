@@ -0,0 +1,116 @@
+import asyncio
+import json as _json
+import threading
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncResponse:
+    """
+    Response returned by AsyncSession. Provides the parts of requests.Response which the response hooks of services
+    use.
+
+    :meta private:
+    """
+
+    def __init__(self, url, status_code, content):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return _json.loads(self.content)
+
+
+class AsyncSession:
+    """
+    Drop-in replacement for the FuturesSession used by services, which sends every request on a single asyncio event
+    loop instead of a pool of threads. This lets a service keep thousands of requests in flight at once.
+
+    The event loop runs in a background thread of the service process. post() can be called from any thread, and
+    returns a concurrent.futures.Future which resolves to the response after the response hooks have run on it, just
+    like the futures returned by FuturesSession. Connection errors and timeouts are raised as the corresponding
+    requests exceptions, so that exc_handler sees the same exceptions with either session.
+
+    Requires aiohttp to be installed.
+
+    :meta private:
+    """
+
+    def __init__(self, limit=0, retry=None):
+        """
+        :param int limit: Maximum number of simultaneous connections. 0 means no limit
+        :param urllib3.util.Retry retry: Number of retries (retry.total) and the backoff between them
+                                         (retry.backoff_factor) for requests that fail to connect or time out
+        """
+
+        if aiohttp is None:
+            raise ImportError("aiohttp is required to use the asyncio engine. Install it using "
+                              "'pip install recaptcha-manager[asyncio]'")
+
+        self.retry = retry
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._session = asyncio.run_coroutine_threadsafe(self._create_session(limit), self._loop).result()
+
+    async def _create_session(self, limit):
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=limit))
+
+    def post(self, url, json=None, data=None, verify=True, timeout=None, hooks=None):
+        """
+        Sends a POST request
+
+        :returns: Future which resolves to an AsyncResponse
+        :rtype: concurrent.futures.Future
+        """
+
+        return asyncio.run_coroutine_threadsafe(self._post(url, json, data, verify, timeout, hooks or {}), self._loop)
+
+    async def _post(self, url, json, data, verify, timeout, hooks):
+
+        retries = 0
+        if self.retry is not None and self.retry.total:
+            retries = self.retry.total
+
+        for attempt in range(retries + 1):
+            try:
+                async with self._session.post(url, json=json, data=data, ssl=None if verify else False,
+                                              timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                    response = AsyncResponse(str(r.url), r.status, await r.read())
+                break
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt < retries:
+                    await asyncio.sleep((self.retry.backoff_factor or 0) * (2 ** attempt))
+                    continue
+                if isinstance(e, asyncio.TimeoutError):
+                    raise requests.exceptions.Timeout(e) from e
+                raise requests.exceptions.ConnectionError(e) from e
+
+        # Hooks may return a replacement for the response, like they can with requests
+        response_hooks = hooks.get('response', [])
+        if callable(response_hooks):
+            response_hooks = [response_hooks]
+        for hook in response_hooks:
+            response = hook(response) or response
+
+        return response
+
+    def close(self):
+        """
+        Closes the session and stops the event loop
+        """
+
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
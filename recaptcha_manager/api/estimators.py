@@ -0,0 +1,211 @@
+import collections
+import math
+import time
+
+
+class Estimator:
+    """
+    Base class for estimators, which keep a running estimate of the mean and variance of the statistics AutoManager
+    predicts with: how long captchas take to be solved, how long your program waits for them, and how frequently it
+    uses them.
+
+    An estimator passed to :meth:`~recaptcha_manager.api.manager.AutoManager.create` serves as a template, a copy of
+    which is made for each statistic.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value, weight=1, now=None):
+        """
+        Records a sample
+
+        :param float value: The sample
+        :param float weight: How many samples of this value to record at once
+        :param float now: Time the sample was taken at. Defaults to the current time
+        """
+
+        raise NotImplementedError
+
+    @property
+    def mean(self):
+        """
+        The estimated mean, 0 if no samples were recorded yet
+
+        :rtype: float
+        """
+
+        raise NotImplementedError
+
+    @property
+    def variance(self):
+        """
+        The estimated variance, 0 if no samples were recorded yet
+
+        :rtype: float
+        """
+
+        raise NotImplementedError
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.variance, 0))
+
+
+class EWMA(Estimator):
+    """
+    Exponentially time-decayed mean and variance. The weight of a sample halves every half_life seconds, regardless of
+    how many samples were recorded since, so that the estimate follows changes within about half_life seconds however
+    frequent samples are.
+
+    :param float half_life: Seconds after which a sample counts half as much as a new one
+    """
+
+    def __init__(self, half_life=30):
+        super().__init__()
+        assert half_life > 0, "half_life must be positive"
+        self.half_life = half_life
+        self._weight = 0.0
+        self._mean = 0.0
+        self._variance = 0.0
+        self._last = None
+
+    def add(self, value, weight=1, now=None):
+        if now is None:
+            now = time.time()
+
+        # Decay the weight of the samples so far by the time passed since the last one
+        if self._last is not None:
+            self._weight *= 0.5 ** (max(now - self._last, 0) / self.half_life)
+        self._last = now
+
+        # Weighted incremental update of the mean and variance
+        self._weight += weight
+        alpha = weight / self._weight
+        diff = value - self._mean
+        self._mean += alpha * diff
+        self._variance = (1 - alpha) * (self._variance + alpha * diff * diff)
+        self.count += weight
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def variance(self):
+        return self._variance
+
+
+class SlidingWindow(Estimator):
+    """
+    Mean and variance of the most recent samples only
+
+    :param int size: Number of samples kept. Samples recorded with a weight count once
+    """
+
+    def __init__(self, size=20):
+        super().__init__()
+        assert size >= 1, "size cannot be less than 1"
+        self.size = size
+        self._samples = collections.deque(maxlen=size)
+
+    def add(self, value, weight=1, now=None):
+        self._samples.append((value, weight))
+        self.count += weight
+
+    @property
+    def mean(self):
+        weight = sum(w for _, w in self._samples)
+        if not weight:
+            return 0.0
+        return sum(v * w for v, w in self._samples) / weight
+
+    @property
+    def variance(self):
+        weight = sum(w for _, w in self._samples)
+        if not weight:
+            return 0.0
+        mean = self.mean
+        return sum(w * (v - mean) ** 2 for v, w in self._samples) / weight
+
+
+class P2Quantile:
+    """
+    Streaming estimate of a quantile using the P² algorithm of Jain and Chlamtac, which keeps only five markers
+    however many samples are recorded. Useful for heavy-tailed statistics, such as solve times, whose mean says little
+    about how long the slowest captchas take.
+
+    :param float p: The quantile to estimate, between 0 and 1. For instance, 0.95 for the 95th percentile
+    """
+
+    def __init__(self, p):
+        assert 0 < p < 1, "p must be between 0 and 1"
+        self.p = p
+        self.count = 0
+
+        # Heights and positions of the markers, and the positions they should be at
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+        """
+        Records a sample
+
+        :param float value: The sample
+        """
+
+        self.count += 1
+        q, n = self._heights, self._positions
+
+        # The first five samples are the initial markers
+        if self.count <= 5:
+            q.append(value)
+            q.sort()
+            return
+
+        # Find the cell the sample falls in, extending the extreme markers if needed
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= value < q[i + 1])
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Move the middle markers towards their desired positions, adjusting their heights
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self._heights, self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * ((n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                                                   (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    @property
+    def value(self):
+        """
+        The estimated quantile, 0 if no samples were recorded yet
+
+        :rtype: float
+        """
+
+        if not self._heights:
+            return 0.0
+        if self.count <= 5:
+            return self._heights[min(int(self.p * len(self._heights)), len(self._heights) - 1)]
+        return self._heights[2]
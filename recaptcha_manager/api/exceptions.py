@@ -85,3 +85,10 @@ class UnexpectedResponse(RuntimeError, Errors):
     """
     pass
 
+
+
+class ServiceUnavailableError(Errors):
+    """
+    Raised when the solving service responds with a server error (HTTP status 5xx)
+    """
+    pass
@@ -0,0 +1,196 @@
+import time
+
+
+class Forecaster:
+    """
+    Base class for forecasters, which predict how many captchas your program will use at a given time from how many it
+    used in the past, so that AutoManager can send requests ahead of a rise in demand rather than after it.
+
+    Captchas used are counted per bucket of bucket seconds. Subclasses learn from each bucket once it is over, and
+    predict the count of any bucket.
+
+    A forecaster passed to :meth:`~recaptcha_manager.api.manager.AutoManager.create` serves as a template, a copy of
+    which is made for the manager.
+
+    :param float bucket: Length of the buckets captchas used are counted per, in seconds
+    """
+
+    def __init__(self, bucket=60):
+        assert bucket > 0, "bucket must be positive"
+        self.bucket = bucket
+
+        # Bucket being counted, and the captchas used in it so far
+        self._current = None
+        self._count = 0
+
+    def observe(self, count=1, now=None):
+        """
+        Records captchas used
+
+        :param int count: Number of captchas used
+        :param float now: Time they were used at. Defaults to the current time
+        """
+
+        self._advance(now)
+        self._count += count
+
+    def forecast(self, start, end, now=None):
+        """
+        Predicts how many captchas will be used between two times
+
+        :param float start: Start of the period, as a timestamp
+        :param float end: End of the period, as a timestamp
+        :param float now: The current time. Defaults to time.time()
+        :return: The number of captchas expected to be used, or None if there is not enough history yet
+        :rtype: float
+        """
+
+        self._advance(now)
+        total = 0.0
+        for index in range(int(start // self.bucket), int(end // self.bucket) + 1):
+            overlap = min(end, (index + 1) * self.bucket) - max(start, index * self.bucket)
+            if overlap <= 0:
+                continue
+
+            count = self._predict(index)
+            if count is None:
+                return None
+            total += max(count, 0) * overlap / self.bucket
+
+        return total
+
+    def _advance(self, now):
+        """
+        Closes the buckets which are over, including those in which no captchas were used
+        """
+
+        if now is None:
+            now = time.time()
+        index = int(now // self.bucket)
+
+        if self._current is None:
+            self._current = index
+        while self._current < index:
+            self._update(self._current, self._count)
+            self._current += 1
+            self._count = 0
+
+    def _update(self, index, count):
+        """
+        Learns from a bucket which is over
+
+        :param int index: Index of the bucket, the number of buckets since the epoch
+        :param int count: Number of captchas used in it
+        """
+
+        raise NotImplementedError
+
+    def _predict(self, index):
+        """
+        Returns the number of captchas expected to be used in a bucket, or None if there is not enough history yet
+
+        :param int index: Index of the bucket
+        :rtype: float
+        """
+
+        raise NotImplementedError
+
+
+class TimeOfDayProfile(Forecaster):
+    """
+    Learns how many captchas are used in each bucket of a repeating period, such as every 5 minutes of the day, and
+    predicts that the same will be used at that time of the next period. Suits demand which follows a schedule, such
+    as drops at set times or quiet nights.
+
+    :param float bucket: Length of the buckets, in seconds. Must divide period
+    :param float period: Length of the period, in seconds. Defaults to a day
+    :param float alpha: Weight of the latest period against the ones before it, between 0 and 1
+    """
+
+    def __init__(self, bucket=300, period=86400, alpha=0.5):
+        super().__init__(bucket)
+        assert period % bucket == 0, "bucket must divide period"
+        assert 0 < alpha <= 1, "alpha must be between 0 and 1"
+        self.period = period
+        self.alpha = alpha
+
+        # Smoothed count of each bucket of the period, None until it was seen once
+        self._profile = [None] * int(period // bucket)
+
+    def _update(self, index, count):
+        slot = index % len(self._profile)
+        if self._profile[slot] is None:
+            self._profile[slot] = float(count)
+        else:
+            self._profile[slot] += self.alpha * (count - self._profile[slot])
+
+    def _predict(self, index):
+        count = self._profile[index % len(self._profile)]
+        if count is not None:
+            return count
+
+        # Times of the period not seen yet are predicted from the ones seen
+        seen = [c for c in self._profile if c is not None]
+        if not seen:
+            return None
+        return sum(seen) / len(seen)
+
+
+class HoltWinters(Forecaster):
+    """
+    Additive Holt-Winters forecasting, which follows the level and trend of demand along with its seasonal pattern,
+    such as hourly batches. Suits demand which ramps up or down over time on top of a repeating pattern.
+
+    Until a whole season was seen, the average count so far is predicted.
+
+    :param float bucket: Length of the buckets, in seconds
+    :param int season: Number of buckets in a season. For instance, 60 for an hourly pattern with 60s buckets
+    :param float alpha: Smoothing of the level, between 0 and 1
+    :param float beta: Smoothing of the trend, between 0 and 1
+    :param float gamma: Smoothing of the seasonal pattern, between 0 and 1
+    """
+
+    def __init__(self, bucket=60, season=60, alpha=0.3, beta=0.05, gamma=0.3):
+        super().__init__(bucket)
+        assert season >= 1, "season cannot be less than 1"
+        for name, value in (('alpha', alpha), ('beta', beta), ('gamma', gamma)):
+            assert 0 <= value <= 1, f"{name} must be between 0 and 1"
+        self.season = season
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+
+        self._history = []
+        self._level = None
+        self._trend = 0.0
+        self._seasonal = [0.0] * season
+        self._last = None
+
+    def _update(self, index, count):
+        self._last = index
+
+        # The first season initializes the level and seasonal pattern
+        if self._level is None:
+            self._history.append(count)
+            if len(self._history) == self.season:
+                self._level = sum(self._history) / self.season
+                first = index - self.season + 1
+                for offset, past in enumerate(self._history):
+                    self._seasonal[(first + offset) % self.season] = past - self._level
+                self._history = []
+            return
+
+        slot = index % self.season
+        level = self._level
+        self._level = self.alpha * (count - self._seasonal[slot]) + (1 - self.alpha) * (level + self._trend)
+        self._trend = self.beta * (self._level - level) + (1 - self.beta) * self._trend
+        self._seasonal[slot] = self.gamma * (count - self._level) + (1 - self.gamma) * self._seasonal[slot]
+
+    def _predict(self, index):
+        if self._level is None:
+            if not self._history:
+                return None
+            return sum(self._history) / len(self._history)
+
+        steps = max(index - self._last, 1)
+        return self._level + steps * self._trend + self._seasonal[index % self.season]
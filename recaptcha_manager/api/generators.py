@@ -1,13 +1,21 @@
+import queue
 from recaptcha_manager.api import multiprocessing
 from ctypes import c_bool
 
 
-def generate_queue(manager=None):
+def generate_queue(manager=None, in_process=False):
     """
     Generates a proxy object of class :class:`~multiprocessing.Queue`
 
+    :param manager: Manager to host the queue in, such as a ManagerServer. A new one is started if None (default)
+    :param bool in_process: Whether to generate a regular :class:`~queue.Queue` instead, for using managers and
+                            services within a single process. Managers created with such a queue are regular objects
+                            rather than proxies, and services and routers using it run in threads rather than
+                            processes
     :rtype: multiprocessing.Queue
     """
+    if in_process:
+        return queue.Queue()
     if manager is None:
         manager = multiprocessing.Manager()
     return manager.Queue()
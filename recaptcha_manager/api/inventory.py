@@ -0,0 +1,189 @@
+import collections
+import heapq
+import itertools
+import os
+import queue
+import threading
+import time
+import weakref
+from recaptcha_manager.api import multiprocessing
+
+
+class Inventory:
+    """
+    Solved captchas waiting to be used, ordered by the time they were solved so that the oldest, which expire first,
+    are handed out first. Captchas expire ttl seconds after being solved, after which they are never handed out and no
+    longer counted by qsize(). Anything else put in it, such as errors, is handed out before captchas, in the order it
+    was put.
+
+    Has the same interface as :class:`~queue.Queue`, so that it can be used as the response_queue of managers.
+
+    :meta private:
+    """
+
+    def __init__(self, ttl=120):
+        assert ttl > 0, "ttl must be positive"
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+
+        # Heap of (expiry time, order of arrival, captcha) and everything else, in order of arrival
+        self._captchas = []
+        self._others = collections.deque()
+        self._order = itertools.count()
+
+        # Captchas dropped because they expired, until they are collected through evict()
+        self._expired = []
+
+    @staticmethod
+    def _is_captcha(item):
+        return isinstance(item, dict) and item.get('error') is None and item.get('timeSolved') is not None
+
+    def _drop_expired(self):
+        now = time.time()
+        while self._captchas and self._captchas[0][0] <= now:
+            self._expired.append(heapq.heappop(self._captchas)[2])
+
+    def put(self, item, block=True, timeout=None):
+        with self._lock:
+            if self._is_captcha(item):
+                heapq.heappush(self._captchas, (item['timeSolved'] + self.ttl, next(self._order), item))
+            else:
+                self._others.append(item)
+            self._not_empty.notify()
+
+    def put_nowait(self, item):
+        self.put(item, block=False)
+
+    def get(self, block=True, timeout=None):
+        """
+        Removes and returns the next item, skipping expired captchas
+
+        :raises queue.Empty: If there is none
+        """
+
+        with self._lock:
+            end = None if timeout is None else time.time() + timeout
+            while True:
+                self._drop_expired()
+                if self._others:
+                    return self._others.popleft()
+                if self._captchas:
+                    return heapq.heappop(self._captchas)[2]
+
+                if not block or (end is not None and time.time() >= end):
+                    raise queue.Empty
+
+                self._not_empty.wait(None if end is None else end - time.time())
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def peek(self):
+        """
+        Returns the next item without removing it, or None if there is none
+        """
+
+        with self._lock:
+            self._drop_expired()
+            if self._others:
+                return self._others[0]
+            if self._captchas:
+                return self._captchas[0][2]
+            return None
+
+    def qsize(self):
+        """
+        Returns the number of items, not counting expired captchas
+
+        :rtype: int
+        """
+
+        with self._lock:
+            self._drop_expired()
+            return len(self._others) + len(self._captchas)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def evict(self):
+        """
+        Drops the captchas which have expired
+
+        :return: The captchas dropped since the last call, including the ones skipped by get()
+        :rtype: list
+        """
+
+        with self._lock:
+            self._drop_expired()
+            expired, self._expired = self._expired, []
+            return expired
+
+
+class InventoryManager(multiprocessing.managers.BaseManager):
+    """
+    Hosts the inventories of managers which are not hosted by a ManagerServer, in a process of their own
+
+    :meta private:
+    """
+
+    pass
+
+
+InventoryManager.register('Inventory', Inventory)
+
+
+class Reaper:
+    """
+    Drops the captchas which expired before being used from the managers of a process every INTERVAL seconds, so that
+    they are no longer counted as available. A single daemon thread serves all managers of a process
+
+    :meta private:
+    """
+
+    INTERVAL = 5
+
+    _lock = threading.Lock()
+    _managers = weakref.WeakSet()
+    _thread = None
+    _pid = None
+
+    @classmethod
+    def add(cls, manager):
+        """
+        Starts evicting expired captchas of the manager
+
+        :param BaseRequest manager: The manager. Must live in this process
+        """
+
+        with cls._lock:
+
+            # Threads do not survive forking, so children start their own
+            if cls._pid != os.getpid():
+                cls._managers = weakref.WeakSet()
+                cls._thread = None
+                cls._pid = os.getpid()
+
+            cls._managers.add(manager)
+            if cls._thread is None:
+                cls._thread = threading.Thread(target=cls._run, name='recaptcha-manager-reaper', daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            time.sleep(cls.INTERVAL)
+            cls._sweep()
+
+    @classmethod
+    def _sweep(cls):
+        # The managers are only referred to while being swept, so that they can still be garbage collected
+        with cls._lock:
+            managers = list(cls._managers)
+
+        for manager in managers:
+            try:
+                manager._evict()
+            except Exception:
+                # The manager is being shut down, along with the process hosting its inventory
+                pass
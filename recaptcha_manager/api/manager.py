@@ -1,13 +1,26 @@
 import traceback
 import time
+import asyncio
+import functools
 import queue
 import hashlib
+import os
+import threading
 import recaptcha_manager.api.exceptions
 from recaptcha_manager.api.exceptions import InvalidBatchID, RestoreError, BadDomainError
 from recaptcha_manager.api.generators import make_proxy
+from recaptcha_manager.api.counters import SharedCounters
 from recaptcha_manager.api import multiprocessing
+from recaptcha_manager.api import aio
+from recaptcha_manager.api.inventory import Inventory, InventoryManager, Reaper
+from recaptcha_manager.api.estimators import Estimator, EWMA, P2Quantile
+from recaptcha_manager.api.controller import HorizonController
+from recaptcha_manager.api.forecasters import Forecaster
+from recaptcha_manager.api.scheduler import SolveTimeModel
 import copy
+import math
 import re
+import statistics
 
 
 def ensure_lock(func):
@@ -30,6 +43,116 @@ def ensure_lock(func):
     return wrapper
 
 
+def _counter(field):
+    """Creates a read-only attribute whose value is stored in the shared counters of the manager"""
+
+    return property(lambda self: self.counters.get(field))
+
+
+def _flag(field):
+    """Creates an attribute for a flag stored in the shared counters of the manager. Flags can only be set, not unset"""
+
+    def getter(self):
+        return self.counters.get(field) > 0
+
+    def setter(self, value):
+        if value is not True:
+            raise ValueError("{} cannot be unset once it has been set".format(field))
+        if not getter(self):
+            self.counters.add(**{field: 1})
+
+    return property(getter, setter)
+
+
+# Proxy types of the managers, by the name managers are registered under with their server. Used by services to set up
+# proxies of the managers that requests were sent by
+PROXY_TYPES = {}
+
+# Whether this process is the server of a ManagerServer
+_POOLED = False
+
+
+def _mark_pooled():
+    global _POOLED
+    _POOLED = True
+
+
+class _PooledManager(multiprocessing.managers.BaseManager):
+    """
+    The manager behind a ManagerServer. Every manager class is registered with it as soon as it is defined
+
+    :meta private:
+    """
+
+    pass
+
+
+_PooledManager.register('Queue', queue.Queue)
+
+
+class ManagerServer:
+    """
+    A single server process which can host any number of managers, along with their queues. By default, every
+    manager starts a server process of its own, and another one for its response queue. When many managers are used,
+    hosting them all in a ManagerServer instead saves starting two processes for each of them, and creating a manager
+    only takes a single call to the server.
+
+    Example::
+
+        server = ManagerServer.create()
+        request_queue = generate_queue(server)
+        manager = AutoManager.create(request_queue, url, sitekey, 'v2', server=server)
+
+    .. note::
+        Only manager classes defined before the server was created can be hosted by it. The response_queue of hosted
+        managers can only be used from within the server, through the methods of the manager
+    """
+
+    def __init__(self, proxy_ini=False):
+
+        if not proxy_ini: raise RuntimeError("Manager servers should be created using the create() method")
+
+        self._manager = _PooledManager()
+        self._manager.start(initializer=_mark_pooled)
+
+    @classmethod
+    def create(cls):
+        """
+        Starts the server process.
+
+        :rtype: ManagerServer
+        """
+
+        return cls(proxy_ini=True)
+
+    def Queue(self):
+        """
+        Creates a queue hosted by the server. Allows the server to be passed to :func:`generate_queue()`
+
+        :rtype: multiprocessing.Queue
+        """
+
+        return self._manager.Queue()
+
+    def host(self, typeid, *args, **kwargs):
+        """
+        Creates a manager in the server
+
+        :param str typeid: Name of the class of the manager
+        :return: A proxy of the manager
+        :meta private:
+        """
+
+        return getattr(self._manager, typeid)(*args, **kwargs)
+
+    def shutdown(self):
+        """
+        Stops the server process. Managers hosted by it can no longer be used afterwards
+        """
+
+        self._manager.shutdown()
+
+
 class CaptchaJob:
     """Stores the details of each captcha task sent to the solving services"""
 
@@ -42,58 +165,138 @@ class CaptchaJob:
         self.invisible = invisible
         self.batch_id = batch_id
 
+        # Set once the job is registered with its manager
+        self.id = None
+
 
 class BaseRequest:
     """Base class for managers"""
     scheme_check = r'https?:\/\/'
     PROXY = None
 
-    def __init__(self, request_queue, maximum=0, initial=1, limit=0):
+    # Methods which only touch the shared counters. Unless a subclass overrides them, proxies run these in the calling
+    # process instead of forwarding them to the manager server
+    LOCAL_METHODS = ('request_created', 'request_cancelled', 'request_solved', 'record_solve_time')
+
+    # Coroutine methods, which always run in the calling process and make calls to the manager server without blocking
+    # the event loop
+    ASYNC_METHODS = ('aget_request', 'asend_request', 'aiter_requests')
+
+    # Seconds for which solved captchas stay valid, by captcha type. Can be overridden for each manager through the ttl
+    # parameter of create()
+    TOKEN_TTL = {'v2': 120, 'v3': 120}
 
-        assert isinstance(request_queue, multiprocessing.managers.BaseProxy), "Queues Passed to constructor should be proxy objects"
+    # Longest time get_request() waits without looking at response_queue, in case answers are put there directly
+    # instead of through deliver()
+    IDLE_CHECK = 10
+
+    # Probability with which all captchas of a reservation are solved by the time they were reserved for
+    RESERVE_CONFIDENCE = 0.95
+
+    # Counters and flags are kept in shared memory so that they can be read and updated from any process without
+    # a round trip to the manager server
+    ReqsUsed = _counter('ReqsUsed')
+    ReqsSolved = _counter('ReqsSolved')
+    ReqsInUnsolvedList = _counter('ReqsInUnsolvedList')
+    ReqsInQueue = _counter('ReqsInQueue')
+    expired = _counter('expired')
+    stop_new_requests = _flag('stop_new_requests')
+    finished = _flag('finished')
+
+    def __init__(self, request_queue, maximum=0, initial=1, limit=0, ttl=120):
+
+        assert isinstance(request_queue, (multiprocessing.managers.BaseProxy, queue.Queue)), \
+            "Queues Passed to constructor should be proxy objects, or generated with generate_queue(in_process=True)"
         assert initial > 0, " initial parameter cannot be 0 or less than 0"
-        m = multiprocessing.Manager()
         self.maximum = maximum
         self.initial = initial
         self.limit = limit
-        self.response_queue = m.Queue()
         self.request_queue = request_queue
-        self.instance_lock = m.Lock()
-        self.ReqsUsed = 0
-        self.ReqsSolved = 0
-        self.ReqsInUnsolvedList = 0
-        self.ReqsInQueue = 0
-        self.expired = 0
+
+        # Answers are only ever taken from response_queue within the server, so a server hosting many managers can keep
+        # it in memory instead of starting another process for it. So can managers which are used within a single
+        # process. Captchas in it expire ttl seconds after being solved
+        if _POOLED or isinstance(request_queue, queue.Queue):
+            self.response_queue = Inventory(ttl)
+        else:
+            inventory_manager = InventoryManager()
+            inventory_manager.start()
+            self.response_queue = inventory_manager.Inventory(ttl)
+
+        # The instance lives either inside the manager server, where every proxy call runs in a thread of its own, or,
+        # for a request_queue generated with in_process=True, in the process using it, where it is called directly
+        # from the threads of the program and of its services. Either way, it is only ever used from threads of a
+        # single process, so a regular lock is enough to protect it. No method calls back into the manager while
+        # holding it, as the call would not go through another thread in the latter case
+        self.instance_lock = threading.Lock()
+
+        # Notifies the threads waiting in get_request() whenever something they may be waiting for happens, such as an
+        # answer being delivered or the manager being stopped. _version is incremented on every notification, so that
+        # waiters can tell whether they missed one while they were not waiting yet
+        self._changed = threading.Condition()
+        self._version = 0
+
+        self.counters = SharedCounters.create()
+        self.counters_name = self.counters.name
+        multiprocessing.util.Finalize(self, self.counters.unlink, exitpriority=10)
         self.proxy = None
-        self.stop_new_requests = False
-        self.finished = False
+        self.ref = None
+
+        # Jobs registered with the manager, by id. Requests only carry the id of their job
+        self.jobs = []
+
+        # Recent solve times, which reservations are registered ahead of time by
+        self._solve_times = SolveTimeModel()
+
+        # Drop captchas which expired before being used in the background
+        Reaper.add(self)
 
     def __init_subclass__(cls, **kwargs):
-        cls.PROXY = make_proxy(cls.__name__+'.PROXY', cls)
+        cls.PROXY = make_proxy(cls.__name__+'.PROXY', cls, base=ManagerProxy)
         cls.PROXY.__qualname__, cls.PROXY.__module__ = cls.__qualname__ + '.PROXY', cls.__module__
+        PROXY_TYPES[cls.__name__] = cls.PROXY
+        _PooledManager.register(cls.__name__, cls, cls.PROXY)
+
+        for method in cls.LOCAL_METHODS:
+            if getattr(cls, method) is getattr(BaseRequest, method):
+                setattr(cls.PROXY, method, getattr(BaseRequest, method))
+
+        for method in cls.ASYNC_METHODS:
+            setattr(cls.PROXY, method, getattr(cls, method))
 
     @classmethod
-    def create(cls, *args, **kwargs):
+    def create(cls, *args, server=None, **kwargs):
         """
         Properly initializes a class instance.
 
+        :param ManagerServer server: Server to host the instance in. If None (default), a new server process is started
+                                     for it
         :return: A proxy instance of class. Has same functionality as a regular instance and can share state between
-                 processes.
+                 processes. If the request_queue was generated with generate_queue(in_process=True), a regular
+                 instance instead
         :rtype: ObjProxy
         """
 
         # Register class
         class_str = cls.__name__
 
-        multiprocessing.managers.BaseManager.register(class_str, cls, cls.PROXY)
-
-        # Start a manager process
-        manager = multiprocessing.managers.BaseManager()
-        manager.start()
-
-        # Create and store instance. We must store this proxy instance since its passed in request_queue to another
-        # process whenever a captcha request is required. This allows sharing of state between processes.
-        inst = eval("manager.{}(*args, **kwargs)".format(class_str))
+        # A regular queue can only be used within this process, so there is no need for a server
+        request_queue = args[0] if args else kwargs.get('request_queue')
+        if isinstance(request_queue, queue.Queue):
+            assert server is None, "Managers using a queue generated with in_process=True cannot be hosted by a server"
+            inst = cls(*args, **kwargs)
+        elif server is None:
+            multiprocessing.managers.BaseManager.register(class_str, cls, cls.PROXY)
+
+            # Start a manager process
+            manager = multiprocessing.managers.BaseManager()
+            manager.start()
+
+            # Create and store instance. We must store this proxy instance since its passed in request_queue to another
+            # process whenever a captcha request is required. This allows sharing of state between processes.
+            inst = eval("manager.{}(*args, **kwargs)".format(class_str))
+        else:
+            inst = server.host(class_str, *args, **kwargs)
         inst.set_proxy(inst)
 
         return inst
@@ -108,16 +311,98 @@ class BaseRequest:
 
         self.proxy = proxy
 
-    def create_request(self, job):
+        # Identifies the manager in requests, in place of the proxy itself. Managers used within a single process are
+        # never sent to another one, so they can be referred to directly
+        if proxy is self:
+            self.ref = self
+        else:
+            token = proxy._token
+            self.ref = (token.typeid, token.address, token.id)
+
+    @classmethod
+    def _resolve_ttl(cls, ttl, captcha_type):
         """
-        Create correctly formatted request to be put into request_queue
+        Returns the number of seconds solved captchas of the captcha_type stay valid for
 
-        :param CaptchaJob job: The CaptchaJob object containing the details of the captcha task needed to be created
+        :param ttl: Seconds, or a dictionary of seconds by captcha type. Defaults to TOKEN_TTL where None
+        :rtype: float
+        """
+
+        if isinstance(ttl, dict):
+            ttl = ttl.get(captcha_type)
+        if ttl is None:
+            ttl = cls.TOKEN_TTL[captcha_type]
+        assert ttl > 0, "ttl must be positive"
+        return ttl
+
+    def _evict(self):
+        """
+        Drops the captchas which expired before being used, so that they are no longer counted as available. Called
+        every few seconds by the Reaper
+
+        :meta private:
+        """
+
+        expired = self.response_queue.evict()
+        if expired:
+            self.counters.add(expired=len(expired))
+
+            # Waiters may have to send requests in their place
+            self.notify_waiters()
+
+    def _register_job(self, job):
+        """
+        Registers a job, so that requests can refer to it by its id
+
+        :param CaptchaJob job: The job
+        :return: The job, with its id set
+        :rtype: CaptchaJob
+        """
+
+        job.id = len(self.jobs)
+        self.jobs.append(job)
+        return job
+
+    def get_job(self, job_id):
+        """
+        Returns a registered job. Services call this once per job, the first time they take a request for it
+
+        :param int job_id: The id of the job
+        :rtype: CaptchaJob
+        :meta private:
+        """
+
+        return self.jobs[job_id]
+
+    def claim_counter_row(self, pid):
+        """
+        Reserves a row in the shared counters for a process, which it can then update without going through the
+        manager server
+
+        :param int pid: The process the row is reserved for
+        :rtype: int
+        :meta private:
+        """
+
+        return self.counters.claim_row(pid)
+
+    def create_request(self, job, count=1):
+        """
+        Create correctly formatted request to be put into request_queue. Requests are tuples of the reference of the
+        manager, the id of the job, the number of captcha tasks, and the token of the task this is a hedged copy of
+        (None for requests sent by managers). Services set up a proxy of the manager and fetch the job only the first
+        time they see them, so requests stay small however many are sent.
+
+        :param CaptchaJob job: The CaptchaJob object containing the details of the captcha task needed to be created.
+                               Must be registered with the manager
+        :param int count: Number of captcha tasks to create with these details. Services expand a request for more than
+                          one task into separate ones, so that they can all be sent in a single message
         :return: Request ready to be put into request_queue
-        :rtype: dict
+        :rtype: tuple
         :meta private:
         """
-        return {'manager': self.proxy, 'job': job}
+
+        return self.ref, job.id, count, None
 
     def request_cancelled(self, job, unsolved):
         """
@@ -127,11 +412,11 @@ class BaseRequest:
         :param CaptchaJob job: Only present here to maintain consistency between subclasses
         :meta private:
         """
-        with self.instance_lock:
-            if unsolved is True:
-                self.ReqsInUnsolvedList -= 1
-            elif unsolved is False:
-                self.ReqsInQueue -= 1
+        if unsolved is True:
+            self.counters.add(ReqsInUnsolvedList=-1)
+        elif unsolved is False:
+            self.counters.add(ReqsInQueue=-1)
+        self.notify_waiters()
 
     def request_failed(self, job):
         """
@@ -143,9 +428,7 @@ class BaseRequest:
 
         # Put another captcha request with the same details and in/decrement relevant counters
         self.request_queue.put(self.create_request(job=job))
-        with self.instance_lock:
-            self.ReqsInUnsolvedList -= 1
-            self.ReqsInQueue += 1
+        self.counters.add(ReqsInUnsolvedList=-1, ReqsInQueue=1)
 
     def request_created(self):
         """
@@ -153,9 +436,7 @@ class BaseRequest:
 
         :meta private:
         """
-        with self.instance_lock:
-            self.ReqsInUnsolvedList += 1
-            self.ReqsInQueue -= 1
+        self.counters.add(ReqsInUnsolvedList=1, ReqsInQueue=-1)
 
     def being_solved(self):
         """
@@ -167,7 +448,7 @@ class BaseRequest:
 
     def available(self):
         """
-        Get how many captchas are available to be used
+        Get how many captchas are available to be used. Captchas which expired are not counted
 
        :rtype: int
        """
@@ -184,11 +465,164 @@ class BaseRequest:
         :meta private:
         """
 
-        with self.instance_lock:
-            self.ReqsInUnsolvedList -= 1
+        if error is False:
+            self.counters.add(ReqsInUnsolvedList=-1, ReqsSolved=1)
+            self.record_solve_time(time_for_solve)
+        else:
+            self.counters.add(ReqsInUnsolvedList=-1)
+
+    def record_solve_time(self, time_for_solve):
+        """
+        Called with the time a captcha request took to be solved. Managers which keep statistics about solving
+        times should override this.
+
+        :meta private:
+        """
+
+        pass
+
+    def deliver(self, result, time_for_solve=None):
+        """
+        Called by the service process to hand over the outcome of a captcha task. Counts the task as solved, puts the
+        result in response_queue and wakes up the threads waiting for it. Both happen together, so that waiters
+        never see the result delivered without it being counted, or the other way around.
 
-            if error is False:
-                self.ReqsSolved += 1
+        :param dict result: The answer, or the error if result['error'] is not None
+        :param time_for_solve: Time taken to solve the captcha, if it was solved
+        :meta private:
+        """
+
+        with self._changed:
+            self.request_solved(time_for_solve, error=result.get('error') is not None)
+            if result.get('error') is None and time_for_solve is not None:
+                self._solve_times.add(time_for_solve)
+            self.response_queue.put(result)
+            self._version += 1
+            self._changed.notify_all()
+
+    def notify_waiters(self):
+        """
+        Wakes up the threads waiting in get_request(), so that they check again whether they can return
+
+        :meta private:
+        """
+
+        self._notify_changed()
+
+    def _notify_changed(self):
+        """Wakes up the threads sleeping on self._changed"""
+
+        with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+
+    def _wait_for_change(self, version, timeout):
+        """
+        Waits up to timeout seconds for a notification, unless one arrived since version was read from self._version.
+        Must be called with self._changed held
+        """
+
+        if self._version == version:
+            self._changed.wait(timeout)
+
+    def watch(self, version, timeout=None):
+        """
+        Waits until the manager notifies its waiters, unless it already did since an earlier call returned version.
+        Allows coroutines to wait for answers without a thread of the caller waiting in get_request() for each of them
+
+        :param int version: The version returned by an earlier call. None to return immediately
+        :param float timeout: Maximum time to wait in seconds. Defaults to IDLE_CHECK
+        :return: The current version
+        :rtype: int
+        :meta private:
+        """
+
+        with self._changed:
+            if version is not None:
+                self._wait_for_change(version, self.IDLE_CHECK if timeout is None else timeout)
+            return self._version
+
+    def begin_wait(self, *args):
+        """
+        Called when a coroutine starts waiting for an answer, with the same arguments as poll_request() except the
+        first. Raises if it cannot wait at all, like get_request() would
+
+        :return: State of the waiter, which poll_request() and end_wait() are called with
+        :meta private:
+        """
+
+        raise NotImplementedError
+
+    def poll_request(self, state, *args):
+        """
+        Takes an answer for a coroutine waiting for one, if there is any. Raises like get_request() would
+
+        :param state: The state returned by begin_wait()
+        :return: The answer, or None if there is none yet
+        :rtype: dict
+        :meta private:
+        """
+
+        raise NotImplementedError
+
+    def end_wait(self, state, *args):
+        """
+        Called when a coroutine gives up waiting for an answer, because it timed out
+
+        :param state: The state returned by begin_wait()
+        :meta private:
+        """
+
+        pass
+
+    def return_request(self, state, answer, *args):
+        """
+        Gives back an answer taken by poll_request() for a coroutine which timed out in the meantime, so that it is
+        handed out again rather than lost
+
+        :param state: The state returned by begin_wait()
+        :param dict answer: The answer
+        :meta private:
+        """
+
+        raise NotImplementedError
+
+    def _reservation_time(self, count, ready_at, ttl, hold):
+        """
+        Returns when to register count requests, so that all of their captchas are solved by ready_at with a
+        probability of RESERVE_CONFIDENCE, and are still valid hold seconds after ready_at
+
+        Each captcha is solved in time with a probability of RESERVE_CONFIDENCE ** (1 / count), so the requests are
+        registered ahead of ready_at by the solve time which is not exceeded that often. Captchas solved as quickly as
+        the quickest recent ones must not expire by then either, which caps how far ahead that can be.
+
+        :param int count: Number of requests
+        :param float ready_at: Time at which the captchas are required, as a timestamp
+        :param float ttl: Seconds for which the captchas stay valid
+        :param float hold: Seconds after ready_at for which the captchas must stay valid
+        :rtype: float
+        :meta private:
+        """
+
+        slowest = self._solve_times.quantile(self.RESERVE_CONFIDENCE ** (1 / count))
+        if slowest is None:
+            # Without solve times to go by, the requests are registered as early as they can be without the captchas
+            # expiring, even if they are solved right away
+            return ready_at - ttl + hold
+
+        return ready_at - min(slowest, self._solve_times.quantile(0) + ttl - hold)
+
+    @staticmethod
+    def _schedule(at, func, *args):
+        """
+        Calls func with args at the time provided, in a daemon thread. Right away if the time has passed
+
+        :meta private:
+        """
+
+        timer = threading.Timer(max(at - time.time(), 0), func, args)
+        timer.daemon = True
+        timer.start()
 
     def stop(self):
         """
@@ -201,6 +635,7 @@ class BaseRequest:
             if self.finished is True:
                 raise RuntimeError("Manager is no longer usable or has already been force stopped")
             self.stop_new_requests = True
+        self.notify_waiters()
 
     def force_stop(self):
         """
@@ -211,6 +646,7 @@ class BaseRequest:
         with self.instance_lock:
             self.stop_new_requests = True
             self.finished = True
+        self.notify_waiters()
 
     def flush(self):
         """
@@ -231,6 +667,34 @@ class BaseRequest:
     def send_request(self, maximum=None, initial=None):
         raise NotImplementedError
 
+    async def aget_request(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def asend_request(self, *args, **kwargs):
+        """
+        Same as send_request(), but runs in the default executor of the event loop instead of blocking it
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.send_request, *args, **kwargs))
+
+    async def aiter_requests(self, *args, **kwargs):
+        """
+        Asynchronously iterates over solved captchas, as returned by aget_request() when called with the arguments
+        provided. Stops once no more captchas are going to be solved.
+
+        Example ::
+
+            async for c in manager.aiter_requests():
+                token = c['answer']
+        """
+
+        while True:
+            try:
+                yield await self.aget_request(*args, **kwargs)
+            except (recaptcha_manager.api.exceptions.Exhausted, recaptcha_manager.api.exceptions.EmptyError):
+                return
+
     def get_solved(self):
         """
         Returns how many total captchas have been solved by the manager
@@ -256,24 +720,101 @@ class BaseRequest:
         return self.expired
 
 
+_KEEP_CONNECTION = 'keep-connection'
+
+
+class ManagerProxy(multiprocessing.managers.NamespaceProxy):
+    """
+    Base class for proxies of managers. Counters are read from and updated in shared memory directly, the rest is
+    forwarded to the manager server. See BaseRequest.LOCAL_METHODS for the methods which run in the calling process
+
+    :meta private:
+    """
+
+    ReqsUsed = BaseRequest.ReqsUsed
+    ReqsSolved = BaseRequest.ReqsSolved
+    ReqsInUnsolvedList = BaseRequest.ReqsInUnsolvedList
+    ReqsInQueue = BaseRequest.ReqsInQueue
+    expired = BaseRequest.expired
+    stop_new_requests = BaseRequest.stop_new_requests
+    finished = BaseRequest.finished
+
+    get_solved = BaseRequest.get_solved
+    get_used = BaseRequest.get_used
+    get_expired = BaseRequest.get_expired
+
+    def __init__(self, *args, counters=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counters_name = counters
+        self._counters = None
+        self._counters_pid = None
+
+        # Every proxy received through a queue is a separate object, but the set of referents this process holds for
+        # the manager server records their shared id only once. Once any of them is collected, the set is empty, and
+        # collecting another one closes the connection of the current thread to the server, even if garbage
+        # collection happened to run in the middle of a call using it. Keeping an entry in the set that is never
+        # removed leaves the connection open for the lifetime of the thread instead
+        self._idset.add(_KEEP_CONNECTION)
+
+    def __reduce__(self):
+        # Pass the name of the counters along, so that the unpickled proxy does not have to ask the server for it
+        func, (proxytype, token, serializer, kwds) = super().__reduce__()
+        kwds['counters'] = self._get_counters_name()
+        return func, (proxytype, token, serializer, kwds)
+
+    def _get_counters_name(self):
+        if self._counters_name is None:
+            self._counters_name = self._callmethod('__getattribute__', ('counters_name',))
+        return self._counters_name
+
+    def _claim_counter_row(self, pid):
+        return self._callmethod('claim_counter_row', (pid,))
+
+    @property
+    def counters(self):
+        # Proxies inherited by a forked child must not share the attachment (and therefore the row) of their parent
+        if self._counters is None or self._counters_pid != os.getpid():
+            self._counters = SharedCounters.attach(self._get_counters_name(), claim=self._claim_counter_row)
+            self._counters_pid = os.getpid()
+        return self._counters
+
+
 class ManualManager(BaseRequest):
 
-    def __init__(self, request_queue):
-        super().__init__(request_queue)
+    def __init__(self, request_queue, ttl=None):
+
+        # Answers only pass through response_queue on their way to job_results, where the captchas of each batch_id
+        # expire after the ttl of its captcha type. Until then, they are kept for as long as any captcha type allows
+        super().__init__(request_queue, ttl=max(self._resolve_ttl(ttl, t) for t in self.TOKEN_TTL))
+        self.ttl = ttl
         self.current_jobs = {}
+
+        # Solved captchas of each batch_id, ordered by the time they were solved
         self.job_results = {}
 
+        # Registered jobs, by batch_id and whether the captcha is invisible
+        self._batch_jobs = {}
+
+        # Conditions which the threads waiting in get_request() for each batch_id sleep on. They share instance_lock,
+        # so that waiters can check the state of their batch and start waiting without missing a change in between
+        self._conditions = {}
+
     @classmethod
-    def create(cls, request_queue):
+    def create(cls, request_queue, server=None, ttl=None):
         """
         Properly initializes instance.
 
+        :param ManagerServer server: Server to host the manager in. If None (default), a new server process is started
+                                     for it
+        :param ttl: Seconds for which solved captchas stay valid, after which they are discarded if not used. Can also
+                    be a dictionary with a number of seconds for each captcha type, such as {'v3': 100}. Defaults to
+                    :attr:`TOKEN_TTL` for captcha types not provided
         :return: A proxy instance of class. Has same functionality as a regular instance and can share state between
                   processes.
         :rtype: ManualManager
         """
 
-        return super().create(request_queue)
+        return super().create(request_queue, server=server, ttl=ttl)
 
     @staticmethod
     def _extract_domain(url):
@@ -308,6 +849,70 @@ class ManualManager(BaseRequest):
         if self.stop_new_requests:
             return
 
+        batch_id, job = self._register_batch(url, web_key, captcha_type, number, action, min_score, invisible,
+                                             force_path)
+
+        # Increment counter since we are going to be adding requests in request_queue
+        self.counters.add(ReqsInQueue=number)
+
+        # Finally, add the requests in queue. They all go in one message, however many there are
+        self.request_queue.put(self.create_request(job, count=number))
+
+        return batch_id
+
+    def reserve(self, url, web_key, captcha_type, number, ready_at, action=None, min_score=None, invisible=False,
+                force_path=False, hold=0):
+        """
+        Like :meth:`~ManualManager.send_request`, but sends the requests ahead of time so that their captchas are
+        available at ready_at, rather than right away. Useful when you know in advance that many captchas will be
+        required at once, such as when a job starts at a set time.
+
+        :param float ready_at: Time at which the captchas are required, as a timestamp
+        :param float hold: Seconds after ready_at for which the captchas must still be valid, such as how long the job
+                           takes to use them all. Defaults to 0
+        :return: Returns the id of the reserved captcha requests.
+        :rtype: str
+
+        The other parameters are the same as for :meth:`~ManualManager.send_request`. The requests are sent all at
+        once, ahead of ready_at by how long all of them take to be solved with a probability of
+        :attr:`RESERVE_CONFIDENCE`, judging by recent solve times. However, they are never sent so early that captchas
+        solved as quickly as recent ones expire before ready_at + hold. :meth:`~ManualManager.get_request` waits for
+        reserved captchas as if the requests were already sent.
+        """
+
+        if self.stop_new_requests:
+            return
+
+        ttl = self._resolve_ttl(self.ttl, captcha_type)
+        assert 0 <= hold < ttl, "hold must be less than the time for which captchas stay valid"
+
+        batch_id, job = self._register_batch(url, web_key, captcha_type, number, action, min_score, invisible,
+                                             force_path)
+        self._schedule(self._reservation_time(number, ready_at, ttl, hold), self._send_reserved, job, number)
+        return batch_id
+
+    def _send_reserved(self, job, number):
+        """
+        Sends the requests of a reservation. If the manager was stopped in the meantime, they are given up instead
+        """
+
+        if self.stop_new_requests:
+            with self.instance_lock:
+                self.current_jobs[job.batch_id] -= number
+                self._notify_batch(job.batch_id)
+            return
+
+        self.counters.add(ReqsInQueue=number)
+        self.request_queue.put(self.create_request(job, count=number))
+
+    def _register_batch(self, url, web_key, captcha_type, number, action, min_score, invisible, force_path):
+        """
+        Validates the parameters of captcha requests and counts number of them as being solved for their batch_id
+
+        :return: The batch_id, and the job which the requests refer to
+        :rtype: tuple
+        """
+
         if re.match(self.scheme_check, url) is None:
             raise BadDomainError(f"Provided url is missing scheme. Did you mean {'http://' + url}?")
 
@@ -331,23 +936,25 @@ class ManualManager(BaseRequest):
 
         batch_id = hashlib.sha1(parameters.encode()).hexdigest()
 
-        # Create a job object which would be used by service process to create the captcha task
-        job = CaptchaJob(url, web_key, captcha_type, action, min_score, invisible, batch_id=batch_id)
-
-        # Increment counter since we are going to be adding requests in request_queue
+        # Count the requests as being solved for the batch_id, so that get_request() waits for them
         with self.instance_lock:
-            self.ReqsInQueue += number
+
+            # Create a job object which would be used by service process to create the captcha task. Requests with the
+            # same parameters share it
+            job = self._batch_jobs.get((batch_id, invisible))
+            if job is None:
+                job = self._register_job(CaptchaJob(url, web_key, captcha_type, action, min_score, invisible,
+                                                    batch_id=batch_id))
+                self._batch_jobs[(batch_id, invisible)] = job
+
+            self._results(batch_id, captcha_type)
 
             if self.current_jobs.get(batch_id):
                 self.current_jobs[batch_id] += number
             else:
                 self.current_jobs[batch_id] = number
 
-        # Finally, add the calculated number of requests in queue
-        for _ in range(number):
-            self.request_queue.put(self.create_request(job))
-
-        return batch_id
+        return batch_id, job
 
     @ensure_lock
     def _check_answer(self, batch_id):
@@ -357,16 +964,129 @@ class ManualManager(BaseRequest):
         :meta private:
         """
 
-        if len(self.job_results.get(batch_id, [])) > 0:
-            answer = self.job_results[batch_id][0]
-            del self.job_results[batch_id][0]
+        results = self.job_results.get(batch_id)
+        if results is None:
+            return False
+
+        try:
+            answer = results.get(block=False)
+        except queue.Empty:
+            answer = None
+
+        # Captchas skipped because they expired are no longer going to be received
+        self._evict_batch(batch_id)
 
+        if answer is not None:
             self.current_jobs[batch_id] -= 1
-            self.ReqsUsed += 1
+            self.counters.add(ReqsUsed=1)
+
+            # Others waiting for this batch_id may have to return now that it is empty
+            if self.current_jobs[batch_id] == 0:
+                self._notify_batch(batch_id)
             return answer
 
         return False
 
+    @ensure_lock
+    def _results(self, batch_id, captcha_type=None):
+        """
+        Returns the solved captchas stored for the batch_id
+
+        :param str captcha_type: The captcha type of the batch_id, which sets how long its captchas stay valid. Only
+                                 needed the first time
+        :rtype: Inventory
+        :meta private:
+        """
+
+        if batch_id not in self.job_results:
+            ttl = self.response_queue.ttl if captcha_type is None else self._resolve_ttl(self.ttl, captcha_type)
+            self.job_results[batch_id] = Inventory(ttl)
+        return self.job_results[batch_id]
+
+    def _evict(self):
+        """
+        Drops the captchas which expired before being used, for every batch_id
+
+        :meta private:
+        """
+
+        expired = self.response_queue.evict()
+        with self.instance_lock:
+            for answer in expired:
+                self._expire(answer['batch_id'], 1)
+            for batch_id in list(self.job_results):
+                self._evict_batch(batch_id)
+
+    @ensure_lock
+    def _evict_batch(self, batch_id):
+        expired = self.job_results[batch_id].evict()
+        if expired:
+            self._expire(batch_id, len(expired))
+
+    @ensure_lock
+    def _expire(self, batch_id, count):
+        """
+        Records that count captchas of the batch_id expired before being used
+
+        :meta private:
+        """
+
+        self.current_jobs[batch_id] -= count
+        self.counters.add(expired=count)
+
+        # Waiters may have to return if the batch_id is now empty
+        self._notify_batch(batch_id)
+
+    @ensure_lock
+    def _condition(self, batch_id):
+        """
+        Returns the condition which threads waiting for answers of the batch_id sleep on
+
+        :meta private:
+        """
+
+        if batch_id not in self._conditions:
+            self._conditions[batch_id] = threading.Condition(self.instance_lock)
+        return self._conditions[batch_id]
+
+    @ensure_lock
+    def _notify_batch(self, batch_id):
+        """
+        Wakes up the threads waiting for answers of the batch_id, as well as the coroutines waiting for any
+
+        :meta private:
+        """
+
+        self._condition(batch_id).notify_all()
+        self._notify_changed()
+
+    def deliver(self, result, time_for_solve=None):
+        """
+        Called by the service process to hand over the outcome of a captcha task. The result is stored with the
+        others of its batch_id directly, and only the threads waiting for that batch_id are woken up
+
+        :meta private:
+        """
+
+        with self.instance_lock:
+            self.request_solved(time_for_solve, error=result.get('error') is not None)
+            if result.get('error') is None and time_for_solve is not None:
+                self._solve_times.add(time_for_solve)
+            self._add_result(result)
+            self._notify_batch(result['batch_id'])
+
+    def notify_waiters(self):
+        """
+        Wakes up the threads waiting in get_request() for any batch_id
+
+        :meta private:
+        """
+
+        with self.instance_lock:
+            for condition in self._conditions.values():
+                condition.notify_all()
+            self._notify_changed()
+
     def request_cancelled(self, job: CaptchaJob, unsolved):
         """
         Called when a captcha task, registered or unregistered, is forfeited. This usually happens due to a problem on the
@@ -383,9 +1103,10 @@ class ManualManager(BaseRequest):
             self.current_jobs[job.batch_id] -= 1
 
             if unsolved is True:
-                self.ReqsInUnsolvedList -= 1
+                self.counters.add(ReqsInUnsolvedList=-1)
             elif unsolved is False:
-                self.ReqsInQueue -= 1
+                self.counters.add(ReqsInQueue=-1)
+            self._notify_batch(job.batch_id)
 
     def _update_results(self):
         """
@@ -405,92 +1126,248 @@ class ManualManager(BaseRequest):
                 with self.instance_lock:
                     self._add_result(c)
 
-    @ensure_lock
-    def _add_result(self, answer):
-        """
-        Adds all captcha answers passed to their respective batch_ids
+    @ensure_lock
+    def _add_result(self, answer):
+        """
+        Adds all captcha answers passed to their respective batch_ids
+
+        :param answer: The details of the captcha job that was completed
+        """
+
+        self._results(answer['batch_id']).put(answer)
+
+    def get_request(self, batch_id, max_block=0, force_return=True):
+        """
+        Returns a solved captcha for the provided id. Blocks until one is ready or another condition reached.
+
+        :param str batch_id: The id of the type of captcha tasks you wish to retrieve
+        :param int max_block: Maximum time the function blocks in seconds. Set as 0 to block until a request is received
+        :param bool force_return: Whether to return None as soon as the number of captcha tasks being solved for the
+                                  provided batch_id becomes zero. Takes precedence over max_block.
+        :return: A dictionary containing the token under key 'answer'
+        :rtype: dict
+
+
+        Example ::
+
+            try:
+                c = manager.get_request(batch_id)  # Blocks until one is ready
+            except recaptcha_manager.api.exceptions.Exhausted:
+                print('no more requests available')
+            else:
+                token = c['answer']
+
+        .. note::
+            Make sure to either keep parameter `force_return` as True (default), or `max_block` as a non-zero value (or
+            both) to avoid a possibility for an indefinite block time
+
+        """
+
+        try:
+            assert max_block >= 0, f"{max_block} is not a valid value for parameter max_block"
+
+            # Check validity of the batch_id
+            with self.instance_lock:
+                if self.current_jobs.get(batch_id, None) is None:
+                    raise InvalidBatchID("Bad id provided, no such tasks have been registered")
+
+            # Take note of time of entry in case max_block was provided to a non-zero value
+            enter_time = time.time()
+
+            while True:
+
+                # Answers are normally delivered straight to self.job_results, but may also have been put in
+                # response_queue directly
+                self._update_results()
+
+                with self.instance_lock:
+
+                    # Check if we are over the time limit
+                    if max_block != 0 and time.time() - enter_time > max_block:
+                        raise recaptcha_manager.api.exceptions.TimeOutError
+
+                    ans = self._poll(batch_id, force_return)
+                    if ans:
+                        return ans
+
+                    # Sleep until an answer for this batch_id arrives, the batch empties or the manager is stopped
+                    timeout = self.IDLE_CHECK
+                    if max_block != 0:
+                        timeout = min(timeout, max(max_block - (time.time() - enter_time), 0) + 0.01)
+                    self._condition(batch_id).wait(timeout)
+
+        except Exception as e:
+            msg = "{}\n\nOriginal {}".format(e, traceback.format_exc())
+            raise type(e)(msg)
+
+    def get_requests(self, batch_id, number, max_block=0, force_return=True):
+        """
+        Returns several solved captchas for the provided id at once. Blocks until that many are ready, or until another
+        condition is reached, in which case the captchas received so far are returned instead. Cheaper than calling
+        :meth:`~ManualManager.get_request` as many times.
+
+        :param str batch_id: The id of the type of captcha tasks you wish to retrieve
+        :param int number: Number of captchas to return
+        :param int max_block: Maximum time the function blocks in seconds. Set as 0 to block until enough requests are
+                              received
+        :param bool force_return: Whether to return as soon as the number of captcha tasks being solved for the
+                                  provided batch_id becomes zero. Takes precedence over max_block.
+        :return: A list of up to number dictionaries, each containing a token under key 'answer'
+        :rtype: list
+
+        Exceptions are raised like :meth:`~ManualManager.get_request` would, but only when no captchas were received at
+        all. If solving a captcha failed, the captchas received before it are returned, and the error is raised by a
+        later call instead.
+        """
+
+        try:
+            assert number >= 1, 'Argument "number" cannot be less than 1'
+            assert max_block >= 0, f"{max_block} is not a valid value for parameter max_block"
+
+            self.begin_wait(batch_id)
+            enter_time = time.time()
+            captchas = []
+
+            while True:
+                self._update_results()
+
+                with self.instance_lock:
+                    try:
+                        if max_block != 0 and time.time() - enter_time > max_block:
+                            raise recaptcha_manager.api.exceptions.TimeOutError
+
+                        while len(captchas) < number:
+
+                            # Leave an error to be raised by a later call, so that the captchas taken are not lost
+                            results = self.job_results.get(batch_id)
+                            ans = results.peek() if results is not None else None
+                            if captchas and ans is not None and ans.get('error') is not None:
+                                return captchas
+
+                            ans = self._poll(batch_id, force_return)
+                            if not ans:
+                                break
+                            captchas.append(ans)
 
-        :param answer: The details of the captcha job that was completed
-        """
+                    except (recaptcha_manager.api.exceptions.TimeOutError, recaptcha_manager.api.exceptions.EmptyError,
+                            recaptcha_manager.api.exceptions.Exhausted):
+                        if captchas:
+                            return captchas
+                        raise
 
-        if self.job_results.get(answer['batch_id'], None) is None:
-            self.job_results[answer['batch_id']] = []
+                    if len(captchas) == number:
+                        return captchas
 
-        self.job_results[answer['batch_id']].append(answer)
+                    timeout = self.IDLE_CHECK
+                    if max_block != 0:
+                        timeout = min(timeout, max(max_block - (time.time() - enter_time), 0) + 0.01)
+                    self._condition(batch_id).wait(timeout)
 
-    def get_request(self, batch_id, max_block=0, force_return=True):
+        except Exception as e:
+            msg = "{}\n\nOriginal {}".format(e, traceback.format_exc())
+            raise type(e)(msg)
+
+    def try_get_request(self, batch_id):
         """
-        Returns a solved captcha for the provided id. Blocks until one is ready or another condition reached.
+        Returns a solved captcha for the provided id if one is ready. Unlike :meth:`~ManualManager.get_request`, never
+        waits.
 
         :param str batch_id: The id of the type of captcha tasks you wish to retrieve
-        :param int max_block: Maximum time the function blocks in seconds. Set as 0 to block until a request is received
-        :param bool force_return: Whether to return None as soon as the number of captcha tasks being solved for the
-                                  provided batch_id becomes zero. Takes precedence over max_block.
-        :return: A dictionary containing the token under key 'answer'
+        :return: A dictionary containing the token under key 'answer', or None if no captcha is ready
         :rtype: dict
 
+        Raises :class:`~recaptcha_manager.api.exceptions.Exhausted` if no more captchas are going to be solved, and
+        the error if solving the captcha failed, like :meth:`~ManualManager.get_request`.
+        """
 
-        Example ::
+        self._update_results()
 
-            try:
-                c = manager.get_request(batch_id)  # Blocks until one is ready
-            except recaptcha_manager.api.exceptions.Exhausted:
-                print('no more requests available')
-            else:
-                token = c['answer']
+        with self.instance_lock:
+            if self.current_jobs.get(batch_id, None) is None:
+                raise InvalidBatchID("Bad id provided, no such tasks have been registered")
 
-        .. note::
-            Make sure to either keep parameter `force_return` as True (default), or `max_block` as a non-zero value (or
-            both) to avoid a possibility for an indefinite block time
+            return self._poll(batch_id, force_return=False) or None
 
+    @ensure_lock
+    def _poll(self, batch_id, force_return):
         """
+        Takes an answer stored for the batch_id, if there is one
 
-        try:
-            assert max_block >= 0, f"{max_block} is not a valid value for parameter max_block"
+        :return: The answer, or False if there is none yet
+        :meta private:
+        """
 
-            # Check validity of the batch_id
-            with self.instance_lock:
-                if self.current_jobs.get(batch_id, None) is None:
-                    raise InvalidBatchID("Bad id provided, no such tasks have been registered")
+        # Check if manager will no longer receive solved captcha requests for the provided batch_id
+        if self.current_jobs[batch_id] == 0 and self.stop_new_requests:
+            self.finished = True
 
-            # Take note of time of entry in case max_block was provided to a non-zero value
-            enter_time = time.time()
+        if self.finished:
+            raise recaptcha_manager.api.exceptions.Exhausted("All tasks for this batch id have been exhausted")
 
-            while True:
+        if self.current_jobs[batch_id] == 0 and force_return:
+            raise recaptcha_manager.api.exceptions.EmptyError("No requests are being currently solved for this id")
 
-                # Check if we are over the time limit
-                if max_block != 0 and time.time() - enter_time > max_block:
-                    raise recaptcha_manager.api.exceptions.TimeOutError
+        # Check if an answer for this batch_id was stored, by us or any other process
+        ans = self._check_answer(batch_id)
 
-                with self.instance_lock:
+        # Check if there was an error in solving the captcha, and raise it.
+        if ans and ans.get('error') is not None:
+            raise ans['error']
 
-                    # Check if manager will no longer receive solved captcha requests for the provided batch_id
-                    if self.current_jobs[batch_id] == 0 and self.stop_new_requests:
-                        self.finished = True
+        return ans
 
-                    if self.finished:
-                        raise recaptcha_manager.api.exceptions.Exhausted("All tasks for this batch id have been exhausted")
+    async def aget_request(self, batch_id, max_block=0, force_return=True):
+        """
+        Same as :meth:`~ManualManager.get_request`, but waits without blocking the event loop. Any number of coroutines
+        can wait at once, without a thread waiting for each of them. Coroutines waiting for the same batch_id are handed
+        captchas in the order they started waiting.
 
-                    if self.current_jobs[batch_id] == 0 and force_return:
-                        raise recaptcha_manager.api.exceptions.EmptyError("No requests are being currently solved for this id")
+        :param str batch_id: The id of the type of captcha tasks you wish to retrieve
+        :param int max_block: Maximum time the coroutine waits in seconds. Set as 0 to wait until a request is received
+        :param bool force_return: Whether to stop waiting as soon as the number of captcha tasks being solved for the
+                                  provided batch_id becomes zero. Takes precedence over max_block.
+        :rtype: dict
+        """
 
-                self._update_results()
+        assert max_block >= 0, f"{max_block} is not a valid value for parameter max_block"
+        return await aio.dispatcher(self).get_request(batch_id, (batch_id, force_return), max_block)
 
-                # Check if, during the time we waited for response from queue, another process received and stored a
-                # captcha answer for this batch_id
-                with self.instance_lock:
-                    ans = self._check_answer(batch_id)
+    def begin_wait(self, batch_id, force_return=True):
+        """
+        Checks the validity of the batch_id
 
-                    if ans:
-                        # Check if there was an error in solving the captcha, and raise it.
-                        if ans.get('error') is not None:
-                            raise ans['error']
+        :meta private:
+        """
 
-                        return ans
+        with self.instance_lock:
+            if self.current_jobs.get(batch_id, None) is None:
+                raise InvalidBatchID("Bad id provided, no such tasks have been registered")
 
-        except Exception as e:
-            msg = "{}\n\nOriginal {}".format(e, traceback.format_exc())
-            raise type(e)(msg)
+    def poll_request(self, state, batch_id, force_return=True):
+        """
+        Takes an answer for the batch_id if there is one
+
+        :return: The answer, or None if there is none yet
+        :rtype: dict
+        :meta private:
+        """
+
+        self._update_results()
+        with self.instance_lock:
+            return self._poll(batch_id, force_return) or None
+
+    def return_request(self, state, answer, batch_id, force_return=True):
+        """
+        Stores an answer of the batch_id taken by poll_request() back, as if it was never taken
+
+        :meta private:
+        """
+
+        with self.instance_lock:
+            self.counters.add(ReqsUsed=-1)
+            self.current_jobs[batch_id] += 1
+            self._results(batch_id).put(answer)
+            self._notify_batch(batch_id)
 
     @staticmethod
     def _stringify(*args):
@@ -507,18 +1384,19 @@ class ManualManager(BaseRequest):
     def available(self, batch_id=None):
         """
         Returns the number of captcha requests solved and available for use. If batch_id is provided, returns information
-        for that particular batch_id only.
+        for that particular batch_id only. Captchas which expired are not counted.
 
         :param str batch_id: Optional parameter to restrict the lookup to a particular batch_id
         """
 
         answer = 0
         self._update_results()
+        self._evict()
 
         with self.instance_lock:
             if batch_id is None:
                 for key, value in self.job_results.items():
-                    answer += len(value)
+                    answer += value.qsize()
 
                 answer += super().available()
                 return answer
@@ -526,7 +1404,7 @@ class ManualManager(BaseRequest):
             if self.current_jobs.get(batch_id, None) is None:
                 raise InvalidBatchID("Incorrect id provided, no such tasks have been registered")
 
-            return len(self.job_results.get(batch_id, []))
+            return self._results(batch_id).qsize()
 
     def being_solved(self, batch_id=None):
         """
@@ -570,8 +1448,13 @@ class AutoManager(BaseRequest):
     MAX_RECORDS = 10
     IDEAL_RECORDS = 5
 
+    # Seconds worth of captchas kept available or being solved, unless a controller tunes it. More are requested once
+    # fewer than 5/6 of that are left
+    HORIZON = 30
+
     def __init__(self, request_queue, url, web_key, captcha_type, action=None, min_score=None, invisible=False,
-                 initial=1, maximum=0, limit=0):
+                 initial=1, maximum=0, limit=0, ttl=None, estimator=None, service_level=None, controller=None,
+                 forecaster=None):
         assert captcha_type in ['v2', 'v3'], "Captcha type {} not recognized. Only 'v2' and 'v3' google recaptchas " \
                                                  "are supported".format(captcha_type)
         if captcha_type == 'v3':
@@ -581,24 +1464,62 @@ class AutoManager(BaseRequest):
 
         if re.match(self.scheme_check, url) is None:
             raise BadDomainError(f"Provided url is missing scheme. Did you mean {'http://' + url}?")
-
-        super().__init__(request_queue, maximum=maximum, initial=initial, limit=limit)
+        assert estimator is None or isinstance(estimator, Estimator), "estimator must be an instance of Estimator"
+        assert service_level is None or 0 < service_level < 1, "service_level must be between 0 and 1"
+        assert controller is None or isinstance(controller, HorizonController), \
+            "controller must be an instance of HorizonController"
+        assert controller is None or service_level is None, "controller cannot be used along with service_level"
+        assert forecaster is None or isinstance(forecaster, Forecaster), \
+            "forecaster must be an instance of Forecaster"
+
+        ttl = self._resolve_ttl(ttl, captcha_type)
+        super().__init__(request_queue, maximum=maximum, initial=initial, limit=limit, ttl=ttl)
+        self.ttl = ttl
         self.WaitingTime = {'num': 0, 'total_time': 0, 'rate': 0.0}
         self.UseRate = {'num': 0, 'total_time': 0, 'last_time': time.time(), 'rate': 0.0}
         self.SolveTime = {'num': 0, 'total_time': 0, 'rate': 0.0}
         self.restoreTime = None
+
+        # Targeting a service level needs the variance of the time between uses, which only estimators provide
+        self.service_level = service_level
+        if service_level is not None and estimator is None:
+            estimator = EWMA()
+
+        # Estimators which the rates of the statistics above are taken from, by statistic. If None, the rates are
+        # averages over the most recent records instead
+        self.estimators = None
+        if estimator is not None:
+            self.estimators = {stat: copy.deepcopy(estimator) for stat in ('WaitingTime', 'UseRate', 'SolveTime')}
+        self._restoreEstimator = None
+
+        # Solve time which is only exceeded in 1 - service_level of cases
+        self._solve_quantile = P2Quantile(service_level) if service_level is not None else None
+
+        # Tunes the horizon from the waits and expiries observed. A horizon longer than captchas stay valid would only
+        # have them expire
+        self.controller = None
+        self.horizon = self.HORIZON
+        if controller is not None:
+            self.controller = copy.deepcopy(controller)
+            if self.controller.max_horizon is None:
+                self.controller.max_horizon = max(ttl, self.controller.horizon)
+            self.horizon = self.controller.horizon
+
+        # Predicts how many captchas will be used in the near future from how many were used in the past
+        self.forecaster = copy.deepcopy(forecaster)
         self.invisible = invisible
         self.web_key = web_key
         self.url = url
         self.captcha_type = captcha_type
         self.action = action
         self.min_score = min_score
-        self.job = CaptchaJob(url, web_key, captcha_type, action, min_score, invisible)
+        self.job = self._register_job(CaptchaJob(url, web_key, captcha_type, action, min_score, invisible))
 
 
     @classmethod
     def create(cls, request_queue, url, web_key, captcha_type, action=None, min_score=None, invisible=False,
-               initial=1, maximum=0, limit=0):
+               initial=1, maximum=0, limit=0, server=None, ttl=None, estimator=None, service_level=None,
+               controller=None, forecaster=None):
         """
         Properly initializes the constructor for AutoManager.
 
@@ -616,6 +1537,27 @@ class AutoManager(BaseRequest):
                             function. Set as 0 to specify no such limit.
         :param int limit: Maximum number of allowed captcha requests being solved at once. Set as 0 to disable this
                           limit
+        :param ManagerServer server: Server to host the manager in. If None (default), a new server process is started
+                                     for it
+        :param float ttl: Seconds for which solved captchas stay valid, after which they are discarded if not used.
+                          Defaults to :attr:`TOKEN_TTL` for the captcha_type
+        :param Estimator estimator: How to estimate the statistics predictions are based on, such as
+                                    :class:`~recaptcha_manager.api.estimators.EWMA`, which follows changes in demand
+                                    within seconds. If None (default), averages over the most recent records are used
+        :param float service_level: Target probability that a captcha is ready without waiting when
+                                    :meth:`~AutoManager.get_request` is called, such as 0.95. If provided,
+                                    :meth:`~AutoManager.send_request` sizes orders from the solve time this often not
+                                    exceeded, rather than the average one, so that slow periods do not run the manager
+                                    dry. Defaults to :class:`~recaptcha_manager.api.estimators.EWMA` as estimator
+        :param HorizonController controller: Tunes how many seconds worth of captchas
+                                             :meth:`~AutoManager.send_request` keeps available or being solved, from
+                                             how long your program waits for captchas and how many expire. If None
+                                             (default), :attr:`HORIZON` seconds worth are kept. Cannot be used along
+                                             with service_level
+        :param Forecaster forecaster: Predicts how many captchas will be used at a given time, such as
+                                      :class:`~recaptcha_manager.api.forecasters.TimeOfDayProfile`, so that
+                                      :meth:`~AutoManager.send_request` sends requests ahead of a rise in demand. If
+                                      None (default), the recent average time between uses is assumed to continue
 
         :returns: A proxy instance of class AutoManager. Has same functionality as a regular manager
         :rtype: AutoManager
@@ -626,7 +1568,9 @@ class AutoManager(BaseRequest):
         """
 
         return super().create(request_queue, url, web_key, captcha_type, action=action, min_score=min_score,
-                              invisible=invisible, initial=initial, maximum=maximum, limit=limit)
+                              invisible=invisible, initial=initial, maximum=maximum, limit=limit, server=server,
+                              ttl=ttl, estimator=estimator, service_level=service_level, controller=controller,
+                              forecaster=forecaster)
 
     def create_restore_point(self, overwrite=False):
         """
@@ -641,6 +1585,8 @@ class AutoManager(BaseRequest):
                                    "restore points")
 
             self.restoreTime = copy.deepcopy(self.UseRate)
+            if self.estimators is not None:
+                self._restoreEstimator = copy.deepcopy(self.estimators['UseRate'])
 
     def restore(self):
         """
@@ -653,29 +1599,71 @@ class AutoManager(BaseRequest):
 
             self.UseRate = copy.deepcopy(self.restoreTime)
             self.restoreTime = None
+            if self.estimators is not None:
+                self.estimators['UseRate'] = self._restoreEstimator
+                self._restoreEstimator = None
 
-    def request_solved(self, time_for_solve=None, error=False):
+    def record_solve_time(self, time_for_solve):
         """
         Called when a captcha request was successfully solved
 
-        :param time_for_solve: The time when the captcha request was sent to request_queue
-        :param error: Whether the solving service returned an error for this particular captcha task
+        :param time_for_solve: The time taken for the captcha to move from request_queue to response_queue
         :meta private:
         """
 
         with self.instance_lock:
-            self.ReqsInUnsolvedList -= 1
+            # Add amount of time taken for captcha to move from request_queue to response_queue
+            self.SolveTime['num'] += 1
+
+            if time_for_solve < 0:
+                time_for_solve = 0
+
+            self.SolveTime['total_time'] += time_for_solve
+            self._sample('SolveTime', time_for_solve)
+            if self._solve_quantile is not None:
+                self._solve_quantile.add(time_for_solve)
+
+    @ensure_lock
+    def _sample(self, stat, value, weight=1):
+        """
+        Records a sample of the statistic with its estimator, if the manager uses estimators
+
+        :param str stat: Name of the statistic, such as 'UseRate'
+        """
+
+        if self.estimators is not None:
+            self.estimators[stat].add(value, weight)
+
+    @ensure_lock
+    def _record_use(self, count=1, interval=None):
+        """
+        Records the time elapsed since last time get_request() was called to know how frequently does program require
+        captchas
+
+        :param int count: Number of captchas used at once
+        :param float interval: The time elapsed, if it was measured beforehand
+        """
+
+        if interval is None:
+            interval = time.time() - self.UseRate['last_time']
+        self.UseRate['num'] += count
+        self.UseRate['total_time'] += interval
 
-            if error is False:
-                # Add amount of time taken for captcha to move from request_queue to response_queue and increment solved
-                # captchas counter
-                self.SolveTime['num'] += 1
+        # Captchas used at once share the time elapsed, rather than all but one being recorded as used right away, so
+        # that estimators which only keep the most recent samples never see gaps of zero
+        self._sample('UseRate', interval / count, count)
 
-                if time_for_solve < 0:
-                    time_for_solve = 0
+    @ensure_lock
+    def _check_exhausted(self):
+        """
+        Raises Exhausted if no more captchas are going to be handed out
+        """
 
-                self.SolveTime['total_time'] += time_for_solve
-                self.ReqsSolved += 1
+        # Check if no new captcha requests are going to be solved
+        if self.stop_new_requests and self.ReqsInUnsolvedList + self.response_queue.qsize() == 0:
+            self.finished = True
+        if self.finished:
+            raise recaptcha_manager.api.exceptions.Exhausted
 
     def get_waiting_time(self):
         """
@@ -701,6 +1689,15 @@ class AutoManager(BaseRequest):
             self._update_stats()
         return self.SolveTime['rate']
 
+    def get_horizon(self):
+        """
+        Returns how many seconds worth of captchas :meth:`~AutoManager.send_request` keeps available or being solved
+
+        :rtype: float
+        """
+
+        return self.horizon
+
     def get_use_rate(self):
         """
         Returns how frequently your program requires recaptcha tokens (in seconds). Will be zero if not enough
@@ -741,86 +1738,294 @@ class AutoManager(BaseRequest):
 
         assert max_block >= 0, f"{max_block} is not a valid value for parameter max_block"
 
-        with self.instance_lock:
+        enter_time = self.begin_wait(send_custom_reqs)
+
+        while True:
+
+            if max_block and time.time() - enter_time >= max_block:
+                self.end_wait(enter_time, send_custom_reqs)
+                raise recaptcha_manager.api.exceptions.TimeOutError
+
+            # Take note of the notifications so far before looking at response_queue, so that we do not miss one sent
+            # in between
+            version = self._version
+            c = self.poll_request(enter_time, send_custom_reqs)
+            if c is not None:
+                return c
+
+            # Sleep until an answer is delivered or something else changes, instead of polling response_queue
+            with self._changed:
+                timeout = self.IDLE_CHECK
+                if max_block:
+                    timeout = min(timeout, max(max_block - (time.time() - enter_time), 0))
+                self._wait_for_change(version, timeout)
+
+    async def aget_request(self, send_custom_reqs=True, max_block=0):
+        """
+        Same as :meth:`~AutoManager.get_request`, but waits without blocking the event loop. Any number of coroutines
+        can wait at once, without a thread waiting for each of them. Coroutines are handed captchas in the order they
+        started waiting.
+
+        Example ::
+
+            async def scrape(manager):
+                await manager.asend_request()
+                c = await manager.aget_request()
+                token = c['answer']
+
+        :param bool send_custom_reqs: Whether to send additional captcha requests if there are none being solved
+        :param int max_block: Maximum time the coroutine waits in seconds. Set as 0 to wait until a request is received
+        :rtype: dict
+        """
+
+        assert max_block >= 0, f"{max_block} is not a valid value for parameter max_block"
+        return await aio.dispatcher(self).get_request(None, (send_custom_reqs,), max_block)
+
+    def begin_wait(self, send_custom_reqs=True):
+        """
+        Checks whether captchas can still be received and records how frequently they are required
+
+        :return: Time at which waiting began
+        :rtype: float
+        :meta private:
+        """
 
-            # Check if no new captcha requests are going to be solved. If so, return None
-            if self.stop_new_requests and self.ReqsInUnsolvedList + self.response_queue.qsize() == 0:
-                self.finished = True
-            if self.finished:
-                raise recaptcha_manager.api.exceptions.Exhausted
+        with self.instance_lock:
+            self._check_exhausted()
 
             # Record the time elapsed since last time get_request() was called to know how frequently does program
             # require captchas
-            self.UseRate['num'] += 1
-            self.UseRate['total_time'] += (time.time() - self.UseRate['last_time'])
+            self._record_use()
+            self.UseRate['last_time'] = time.time()
+
+        return time.time()
+
+    def end_wait(self, enter_time, send_custom_reqs=True):
+        """
+        Updates statistics when waiting for a captcha timed out
+
+        :meta private:
+        """
+
+        with self.instance_lock:
+
+            # We refresh the last call since we don't want to record the time spent within the function but the time
+            # between consecutive calls to get_request().
+            self.UseRate['last_time'] = time.time()
+
+    def return_request(self, enter_time, answer, send_custom_reqs=True):
+        """
+        Puts a captcha taken by poll_request() back in response_queue, as if it was never taken
+
+        :meta private:
+        """
+
+        self.counters.add(ReqsUsed=-1)
+        self.response_queue.put(answer)
+        self._notify_changed()
+
+    def poll_request(self, enter_time, send_custom_reqs=True):
+        """
+        Takes a solved captcha from response_queue if there is one, skipping expired ones. Otherwise, sends a request
+        if none are being solved and send_custom_reqs is True
+
+        :param float enter_time: Time at which waiting began
+        :return: The captcha, or None if none are available yet
+        :rtype: dict
+        :meta private:
+        """
+
+        captchas, _ = self._take(1, send_custom_reqs)
+        if not captchas:
+            return None
+
+        self._record_draw(enter_time, 1)
+        return captchas[0]
+
+    def get_requests(self, number, send_custom_reqs=True, max_block=0):
+        """
+        Returns several solved captchas at once. Blocks until that many are ready, or until max_block seconds pass or
+        no more captchas are going to be solved, in which case the captchas received so far are returned instead.
+        Cheaper than calling :meth:`~AutoManager.get_request` as many times.
+
+        :param int number: Number of captchas to return
+        :param bool send_custom_reqs: By default function will send additional captcha requests if there are not
+                                      enough being solved. Set as False to prevent this
+        :param int max_block: Maximum time the function blocks in seconds. Set as 0 to block until enough requests are
+                              received
+        :return: A list of up to number dictionaries, each containing a token under key 'answer'
+        :rtype: list
+
+        Exceptions are raised like :meth:`~AutoManager.get_request` would, but only when no captchas were received at
+        all. If solving a captcha failed, the captchas received before it are returned, and the error is raised by a
+        later call instead.
+        """
+
+        assert number >= 1, 'Argument "number" cannot be less than 1'
+        assert max_block >= 0, f"{max_block} is not a valid value for parameter max_block"
+
+        # The time elapsed since the last call is only recorded once it is known how many captchas it was for
+        with self.instance_lock:
+            self._check_exhausted()
+            interval = time.time() - self.UseRate['last_time']
             self.UseRate['last_time'] = time.time()
 
         enter_time = time.time()
+        captchas = []
 
         while True:
 
             if max_block and time.time() - enter_time >= max_block:
+                break
 
-                # Update stats
-                with self.instance_lock:
+            version = self._version
+            try:
+                taken, error_left = self._take(number - len(captchas), send_custom_reqs, defer_errors=bool(captchas))
+            except Exception as e:
+                if not captchas:
+                    with self.instance_lock:
+                        self._record_use(interval=interval)
+                    raise
+                if not isinstance(e, recaptcha_manager.api.exceptions.Exhausted):
+                    raise
+                break
 
-                    # We refresh the last call since we don't want to record the time spent within the function but
-                    # the time between consecutive calls to get_request().
-                    self.UseRate['last_time'] = time.time()
+            captchas += taken
+            if len(captchas) == number or error_left:
+                break
 
-                raise recaptcha_manager.api.exceptions.TimeOutError
+            with self._changed:
+                timeout = self.IDLE_CHECK
+                if max_block:
+                    timeout = min(timeout, max(max_block - (time.time() - enter_time), 0))
+                self._wait_for_change(version, timeout)
+
+        if not captchas:
+            with self.instance_lock:
+                self._record_use(interval=interval)
+            self.end_wait(enter_time, send_custom_reqs)
+            raise recaptcha_manager.api.exceptions.TimeOutError
+
+        with self.instance_lock:
+            self._record_use(len(captchas), interval)
+        self._record_draw(enter_time, len(captchas))
+        return captchas
+
+    def try_get_request(self):
+        """
+        Returns a solved captcha if one is ready. Unlike :meth:`~AutoManager.get_request`, never waits or sends
+        requests, and only updates statistics if a captcha is returned.
+
+        :return: A dictionary containing the token under key 'answer', or None if no captcha is ready
+        :rtype: dict
+
+        Raises :class:`~recaptcha_manager.api.exceptions.Exhausted` if no more captchas are going to be solved, and
+        the error if solving the captcha failed, like :meth:`~AutoManager.get_request`.
+        """
+
+        enter_time = time.time()
+
+        # Like get_request(), captchas are no longer handed out once the manager is exhausted or was force stopped
+        with self.instance_lock:
+            self._check_exhausted()
+
+        captchas, _ = self._take(1, send_custom_reqs=False)
+        if not captchas:
+            return None
 
+        with self.instance_lock:
+            self._record_use()
+        self._record_draw(enter_time, 1)
+        return captchas[0]
+
+    def _take(self, count, send_custom_reqs, defer_errors=False):
+        """
+        Takes up to count captchas from response_queue, without waiting for more. If fewer are available,
+        sends requests for the rest unless enough are already being solved, or send_custom_reqs is False
+
+        :param bool defer_errors: Whether to leave an error found in response_queue to be raised by a later call,
+                                  instead of raising it. Errors are always left if captchas were taken before them
+        :return: The captchas, and whether an error was left in response_queue
+        :rtype: tuple
+        """
+
+        captchas = []
+        while len(captchas) < count:
             try:
-                c = self.response_queue.get(timeout=2)
+                c = self.response_queue.get(block=False)
             except queue.Empty:
 
-                # If there were no captcha tokens available within 5 seconds, we check if stop_new_requests is False
-                # and whether there are captcha requests being solved. If not, we raise queue.Empty error
-                if self.stop_new_requests and self.response_queue.qsize() + self.ReqsInUnsolvedList == 0:
-                    self.finished = True
-                    raise recaptcha_manager.api.exceptions.Exhausted
+                # Count the captchas which expired, so that requests are sent in their place
+                self._evict()
 
-                # Otherwise, if stop_new_requests is False, then we manually send one request
-                if not self.stop_new_requests and send_custom_reqs and self.ReqsInQueue + self.response_queue.qsize() + \
-                        self.ReqsInUnsolvedList == 0:
+                # Answers are delivered while holding self._changed, so the counters and response_queue cannot change
+                # under us while we look at them
+                with self._changed:
 
-                    # Increment counter since we are adding a request in request queue
-                    with self.instance_lock:
-                        self.ReqsInQueue += 1
+                    # If there are no captcha tokens available, we check if stop_new_requests is False and whether
+                    # there are captcha requests being solved. If not, we raise Exhausted error
+                    if self.stop_new_requests and self.response_queue.qsize() + self.ReqsInUnsolvedList == 0:
+                        if captchas:
+                            break
+                        self.finished = True
+                        raise recaptcha_manager.api.exceptions.Exhausted
 
-                    # Add a request in request_queue
-                    self.request_queue.put(self.create_request(job=self.job))
+                    # Otherwise, if stop_new_requests is False, then we manually send requests for the captchas which
+                    # are still missing
+                    missing = count - len(captchas) - self.ReqsInQueue - self.response_queue.qsize() - \
+                        self.ReqsInUnsolvedList
+                    if not self.stop_new_requests and send_custom_reqs and missing > 0:
 
-            else:  # We got a captcha
+                        # Increment counter since we are adding requests in request queue
+                        self.counters.add(ReqsInQueue=missing)
 
-                if c.get('error') is not None:
-                    with self.instance_lock:
-                        self.UseRate['last_time'] = time.time()
+                        # Add the requests in request_queue
+                        self.request_queue.put(self.create_request(job=self.job, count=missing))
+
+                break
 
-                    raise c['error']
+            # We got a captcha
+            if c.get('error') is not None:
+
+                # Put the error back, so that the captchas already taken are not lost by raising it
+                if captchas or defer_errors:
+                    self.response_queue.put(c)
+                    return captchas, True
 
                 with self.instance_lock:
-                    self.ReqsUsed += 1
+                    self.UseRate['last_time'] = time.time()
 
-                # Captcha is assumed to have NOT expired
-                if time.time() - c['timeSolved'] < 120:
+                raise c['error']
 
-                    # Update stats
-                    with self.instance_lock:
+            # Captchas which expired are never taken from response_queue
+            self.counters.add(ReqsUsed=1)
+            captchas.append(c)
+
+        return captchas, False
 
-                        # Record the amount of time waited to receive captcha
-                        time_waited = time.time() - enter_time
-                        self.WaitingTime['num'] += 1
-                        self.WaitingTime['total_time'] += time_waited
+    def _record_draw(self, enter_time, count):
+        """
+        Updates statistics once captchas have been handed over
+
+        :param float enter_time: Time at which waiting began
+        :param int count: The number of captchas handed over at once
+        """
 
-                        # We refresh the last call since we don't want to record the time spent within the function but
-                        # the time between consecutive calls to get_request().
-                        self.UseRate['last_time'] = time.time()
+        with self.instance_lock:
 
-                    return c
-                else:
-                    # Captcha expired
-                    self.expired += 1
+            # Record the amount of time waited to receive captchas. Each of them was waited for as long as the call
+            time_waited = time.time() - enter_time
+            self.WaitingTime['num'] += count
+            self.WaitingTime['total_time'] += time_waited * count
+            self._sample('WaitingTime', time_waited, count)
+            if self.controller is not None:
+                self.controller.observe_wait(time_waited, count)
+            if self.forecaster is not None:
+                self.forecaster.observe(count)
+
+            # We refresh the last call since we don't want to record the time spent within the function but
+            # the time between consecutive calls to get_request().
+            self.UseRate['last_time'] = time.time()
 
     @ensure_lock
     def _update_stats(self):
@@ -828,6 +2033,12 @@ class AutoManager(BaseRequest):
         Update the usage statistics when we need to use them
         """
 
+        # Managers using estimators keep them up to date as samples are recorded
+        if self.estimators is not None:
+            for stat, estimator in self.estimators.items():
+                getattr(self, stat)['rate'] = estimator.mean
+            return
+
         # First we update WaitingTime['rate']. If the number of times get_request() waited for captcha is 0, then set
         # the rate as 0 as well
         if self.WaitingTime['num'] == 0:
@@ -873,6 +2084,67 @@ class AutoManager(BaseRequest):
                 self.SolveTime['total_time'] -= _num_old * self.SolveTime['rate']
                 self.SolveTime['num'] = self.IDEAL_RECORDS
 
+    @ensure_lock
+    def _service_level_orders(self, initial):
+        """
+        Returns how many requests to send so that a captcha is ready whenever one is required, in service_level of
+        cases. Requests are sent until the captchas available and being solved cover the captchas that will be used
+        while a request sent now is being solved.
+
+        The time a request takes to be solved is taken as the solve time which is only exceeded in 1 - service_level of
+        cases. The number of captchas used during that time is the sum of many gaps between uses, and therefore close
+        to normally distributed, with a mean of time / mean gap and a variance of time * variance of gaps / mean gap
+        cubed. Requests are sent for that number at service_level.
+
+        :param int initial: Number of requests to send if there is not enough data
+        :rtype: int
+        """
+
+        gaps = self.estimators['UseRate']
+        if self._solve_quantile.count == 0 or gaps.mean <= 0:
+            return initial
+
+        lead_time = self._solve_quantile.value
+        mean = lead_time / gaps.mean
+
+        # Demand which changes over time is taken from the forecaster instead, if it has enough history
+        if self.forecaster is not None:
+            now = time.time()
+            forecast = self.forecaster.forecast(now, now + lead_time)
+            if forecast is not None:
+                mean = forecast
+
+        variance = lead_time * gaps.variance / gaps.mean ** 3
+        needed = math.ceil(mean + statistics.NormalDist().inv_cdf(self.service_level) * math.sqrt(variance))
+
+        return needed - self.response_queue.qsize() - self.ReqsInQueue - self.ReqsInUnsolvedList
+
+    @ensure_lock
+    def _forecast_orders(self, final_time):
+        """
+        Returns how many requests to send so that, once a request sent now is solved, the captchas available cover the
+        demand forecast for the horizon after that. Like the prediction from the recent average time between uses, more
+        are only requested once fewer than 5/6 of the horizon would be covered.
+
+        :param float final_time: Seconds a request sent now takes to be solved
+        :return: The number of requests, or None if the forecaster does not have enough history yet
+        :rtype: float
+        """
+
+        now = time.time()
+        solved_at = now + final_time
+        used = self.forecaster.forecast(now, solved_at)
+        refill = self.forecaster.forecast(solved_at, solved_at + self.horizon * 5 / 6)
+        optimal = self.forecaster.forecast(solved_at, solved_at + self.horizon)
+        if None in (used, refill, optimal):
+            return None
+
+        # Captchas left once the requests already sent are solved, and the captchas used until then are taken
+        final_caps = self.response_queue.qsize() + self.ReqsInQueue + self.ReqsInUnsolvedList - used
+        if final_caps >= refill:
+            return 0
+        return optimal - final_caps
+
     def send_request(self, maximum=None, initial=None):
         """
         Predict and send optimal number of captcha requests to server process to minimize waiting time.
@@ -913,32 +2185,56 @@ class AutoManager(BaseRequest):
                     # Before doing any calculations, we update our collected data
                     self._update_stats()
 
-                    # This is the amount of time a request sent now would take to be solved.
-                    final_time = self.SolveTime['rate']
+                    # The time between uses is only known once captchas were used one after another. Until then,
+                    # we send initial number of requests as if there was not enough data
+                    if self.UseRate['rate'] <= 0:
+                        to_send = initial
 
-                    # Its a fair assumption that by the time this request will be added to the response queue,
-                    # all requests currently there in the request queue + unsolved list will be added as well.
-                    # Therefore, final_time seconds later, these all captchas will be added to the response queue
-                    to_add = self.ReqsInQueue + self.ReqsInUnsolvedList
+                    # Managers targeting a service level size orders from the distribution of solve times instead
+                    elif self.service_level is not None:
+                        to_send = self._service_level_orders(initial)
+                        if maximum:
+                            to_send = min(to_send, maximum)
 
-                    # Then we check how many caps will be used by then
-                    to_subtract = final_time // self.UseRate['rate']
+                    else:
+                        # This is the amount of time a request sent now would take to be solved.
+                        final_time = self.SolveTime['rate']
 
-                    # We then find the amount of captchas in the response queue after final_time
-                    final_caps = self.response_queue.qsize() + to_add - to_subtract
+                        # The controller, if any, adjusts the horizon to the waits and expiries observed so far
+                        if self.controller is not None:
+                            self.horizon = self.controller.update(self.ReqsUsed, self.expired)
 
-                    # Now we calculate the amount of time these captchas will require to be used up
-                    total_time = final_caps * self.UseRate['rate']
+                        # Managers with a forecaster predict how many captchas will be used over time from the demand
+                        # expected at that time, once it has enough history
+                        forecast = self._forecast_orders(final_time) if self.forecaster is not None else None
+                        if forecast is not None:
+                            to_send = min(forecast, maximum) if maximum else forecast
 
-                    # Now if the time to use them is below 30s, we can request more captchas to be added. To do this, we
-                    # calculate the optimal amount of captchas there should be after final_time seconds and send the
-                    # difference in the optimum and our calculated value.
-                    if total_time < 25:
-                        optimal_final_caps = 30 // self.UseRate['rate']
-                        if maximum:
-                            to_send = min(optimal_final_caps - final_caps, maximum)
                         else:
-                            to_send = optimal_final_caps - final_caps
+                            # Its a fair assumption that by the time this request will be added to the response
+                            # queue, all requests currently there in the request queue + unsolved list will be added
+                            # as well. Therefore, final_time seconds later, these all captchas will be added to the
+                            # response queue
+                            to_add = self.ReqsInQueue + self.ReqsInUnsolvedList
+
+                            # Then we check how many caps will be used by then
+                            to_subtract = final_time // self.UseRate['rate']
+
+                            # We then find the amount of captchas in the response queue after final_time
+                            final_caps = self.response_queue.qsize() + to_add - to_subtract
+
+                            # Now we calculate the amount of time these captchas will require to be used up
+                            total_time = final_caps * self.UseRate['rate']
+
+                            # Now if the time to use them is below 5/6 of the horizon, we can request more captchas
+                            # to be added. To do this, we calculate the optimal amount of captchas there should be
+                            # after final_time seconds and send the difference in the optimum and our calculated value.
+                            if total_time < self.horizon * 5 / 6:
+                                optimal_final_caps = self.horizon // self.UseRate['rate']
+                                if maximum:
+                                    to_send = min(optimal_final_caps - final_caps, maximum)
+                                else:
+                                    to_send = optimal_final_caps - final_caps
 
             else:
                 # If we don't have enough data, we simply send initial number of requests
@@ -950,16 +2246,55 @@ class AutoManager(BaseRequest):
                 to_send = self.limit - self.ReqsInQueue - self.ReqsInUnsolvedList
 
             # If after adjusting we get a zero or negative value, we return without sending any requests
+            to_send = int(round(to_send))
             if to_send <= 0:
                 return
 
             # Increment counter since we are going to be adding requests in request_queue
-            with self.instance_lock:
-                self.ReqsInQueue += to_send
+            self.counters.add(ReqsInQueue=to_send)
 
-            # Finally, add the calculated number of requests in queue
-            for _ in range(int(round(to_send))):
-                self.request_queue.put(self.create_request(job=self.job))
+            # Finally, add the calculated number of requests in queue. They all go in one message, however many there
+            # are
+            self.request_queue.put(self.create_request(job=self.job, count=to_send))
         except Exception as e:
             msg = "{}\n\nOriginal {}".format(e, traceback.format_exc())
             raise type(e)(msg)
+
+    def reserve(self, count, ready_at, hold=0):
+        """
+        Sends count requests ahead of time, so that their captchas are available at ready_at. Useful when you know in
+        advance that many captchas will be required at once, such as when a job starts at a set time.
+
+        :param int count: Number of captchas required
+        :param float ready_at: Time at which they are required, as a timestamp
+        :param float hold: Seconds after ready_at for which the captchas must still be valid, such as how long the job
+                           takes to use them all. Defaults to 0
+        :return: Time at which the requests are sent, as a timestamp
+        :rtype: float
+
+        The requests are sent all at once, ahead of ready_at by how long all of them take to be solved with a
+        probability of :attr:`RESERVE_CONFIDENCE`, judging by recent solve times. However, they are never sent so early
+        that captchas solved as quickly as recent ones expire before ready_at + hold. Reserved captchas are available
+        to :meth:`~AutoManager.get_request` like any other, and are not counted towards ``limit`` or ``maximum``.
+        """
+
+        assert count >= 1, 'Argument "count" cannot be less than 1'
+        assert 0 <= hold < self.ttl, "hold must be less than the time for which captchas stay valid"
+
+        if self.stop_new_requests:
+            return
+
+        send_at = self._reservation_time(count, ready_at, self.ttl, hold)
+        self._schedule(send_at, self._send_reserved, count)
+        return send_at
+
+    def _send_reserved(self, count):
+        """
+        Sends the requests of a reservation, unless the manager was stopped in the meantime
+        """
+
+        if self.stop_new_requests:
+            return
+
+        self.counters.add(ReqsInQueue=count)
+        self.request_queue.put(self.create_request(job=self.job, count=count))
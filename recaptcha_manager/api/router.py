@@ -0,0 +1,209 @@
+import collections
+import queue
+import time
+from ctypes import c_bool
+from recaptcha_manager.api import multiprocessing
+from recaptcha_manager.api.generators import generate_queue
+from recaptcha_manager.api.services import ServiceGroup, ServiceThread
+from recaptcha_manager.api.tasks import Task
+
+
+class ServiceRouter:
+    """
+    Shares the requests from a request_queue between several services, such as AntiCaptcha and 2Captcha used together.
+    Rather than letting the service which happens to be free first take each request, the router sends every request
+    to the service which is expected to deliver its answer at the lowest overall cost.
+
+    Services are compared by a score, and the lowest scores are preferred. The score adds up:
+
+    - The median time the service recently took to solve a task (LATENCY_WEIGHT per second). A service which has not
+      solved enough tasks yet to tell is scored as if it were instant, so that every service gets tried.
+    - The average cost of the tasks it solved, or its cost attribute if none were solved yet (COST_WEIGHT per unit of
+      cost).
+    - The share of its tasks which ended in an error (ERROR_WEIGHT for a service where every task failed).
+    - The number of tasks it is already registering or solving (LOAD_WEIGHT per task).
+
+    Services which were stopped, or which are already handling max_in_flight tasks, are not sent any more requests.
+    Neither are services whose circuit breaker is open (see BaseService.use_circuit_breaker()), and the requests
+    waiting in their queues are routed to other services instead. While the circuit is half-open, a service is only
+    sent one request at a time.
+    """
+
+    LATENCY_WEIGHT = 1
+    COST_WEIGHT = 1000
+    ERROR_WEIGHT = 60
+    LOAD_WEIGHT = 0.05
+
+    # Longest time the router process blocks without checking whether it was stopped
+    MAX_WAIT = 0.5
+
+    # Seconds to wait before checking again whether a service has room, when all of them are busy
+    BUSY_WAIT = 0.1
+
+    def __init__(self, request_queue, services, max_in_flight=None, proxy_ini=False):
+
+        if not proxy_ini: raise RuntimeError("Routers should be created using the create() method")
+
+        self.request_queue = request_queue
+        self.services = services
+        self.max_in_flight = max_in_flight
+        self._stopped = multiprocessing.Value(c_bool, False)
+
+    @classmethod
+    def create(cls, request_queue, services, max_in_flight=None):
+        """
+        Properly initializes a class instance. Each service is given a queue of its own, which the router fills with
+        requests from request_queue. If request_queue was generated with generate_queue(in_process=True), so are
+        the queues of the services, and the router runs in a thread rather than a process.
+
+        :param request_queue: Queue the managers send their requests to
+        :param list services: Services to share the requests between. They must not be started yet
+        :param int max_in_flight: Maximum number of tasks each service can be registering or solving at once. No limit
+                                  if None (default)
+        :rtype: ServiceRouter
+        """
+
+        assert len(services) > 0, "At least one service must be provided"
+        for service in services:
+            if service.is_alive() or service.is_stopped():
+                raise RuntimeError("Services must not be started before adding them to a router")
+            service.request_queue = generate_queue(in_process=isinstance(request_queue, queue.Queue))
+
+        return cls(request_queue, services, max_in_flight, proxy_ini=True)
+
+    def score(self, service):
+        """
+        Returns the score of a service. Lower is better
+
+        :rtype: float
+        """
+
+        stats = service.get_stats()
+        in_flight = stats['in_flight'] + service.request_queue.qsize()
+
+        if stats['solved'] > 0:
+            cost = stats['cost'] / stats['solved']
+        else:
+            cost = getattr(service, 'cost', 0)
+
+        finished = stats['solved'] + stats['errors']
+        error_rate = stats['errors'] / finished if finished > 0 else 0
+
+        return self.LATENCY_WEIGHT * stats['p50'] + self.COST_WEIGHT * cost + self.ERROR_WEIGHT * error_rate + \
+            self.LOAD_WEIGHT * in_flight
+
+    def choose(self):
+        """
+        Returns the service to send the next request to, or None if no service can take it right now
+
+        :rtype: BaseService
+        """
+
+        best, best_score = None, None
+        for service in self.services:
+            if service.is_stopped():
+                continue
+
+            state = service.circuit_state()
+            if state == 'open' or (state == 'half-open' and service.request_queue.qsize() > 0):
+                continue
+
+            if self.max_in_flight is not None:
+                in_flight = service.get_stats()['in_flight'] + service.request_queue.qsize()
+                if in_flight >= self.max_in_flight:
+                    continue
+
+            score = self.score(service)
+            if best is None or score < best_score:
+                best, best_score = service, score
+
+        return best
+
+    def route(self):
+        """
+        Main function of the router process. Sends the requests from request_queue to the services until the router
+        is stopped, or all services have stopped.
+        """
+
+        # The requests we took but could not send yet because every service was busy. A request for several tasks is
+        # split up, since each of them may be better off with a different service
+        pending = collections.deque()
+        try:
+            while not self._stopped.value:
+                if all(service.is_stopped() for service in self.services):
+                    break
+                self._reclaim()
+
+                if not pending:
+                    try:
+                        pending.extend(Task.unpack(self.request_queue.get(timeout=self.MAX_WAIT)))
+                    except queue.Empty:
+                        continue
+                cap_info = pending[0]
+
+                # If the manager is not taking any more requests then there is no need to send it anywhere
+                if cap_info['manager'].stop_new_requests:
+                    cap_info['manager'].request_cancelled(cap_info['job'], unsolved=False)
+                    pending.popleft()
+                    continue
+
+                # Wait for a service to have room for the request
+                service = self.choose()
+                if service is None:
+                    time.sleep(self.BUSY_WAIT)
+                    continue
+
+                service.request_queue.put(pending.popleft().pack())
+
+            # Requests we took but could not send anywhere must not be left counted as queued
+            for cap_info in pending:
+                cap_info['manager'].request_cancelled(cap_info['job'], unsolved=False)
+
+        finally:
+            self.stop()
+
+    def _reclaim(self):
+        """Takes back the requests waiting for services whose circuit is open, so that they are routed elsewhere"""
+
+        for service in self.services:
+            if service.circuit_state() != 'open':
+                continue
+            while True:
+                try:
+                    self.request_queue.put(service.request_queue.get(block=False))
+                except queue.Empty:
+                    break
+
+    def spawn_process(self, **kwargs):
+        """
+        Starts all services and the router process
+
+        :param kwargs: Passed to the spawn_process() method of each service
+        :returns: All started processes
+        :rtype: ServiceGroup
+        """
+
+        if self._stopped.value:
+            raise RuntimeError('This router has already been stopped and can no longer be used')
+
+        procs = []
+        for service in self.services:
+            proc = service.spawn_process(**kwargs)
+            procs.extend(proc.processes if isinstance(proc, ServiceGroup) else [proc])
+
+        if isinstance(self.request_queue, queue.Queue):
+            router_proc = ServiceThread(target=self.route, kwargs={})
+        else:
+            router_proc = multiprocessing.Process(target=self.route)
+        router_proc.start()
+        procs.append(router_proc)
+        return ServiceGroup(procs)
+
+    def stop(self):
+        """
+        Stops the router and all its services
+        """
+
+        self._stopped.value = True
+        for service in self.services:
+            service.stop()
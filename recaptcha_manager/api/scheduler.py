@@ -0,0 +1,212 @@
+import heapq
+import itertools
+import time
+from collections import deque
+
+
+def _quantile(samples, q, min_samples):
+    """Returns the q-th quantile of samples, or None if there are less than min_samples of them"""
+
+    if len(samples) < min_samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class SolveTimeModel:
+    """
+    Keeps the solve times recently observed for a single kind of captcha, and uses them to decide when a task is worth
+    polling for its answer.
+
+    Until MIN_SAMPLES solve times have been observed, tasks are polled every DEFAULT_INTERVAL seconds. After that, the
+    first poll is made once a task is as old as the FIRST_POLL_QUANTILE of recent solve times. Tasks which are not
+    solved by then are polled every FAST_INTERVAL seconds until they are older than STRAGGLER_QUANTILE of solve times,
+    after which the interval doubles on every poll up to MAX_INTERVAL.
+
+    :meta private:
+    """
+
+    DEFAULT_INTERVAL = 6
+    MIN_SAMPLES = 5
+    SAMPLES = 100
+    FIRST_POLL_QUANTILE = 0.2
+    STRAGGLER_QUANTILE = 0.9
+    MIN_FIRST_POLL = 3
+    FAST_INTERVAL = 2
+    MAX_INTERVAL = 20
+
+    def __init__(self, default_interval=None):
+        if default_interval is not None:
+            self.DEFAULT_INTERVAL = default_interval
+        self.samples = deque(maxlen=self.SAMPLES)
+
+    def add(self, solve_time):
+        """
+        Records the time taken to solve a task
+
+        :param float solve_time: Seconds between the task being registered and being solved
+        """
+
+        self.samples.append(max(solve_time, 0))
+
+    def quantile(self, q):
+        """
+        Returns the q-th quantile of recent solve times, or None if there are too few to tell
+
+        :rtype: float
+        """
+
+        return _quantile(self.samples, q, self.MIN_SAMPLES)
+
+    def first_delay(self):
+        """
+        Returns how long to wait after registering a task before polling it for the first time
+
+        :rtype: float
+        """
+
+        first = self.quantile(self.FIRST_POLL_QUANTILE)
+        if first is None:
+            return self.DEFAULT_INTERVAL
+        return max(first, min(self.MIN_FIRST_POLL, self.DEFAULT_INTERVAL))
+
+    def next_delay(self, age, last_delay):
+        """
+        Returns how long to wait before polling a task again, after a poll found it unsolved
+
+        :param float age: Seconds since the task was registered
+        :param float last_delay: Seconds waited before the last poll
+        :rtype: float
+        """
+
+        straggler = self.quantile(self.STRAGGLER_QUANTILE)
+        if straggler is None:
+            return self.DEFAULT_INTERVAL
+
+        # Most tasks finish within this window, so keep checking often to deliver them soon after they are solved
+        if age < straggler:
+            return min(self.FAST_INTERVAL, straggler - age + self.FAST_INTERVAL)
+
+        # The task is taking longer than almost every other task did, so back off
+        return min(max(last_delay, self.FAST_INTERVAL) * 2, self.MAX_INTERVAL)
+
+
+class PollScheduler:
+    """
+    Decides which registered tasks are due to be polled for answers. Tasks are kept in a min-heap ordered by the time
+    they should next be polled, so that finding the due ones does not require looking at every task. A separate
+    SolveTimeModel is kept for every captcha type.
+
+    Tasks are the dictionaries stored in BaseService.unsolved, and are told apart by identity. Tasks removed through
+    :meth:`discard` are dropped from the heap once they reach its top.
+
+    :meta private:
+    """
+
+    def __init__(self, default_interval=None):
+        self.default_interval = default_interval
+        self.models = {}
+        self._heap = []
+        self._counter = itertools.count()
+
+        # Maps id() of every scheduled task to its heap entry, which is [due, seq, task, delay]
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def model(self, captcha_type):
+        """
+        Returns the solve time model for a captcha type
+
+        :rtype: SolveTimeModel
+        """
+
+        if captcha_type not in self.models:
+            self.models[captcha_type] = SolveTimeModel(self.default_interval)
+        return self.models[captcha_type]
+
+    def quantile(self, q):
+        """
+        Returns the q-th quantile of recent solve times over all captcha types, or None if there are too few to tell
+
+        :rtype: float
+        """
+
+        samples = [sample for model in self.models.values() for sample in model.samples]
+        return _quantile(samples, q, SolveTimeModel.MIN_SAMPLES)
+
+    def _push(self, task, delay, now):
+        entry = [now + delay, next(self._counter), task, delay]
+        self._entries[id(task)] = entry
+        heapq.heappush(self._heap, entry)
+
+    def add(self, task, now=None):
+        """
+        Schedules the first poll of a newly registered task
+
+        :param dict task: The task, which must have a 'job' and a 'startTime'
+        """
+
+        now = time.time() if now is None else now
+        self._push(task, self.model(task['job'].captcha_type).first_delay(), now)
+
+    def reschedule(self, task, now=None):
+        """
+        Schedules another poll for a task that a poll found unsolved
+        """
+
+        now = time.time() if now is None else now
+        entry = self._entries.get(id(task))
+        last_delay = entry[3] if entry is not None else 0
+        delay = self.model(task['job'].captcha_type).next_delay(now - task['startTime'], last_delay)
+        self._push(task, delay, now)
+
+    def discard(self, task):
+        """
+        Stops polling a task
+        """
+
+        entry = self._entries.pop(id(task), None)
+        if entry is not None:
+            entry[2] = None
+
+    def solved(self, task, time_solved, now=None):
+        """
+        Records the time taken to solve a task, and stops polling it
+
+        :param float time_solved: Time at which the service reports the task was solved. Kept between the time the
+                                  task was registered and now, since services do not always report it accurately
+        """
+
+        now = time.time() if now is None else now
+        self.discard(task)
+        time_solved = min(max(time_solved, task['startTime']), now)
+        self.model(task['job'].captcha_type).add(time_solved - task['startTime'])
+
+    def next_due(self):
+        """
+        Returns the time at which the next task should be polled, or None if there are no tasks
+
+        :rtype: float
+        """
+
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """
+        Returns every task that should be polled by now. The tasks stay scheduled until they are rescheduled or
+        discarded, but are not returned again before that
+
+        :rtype: list
+        """
+
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and (self._heap[0][2] is None or self._heap[0][0] <= now):
+            entry = heapq.heappop(self._heap)
+            if entry[2] is not None:
+                due.append(entry[2])
+        return due
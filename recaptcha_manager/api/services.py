@@ -1,14 +1,20 @@
+import copy
 import traceback
 import warnings
 from recaptcha_manager.api import multiprocessing
 from requests_futures.sessions import FuturesSession
 from concurrent.futures._base import Future
+from recaptcha_manager.api.scheduler import PollScheduler
+from recaptcha_manager.api.engines import AsyncSession
+from recaptcha_manager.api.breaker import CircuitBreaker
+from recaptcha_manager.api.tasks import Task
 from recaptcha_manager.api.exceptions import LowBidError, NoBalanceError, BadDomainError, BadAPIKeyError, \
-    BadSiteKeyError, UnexpectedResponse, TimeOutError
-from ctypes import c_bool
+    BadSiteKeyError, UnexpectedResponse, TimeOutError, ServiceUnavailableError
+from ctypes import c_bool, c_int
 import urllib3
+import requests
 import queue
-from time import sleep
+import threading
 import time
 from requests.adapters import HTTPAdapter
 
@@ -21,12 +27,30 @@ class BaseService:
     api_url = None
     PROXY = None
 
+    # Seconds to wait between fetching answers for a task, until enough tasks were solved to know how long they take
+    POLL_INTERVAL = 6
+
+    # Seconds to wait before retrying to register tasks that the solving service did not accept
+    RETRY_INTERVAL = 2
+
+    # Longest time the service process blocks without checking whether it was stopped
+    MAX_WAIT = 0.5
+
+    # Ways in which requests to the solving service can be sent
+    ENGINES = ('threads', 'asyncio')
+
+    # Errors which count as failures of the solving service itself when a circuit breaker is used. LowBidError is
+    # raised when the service has no free workers for our bid
+    UNAVAILABLE_ERRORS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError, ServiceUnavailableError,
+                          LowBidError)
+
     def __init__(self, key, request_queue, proxy_ini=False):
 
         if not proxy_ini: raise RuntimeError("Services should be created using the create() method")
 
         self._stopped = multiprocessing.Value(c_bool, False)
-        self._running = multiprocessing.Value(c_bool, False)
+        self._running = multiprocessing.Value(c_int, 0)
+        self._workers = 1
         self._exc_queue = multiprocessing.Queue()
         self._lock = multiprocessing.Lock()
         self._exc = None
@@ -34,6 +58,16 @@ class BaseService:
         self.unsolved = []
         self.ci_list = []
         self.key = key
+        self._incoming = None
+        self._feeder = None
+        self._feeder_stop = None
+        self._exc_handler = None
+        self._scheduler = PollScheduler(self.POLL_INTERVAL)
+        self._stats = ServiceStats()
+        self._published_in_flight = 0
+        self._hedge = None
+        self._hedge_table = None
+        self._breaker = None
 
     def stop(self):
         """
@@ -49,7 +83,84 @@ class BaseService:
         :rtype: bool
         """
 
-        return self._running.value
+        return self._running.value > 0
+
+    def get_stats(self):
+        """
+        Returns live statistics of the service, combined over all its worker processes: the number of tasks being
+        registered or solved (in_flight), tasks solved (solved), errors when registering or solving tasks (errors),
+        total cost of tasks solved (cost), and the median and 90th percentile of recent solve times in seconds (p50 and
+        p90, 0 until enough tasks are solved).
+
+        If hedging is used, also includes the number of tasks copied to the backup service (hedged) and their estimated
+        cost (hedge_cost), the number of copies this service delivered before the original (hedge_won), and the number
+        of answers this service dropped because the other copy was delivered first (hedge_lost)
+
+        :rtype: dict
+        """
+
+        return self._stats.snapshot()
+
+    def hedge_with(self, backup, percentile=0.95, budget=None):
+        """
+        Enables hedged solving. Whenever a task registered with this service takes longer than the provided
+        percentile of recent solve times, the same captcha is also registered with the backup service. Whichever of
+        the two is solved first is delivered to the manager, and the other one is dropped once it is solved.
+
+        Must be called before starting either service. The backup service should not share its request_queue with this
+        service (create them through a ServiceRouter, for example), otherwise this service may end up taking its own
+        copies.
+
+        :param BaseService backup: Service to register the copies of slow tasks with
+        :param float percentile: Percentile of recent solve times, between 0 and 1, after which tasks are copied
+        :param float budget: Maximum amount to spend on copies, estimated from the cost attribute of the backup
+                             service. No limit if None (default)
+        """
+
+        assert 0 < percentile < 1, "percentile must be between 0 and 1"
+        if self.is_alive() or self.is_stopped() or backup.is_alive() or backup.is_stopped():
+            raise RuntimeError("Hedging must be set up before the services are started")
+
+        table = backup._hedge_table or self._hedge_table or HedgeTable()
+        self._hedge_table = backup._hedge_table = table
+        self._hedge = {'backup': backup, 'percentile': percentile, 'budget': budget, 'cost': getattr(backup, 'cost', 0)}
+
+    def use_circuit_breaker(self, failure_threshold=5, recovery_time=30, max_recovery_time=300):
+        """
+        Enables a circuit breaker, which stops the service from taking new requests while the solving service is
+        failing. Timeouts, connection errors, server errors (HTTP status 5xx) and the solving service reporting that it
+        has no free workers count as failures. These no longer terminate the service process, and are not passed to
+        exc_handler.
+
+        After failure_threshold failures in a row the circuit opens: the service stops taking requests from
+        request_queue, and puts the requests it could not register yet back in it, so that other services sharing
+        request_queue (or a ServiceRouter) can take them. Once recovery_time seconds have passed, a single request is
+        taken as a probe. If it succeeds the service goes back to normal, otherwise the circuit opens again for twice as
+        long, up to max_recovery_time seconds.
+
+        Must be called before starting the service.
+
+        :param int failure_threshold: Number of failures in a row which open the circuit
+        :param float recovery_time: Seconds to wait before probing the solving service again
+        :param float max_recovery_time: Longest time to wait before probing, when probes keep failing
+        """
+
+        if self.is_alive() or self.is_stopped():
+            raise RuntimeError("The circuit breaker must be set up before the service is started")
+        self._breaker = CircuitBreaker(failure_threshold, recovery_time, max_recovery_time)
+
+    def circuit_state(self):
+        """
+        Returns the state of the circuit breaker: 'closed' while requests are taken as usual, 'open' while the solving
+        service is considered unavailable, and 'half-open' while it is being probed. Always 'closed' if no circuit
+        breaker is used
+
+        :rtype: str
+        """
+
+        if self._breaker is None:
+            return 'closed'
+        return self._breaker.state
 
     def is_stopped(self):
         """
@@ -103,7 +214,7 @@ class BaseService:
         will re-raise the exception. Will return the exitcode of the service process.
 
         :returns: service_proc.exitcode. Will be None if the process is not finished yet
-        :param multiprocessing.Process service_proc: The started service process.
+        :param multiprocessing.Process service_proc: The started service process, or ServiceGroup of processes.
         :param max_block: Maximum time to wait. Set as 0 to disable timeout. Default value is 0.
         :param boolean return_exceptions: Whether to raise any exceptions caught from the service process.
         """
@@ -167,6 +278,27 @@ class BaseService:
         # We set the attribute to mark the request as completed and can be safely removed
         response_obj.remove_request = True
 
+    @staticmethod
+    def _append_data_for_overloaded(request, response_obj):
+        """
+        Called when the solving service could not take our task because it has no free workers. The request stays in
+        self.ci_list to be registered again later
+
+        :param requests.Response response_obj: The response object where we are going to append data for this case
+        """
+        response_obj.request = request
+        response_obj.overloaded = True
+
+    def _check_server_error(self, response_obj):
+        """
+        Raises ServiceUnavailableError if the solving service responded with a server error
+
+        :param requests.Response response_obj: The response of the solving service
+        """
+
+        if response_obj.status_code >= 500:
+            raise ServiceUnavailableError(f"{self.name} responded with HTTP status {response_obj.status_code}")
+
     @staticmethod
     def _append_data_for_solved(request, response_obj, answer, time_solved, cost):
         """
@@ -185,7 +317,8 @@ class BaseService:
         # We set the attribute to mark the request as completed and can be safely removed
         response_obj.remove_request = True
 
-    def spawn_process(self, retry=None, exc_handler=None, disable_insecure_warning=True) -> multiprocessing.Process:
+    def spawn_process(self, retry=None, exc_handler=None, disable_insecure_warning=True,
+                      engine='threads', workers=1) -> multiprocessing.Process:
         """
         Wrapper for starting the background service process.
 
@@ -193,10 +326,18 @@ class BaseService:
         :param callable exc_handler: An optional user-defined function which runs whenever an exception occurs. Defaults
                                      to None
         :param boolean disable_insecure_warning: Whether to disable InsecureRequestWarning
+        :param str engine: How requests to the solving service are sent. 'threads' (default) sends them through a pool
+                           of 8 threads. 'asyncio' sends them all on a single event loop, which allows many more
+                           requests in flight at once and requires aiohttp to be installed
+        :param int workers: Number of service processes to start. Each takes requests from request_queue on its own,
+                            sharing the work between them. Defaults to 1
 
-        :returns: Started solving service process
+        :returns: Started solving service process, or a ServiceGroup of the started processes if workers is more than 1
         :rtype: multiprocessing.Process
 
+        If request_queue was generated with generate_queue(in_process=True), the service runs in threads of the
+        calling process rather than in processes of its own. The returned ServiceThread can be used like a process.
+
         The optional exc_handler parameter takes a callable which is called everytime an exception occurs. The
         exception is passed as a parameter to the callable. By default, after the exception occurs and
         exc_handler has been called, the request that raised the exception is retried. However, you can raise the
@@ -206,34 +347,231 @@ class BaseService:
             raise RuntimeError('Service has already been started')
         if self.is_stopped():
             raise RuntimeError('This service has already been stopped and can no longer be used')
+        assert engine in self.ENGINES, "Engine {} not recognized. Only {} are supported".format(engine, self.ENGINES)
+        assert isinstance(workers, int) and workers >= 1, 'Argument "workers" cannot be less than 1'
         if exc_handler is None:
             warnings.warn("No exc_handler specified, any connection errors will result in the termination of service "
                           "process", RuntimeWarning)
 
-        proc = multiprocessing.Process(target=self.requests_manager, kwargs={'retry': retry,
-                                                                             'exc_handler': exc_handler,
-                                                                             'disable_insecure_warning': disable_insecure_warning})
-        proc.start()
-        return proc
+        self._workers = workers
+        kwargs = {'retry': retry, 'exc_handler': exc_handler, 'disable_insecure_warning': disable_insecure_warning,
+                  'engine': engine}
+        procs = []
+        for _ in range(workers):
+            if isinstance(self.request_queue, queue.Queue):
+                # Worker processes each have their own copy of the service, and so must worker threads
+                proc = ServiceThread(target=self._worker_copy().requests_manager, kwargs=kwargs)
+            else:
+                proc = multiprocessing.Process(target=self.requests_manager, kwargs=kwargs)
+            proc.start()
+            procs.append(proc)
+
+        if workers == 1:
+            return procs[0]
+        return ServiceGroup(procs)
+
+    def _worker_copy(self):
+        """
+        Returns a copy of the service for a worker thread. The copy shares the state kept in shared memory with the
+        service, such as whether it was stopped and its statistics, but has its own requests and tasks
+        """
+
+        worker = copy.copy(self)
+        worker.ci_list = []
+        worker.unsolved = []
+        worker._scheduler = copy.deepcopy(self._scheduler)
+        worker._published_in_flight = 0
+        return worker
 
     def _clear_requests(self):
         """
         In case of an error, we clear all requests responsibly, so that manager statistics do not get corrupted
         """
 
+        # Requests that the feeder thread took from request_queue but were not looked at yet must be cancelled as well
+        if self._feeder is not None:
+            self._feeder_stop.set()
+            self._feeder.join()
+            while True:
+                try:
+                    item = self._incoming.get(block=False)
+                except queue.Empty:
+                    break
+                if isinstance(item, list):
+                    self.ci_list.extend(item)
+
+            # Requests still waiting in request_queue were meant for this service as well. The queue may be gone by
+            # now if that is why we are stopping, in which case there is nothing left to cancel
+            try:
+                self._drain_request_queue()
+            except Exception:
+                pass
+
         # Remove any requests that were already taken care of.
         self.unsolved = [request for request in self.unsolved if request is not None]
         self.ci_list = [request for request in self.ci_list if request is not None]
 
         for request in self.ci_list:
-            manager: recaptcha_manager.manager.BaseRequest = request['manager']
-            manager.request_cancelled(request['job'], unsolved=False)
+            if self._owns(request):
+                manager: recaptcha_manager.manager.BaseRequest = request['manager']
+                manager.request_cancelled(request['job'], unsolved=False)
 
         for request in self.unsolved:
-            manager: recaptcha_manager.manager.BaseRequest = request['manager']
-            manager.request_cancelled(request['job'], unsolved=True)
+            if self._owns(request):
+                manager: recaptcha_manager.manager.BaseRequest = request['manager']
+                manager.request_cancelled(request['job'], unsolved=True)
+
+    def _owns(self, request, solved=False):
+        """
+        Decides whether the outcome of a task should be reported to its manager. A hedged task is solved by two
+        services, and only the first one to report on it may do so. Copies only report answers, since the original
+        task accounts for anything else that happens to them.
+
+        :param dict request: The task
+        :param bool solved: Whether the task was solved
+        :rtype: bool
+        """
+
+        if 'hedge' not in request:
+            return True
+        if request.get('hedgeCopy') and not solved:
+            return False
+        return self._hedge_table.claim(request['hedge'])
+
+    def _feed_requests(self):
+        """
+        Runs in a thread of the service process. Blocks on request_queue and hands the tasks of every request over to
+        the main loop as soon as it arrives, so that the main loop never has to poll request_queue.
+        """
+
+        while not self._feeder_stop.is_set():
+
+            # No requests are taken while the circuit is open
+            if self._breaker is not None and not self._breaker.admits():
+                self._feeder_stop.wait(self.MAX_WAIT)
+                continue
+
+            try:
+                cap_info = self.request_queue.get(timeout=self.MAX_WAIT)
+
+                # When requests are shared with other workers, or only a probe may be sent, we keep a single task of a
+                # request for several and leave the rest to be taken
+                if cap_info[2] > 1 and (self._workers > 1 or self.circuit_state() != 'closed'):
+                    cap_info, rest = Task.split(cap_info)
+                    self.request_queue.put(rest)
+
+                # Setting up the tasks may ask the manager for the job, which is better done here than in the main loop
+                tasks = Task.unpack(cap_info)
+            except queue.Empty:
+                # If this was meant to be a probe, another worker may send it instead
+                if self._breaker is not None:
+                    self._breaker.release()
+                continue
+            except Exception as e:
+                # Let the main loop raise it, since exceptions in this thread would otherwise go unnoticed
+                self._incoming.put(e)
+                return
+
+            self._incoming.put(tasks)
+
+    def _process_events(self, timeout):
+        """
+        Waits up to timeout seconds for something to happen, then handles everything that has happened so far. New
+        requests are appended to self.ci_list, and the responses of the solving service are handled as soon as they
+        arrive, in the order they arrive.
+
+        :param float timeout: Maximum time to wait in seconds if nothing happens
+        """
 
-    def requests_manager(self, exc_handler=None, retry=None, disable_insecure_warning=True):
+        block = True
+        while True:
+            try:
+                item = self._incoming.get(block=block, timeout=min(max(timeout, 0), self.MAX_WAIT))
+            except queue.Empty:
+                return
+
+            # Once something arrived, only take what is already there without waiting any further
+            block = False
+
+            if isinstance(item, BaseException):
+                raise item
+
+            # A future completed, so we run the handler it was sent with
+            elif isinstance(item, tuple):
+                handler, args = item
+                handler(*args)
+
+            else:
+                self.ci_list.extend(item)
+
+                # When several workers share request_queue, each takes requests one at a time through its feeder so
+                # that a burst of requests is shared between them. The same goes for a circuit breaker probing the
+                # solving service with a single request
+                if self._workers == 1 and self.circuit_state() == 'closed':
+                    self._drain_request_queue()
+
+    def _notify_when_done(self, future, handler, *args):
+        """
+        Makes the main loop call handler(*args, future) once the future completes. Callbacks run in the threads of
+        the session, so they only pass the future over to the main loop.
+        """
+
+        future.add_done_callback(lambda f: self._incoming.put((handler, args + (f,))))
+
+    def _publish_in_flight(self, in_flight=None):
+        """Updates the number of tasks this worker is registering or solving in the statistics of the service"""
+
+        if in_flight is None:
+            in_flight = len(self.ci_list) + len(self.unsolved)
+        if in_flight != self._published_in_flight:
+            self._stats.add(in_flight=in_flight - self._published_in_flight)
+            self._published_in_flight = in_flight
+
+    def _record_outcome(self, error=None):
+        """
+        Records whether a request to the solving service succeeded with the circuit breaker, if one is used.
+
+        :param Exception error: The exception raised while sending the request, if any
+        :return: Whether the error was a failure of the solving service, which the circuit breaker takes care of
+        :rtype: bool
+        """
+
+        if self._breaker is None:
+            return False
+        if error is None:
+            self._breaker.record_success()
+            return False
+        if not isinstance(error, self.UNAVAILABLE_ERRORS):
+            return False
+
+        self._stats.add(errors=1)
+        self._breaker.record_failure()
+        return True
+
+    def _fail_over(self):
+        """
+        Puts the requests which are waiting to be registered back in request_queue, for other services to take while
+        the circuit is open
+        """
+
+        waiting = [request for request in self.ci_list if not request.get('inFlight')]
+        if not waiting:
+            return
+
+        self.ci_list = [request for request in self.ci_list if request.get('inFlight')]
+        for request in waiting:
+            self.request_queue.put(request.pack())
+
+    def _drain_request_queue(self):
+        """Appends every request waiting in request_queue to self.ci_list, without blocking"""
+
+        while True:
+            try:
+                self.ci_list.extend(Task.unpack(self.request_queue.get(block=False)))
+            except queue.Empty:
+                return
+
+    def requests_manager(self, exc_handler=None, retry=None, disable_insecure_warning=True, engine='threads'):
         """
         Main function responsible for reading requests from request_queue and sending tasks to appropriate solving
         services.
@@ -241,217 +579,334 @@ class BaseService:
         :param callable exc_handler: An optional user-defined function which runs whenever an exception occurs.
         :param requests.packages.urllib3.util.retry.Retry retry: Retry object to be added to each request
         :param boolean disable_insecure_warning: Whether to disable urllib3.exceptions.InsecureRequestWarning
+        :param str engine: Either 'threads' or 'asyncio'. See spawn_process()
 
 
         Keep in mind that this function blocks until the service is stopped. Therefore, if you are calling this
         method directly, it must be started in a different process than the main program.
         """
         try:
-            self._running.value = True
-            self.session = FuturesSession(max_workers=8)
+            with self._running.get_lock():
+                self._running.value += 1
+            self._exc_handler = exc_handler
+
+            # Both sessions return futures and run response hooks in the same way, so the adapters of services work
+            # with either
+            if engine == 'asyncio':
+                self.session = AsyncSession(retry=retry)
+            else:
+                self.session = FuturesSession(max_workers=8)
 
-            if retry:
-                self.session.mount('http://', HTTPAdapter(max_retries=retry))
-                self.session.mount('https://', HTTPAdapter(max_retries=retry))
+                if retry:
+                    self.session.mount('http://', HTTPAdapter(max_retries=retry))
+                    self.session.mount('https://', HTTPAdapter(max_retries=retry))
 
             if disable_insecure_warning:
                 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+            # Requests are read from request_queue by a separate thread, and responses of the solving service are
+            # passed over by the futures once they complete. Both arrive through self._incoming, so that we can wait
+            # for them and for the next poll of answers at the same time
+            self._incoming = queue.Queue()
+            self._feeder_stop = threading.Event()
+            self._feeder = threading.Thread(target=self._feed_requests, daemon=True)
+            self._feeder.start()
+
+            # Times at which we next fetch answers for registered tasks, and retry registering tasks the service did
+            # not accept. None if there is nothing to do. Registered tasks are polled on their own schedule, which
+            # self._scheduler keeps track of
+            next_poll = None
+            next_retry = None
+
             # This stopped's value can be modified through parent process from outer scope to end this process here
             while not self._stopped.value:
 
-                # Get all requests submitted to requestsQueue and append them to the list self.ci_list
-                while True:
-                    try:
-                        # cap_info is a dictionary containing a manager and time when it was
-                        # added to request_queue. Example: {'manager':..., 'timeRequested':...}
-
-                        cap_info = self.request_queue.get(block=False)
-                    except queue.Empty:
-                        break
-                    else:
-                        self.ci_list.append(cap_info)
-
-                # If there are no requests then sleep
-                if len(self.ci_list) + len(self.unsolved) == 0:
-                    sleep(3)
-
-                # This variable will store the futures received from requests-futures when sending captcha request to
-                # service
-                temp = []
-
-                # Remove any requests in self.ci_list if they were marked completed (None)
-                self.ci_list = [request for request in self.ci_list if request is not None]
-
-                # In here we create and send a list of futures from self.ci_list
-                for index, request in enumerate(self.ci_list):
-
-                    # This contains the manager which created the request
-                    inst = request['manager']
-
-                    # If the manager is not taking any more requests then mark the request as completed in self.ci_list
-                    if inst.stop_new_requests:
-                        self.ci_list[index] = None
-                        inst.request_cancelled(request['job'], unsolved=False)
-                        continue
-
-                    # Create a future using requests-futures to send captcha tasks concurrently and append it to temp list
-                    future_request = self._api_register_request(request)
-                    temp.append(future_request)
-
-                # Then we wait for all futures to complete by iterating over temp
-                for i, future in enumerate(temp):
-                    try:
-                        response = future.result()
-
-                    except (NoBalanceError, LowBidError, BadAPIKeyError, UnexpectedResponse):
-                        raise
-
-                    except Exception as e:
-                        # If an exc_handler function is present and an exception occurs, we run that function first
-                        if exc_handler:
-                            exc_handler(e)
-                            continue
-                        else:
-                            raise
-
-                    try:
-                        # remove_request is an attribute added to response after a captcha task has been signalled to
-                        # be safe to remove from self.ci_list. It's worth noting that being safe to remove does not
-                        # necessarily mean that the request has been successfully registered with the captcha solving
-                        # service. For that, it's value (True/False) is also required (check below).
-                        response.remove_request
-
-                    except AttributeError:
-                        continue
-
-                    else:
-                        # We mark the request as completed
-                        self.ci_list[i] = None
-
-                        # This means that the request was successfully registered and completed
-                        if response.remove_request is True:
-                            self._add_unsolved_task(response)
-
-                        # This means that the request had faulty configuration. Therefore, we log it and raise whenever
-                        # it is requested again through the manager
-                        elif response.remove_request is False:
-                            self._add_error(response)
-
-                        continue
-
-                # Remove all completed requests from ci_list
-                self.ci_list = [request for request in self.ci_list if request is not None]
-
-                # Get answers for captcha tasks produced. Wait here to prevent too many requests
-                if len(self.unsolved) > 0:
-                    sleep(6)
-                    self._captcha_get_answer(exc_handler=exc_handler)
-                else:
-                    sleep(2)
+                # Wait until a new request arrives, a response comes back, or it's time to fetch answers or retry
+                # registrations. cap_info is a dictionary containing a manager and the details of the captcha task.
+                # Example: {'manager':..., 'job':...}
+                deadlines = [deadline for deadline in (next_poll, next_retry) if deadline is not None]
+                self._process_events(min(deadlines) - time.time() if deadlines else self.MAX_WAIT)
+
+                # While the solving service is unavailable, other services may register our waiting requests
+                if self.circuit_state() == 'open':
+                    self._fail_over()
+                self._publish_in_flight()
+
+                # Requests which could not be registered before are retried only once the retry interval has passed,
+                # unless new requests arrived which we register (and retry along with) right away
+                waiting = [request for request in self.ci_list if not request.get('inFlight')]
+                if any(not request.get('attempted') for request in waiting) or \
+                        (next_retry is not None and time.time() >= next_retry):
+                    self._register_requests(waiting)
+                    next_retry = None
+                if next_retry is None and any(not request.get('inFlight') for request in self.ci_list):
+                    next_retry = time.time() + self.RETRY_INTERVAL
+
+                # Fetch answers for the captcha tasks which are due to be polled
+                next_poll = self._scheduler.next_due()
+                if next_poll is not None and time.time() >= next_poll:
+                    self._captcha_get_answer()
+                    next_poll = self._scheduler.next_due()
 
         except Exception as e:
             msg = "{}\n\nOriginal {}".format(e, traceback.format_exc())
             self._exc_queue.put((e, msg))
         finally:
             self._clear_requests()
-            self._running.value = False
+            self._publish_in_flight(0)
+            if isinstance(self.session, AsyncSession):
+                self.session.close()
+            with self._running.get_lock():
+                self._running.value -= 1
             self._stopped.value = True
 
-    def _captcha_get_answer(self, exc_handler):
-        """Requests answer from captcha service for produced captcha tasks"""
+    def _register_requests(self, requests):
+        """
+        Sends the provided requests from self.ci_list to the solving service. The responses are handled by
+        self._registered() as they arrive.
+
+        :param list requests: Requests in self.ci_list which are not being registered already
+        """
+
+        for request in requests:
 
-        # This will store the futures received from request-futures when asking for answers of produced captcha tasks
-        # from service
-        temp = []
+            # This contains the manager which created the request
+            inst = request['manager']
+
+            # If the manager is not taking any more requests then remove the request from self.ci_list
+            if inst.stop_new_requests:
+                self.ci_list = [other for other in self.ci_list if other is not request]
+                if self._owns(request):
+                    inst.request_cancelled(request['job'], unsolved=False)
+                continue
+
+            # Create a future using requests-futures to send captcha tasks concurrently
+            request['attempted'] = True
+            request['inFlight'] = True
+            self._notify_when_done(self._api_register_request(request), self._registered, request)
+
+    def _registered(self, request, future):
+        """Handles the response of the solving service to registering a request"""
+
+        request['inFlight'] = False
+        try:
+            response = future.result()
+
+        except (NoBalanceError, LowBidError, BadAPIKeyError, UnexpectedResponse) as e:
+            # The request stays in self.ci_list, to be registered again or failed over once the circuit opens
+            if self._record_outcome(e):
+                return
+            raise
+
+        except Exception as e:
+            if self._record_outcome(e):
+                return
+
+            # If an exc_handler function is present and an exception occurs, we run that function first
+            if self._exc_handler:
+                self._stats.add(errors=1)
+                self._exc_handler(e)
+                return
+            else:
+                raise
+
+        # A service with no free workers counts as a failure, although the request is simply retried later
+        if getattr(response, 'overloaded', False):
+            self._record_outcome(ServiceUnavailableError(f"{self.name} has no free workers"))
+        else:
+            self._record_outcome()
+
+        try:
+            # remove_request is an attribute added to response after a captcha task has been signalled to
+            # be safe to remove from self.ci_list. It's worth noting that being safe to remove does not
+            # necessarily mean that the request has been successfully registered with the captcha solving
+            # service. For that, it's value (True/False) is also required (check below).
+            response.remove_request
+
+        except AttributeError:
+            return
+
+        # We remove the request from self.ci_list
+        self.ci_list = [other for other in self.ci_list if other is not request]
+
+        # This means that the request was successfully registered and completed
+        if response.remove_request is True:
+            self._add_unsolved_task(response)
+
+        # This means that the request had faulty configuration. Therefore, we log it and raise whenever
+        # it is requested again through the manager
+        elif response.remove_request is False and self._owns(request):
+            self._add_error(response)
+
+    def _captcha_get_answer(self):
+        """
+        Requests answer from captcha service for produced captcha tasks which are due to be polled. The responses are
+        handled by self._answered() as they arrive.
+        """
 
         for index, request in enumerate(self.unsolved):
             manager: BaseRequest = request['manager']
             if manager.finished is True:
                 self.unsolved[index] = None
-                manager.request_cancelled(job=request['job'], unsolved=True)
+                self._scheduler.discard(request)
+                request['cancelled'] = True
+                if self._owns(request):
+                    manager.request_cancelled(job=request['job'], unsolved=True)
+
+            # The other copy of a hedged task was already delivered, so there is no use in solving this one
+            elif 'hedge' in request and self._hedge_table.settled(request['hedge']):
+                self.unsolved[index] = None
+                self._scheduler.discard(request)
+                request['cancelled'] = True
+                self._stats.add(hedge_lost=1)
+
+            elif self._hedge is not None and 'hedge' not in request:
+                self._hedge_task(request)
 
         self.unsolved = [request for request in self.unsolved if request is not None]
 
-        # Unsolved stores the captcha tasks and their details registered with the service. We iterate over this and
-        # create list of futures that fetch the answers for the captcha tasks
+        # Unsolved stores the captcha tasks and their details registered with the service. We only fetch answers for
+        # the ones the scheduler expects could be solved by now. Services may fetch several of them in one request
+        due = self._scheduler.pop_due()
+        if due:
+            for requests, future in self._api_fetch_answers(due):
+                self._notify_when_done(future, self._answered, requests)
 
-        for index, request in enumerate(self.unsolved):
-            future_request = self._api_fetch_answer(request)
-            temp.append(future_request)
+    def _answered(self, requests, future):
+        """Handles the response of the solving service to fetching the answers of the provided tasks"""
 
-        # We then wait for the futures to resolve
-        for index, future in enumerate(temp):
-            try:
-                response = future.result()
+        # Tasks which were cancelled while we waited for the response were already taken care of
+        requests = [request for request in requests if not request.get('cancelled')]
 
-            except UnexpectedResponse:
-                raise
+        try:
+            response = future.result()
 
-            except Exception as e:
-                # If an exc_handler function is present and an exception occurs, we run that function first
-                if exc_handler:
-                    exc_handler(e)
-                    continue
-                else:
-                    raise e from None
+        except UnexpectedResponse:
+            raise
+
+        except Exception as e:
+            if self._record_outcome(e):
+                for request in requests:
+                    self._scheduler.reschedule(request)
+                return
+
+            # If an exc_handler function is present and an exception occurs, we run that function first
+            if self._exc_handler:
+                self._stats.add(errors=1)
+                self._exc_handler(e)
+                for request in requests:
+                    self._scheduler.reschedule(request)
+                return
+            else:
+                raise e from None
+
+        self._record_outcome()
+
+        # Tasks which were solved or failed, by id()
+        completed = set()
 
+        # A response covering many tasks lists the status of each in its batch attribute. The statuses are matched to
+        # tasks through their request attribute, not their position
+        for status in getattr(response, 'batch', [response]):
             try:
                 # remove_request is an attribute added to response after a task has been successfully solved with the
                 # service. If this is not there then the request was not solved and we cannot mark it as completed in
                 # self.unsolved
-                response.remove_request
+                status.remove_request
 
             except AttributeError:
                 continue
 
-            else:
-                # We mark the request as completed
-                self.unsolved[index] = None
-
-                if response.remove_request is True:
-                    # We got the answer so we add the details to the relevant manager
-                    self._add_solved_task(response)
+            request = status.request
+            if request.get('cancelled'):
+                continue
 
-                elif response.remove_request is False:
-                    # This means there was an error in solving this request, hence we remove it and add it back to be
-                    # solved later
-                    manager: recaptcha_manager.manager.BaseRequest = response.request['manager']
-                    manager.request_failed(job=response.request['job'])
+            # We mark the request as completed
+            completed.add(id(request))
+
+            if status.remove_request is True:
+                # We got the answer so we add the details to the relevant manager, and learn how long it took
+                self._scheduler.solved(request, status.time_solved)
+                self._stats.add(solved=1, cost=status.cost or 0)
+                self._stats.set(p50=self._scheduler.quantile(0.5) or 0, p90=self._scheduler.quantile(0.9) or 0)
+
+                # If this is a hedged task and the other copy was delivered first, the answer is dropped
+                # Statistics are updated before delivering, so that whoever receives the answer sees them
+                if self._owns(request, solved=True):
+                    if request.get('hedgeCopy'):
+                        self._stats.add(hedge_won=1)
+                    self._add_solved_task(status)
+                else:
+                    self._stats.add(hedge_lost=1)
+
+            elif status.remove_request is False:
+                # This means there was an error in solving this request, hence we remove it and add it back to be
+                # solved later
+                self._scheduler.discard(request)
+                self._stats.add(errors=1)
+                if self._owns(request):
+                    manager: recaptcha_manager.manager.BaseRequest = request['manager']
+                    manager.request_failed(job=request['job'])
+
+        # Tasks which are not solved yet are polled again later
+        for request in requests:
+            if id(request) not in completed:
+                self._scheduler.reschedule(request)
 
         # We remove completed tasks from self.unsolved list
-        self.unsolved = [request for request in self.unsolved if request is not None]
+        if completed:
+            self.unsolved = [request for request in self.unsolved if id(request) not in completed]
+
+    def _hedge_task(self, request):
+        """Registers a copy of the task with the backup service if it is taking too long, and the budget allows it"""
+
+        threshold = self._scheduler.model(request['job'].captcha_type).quantile(self._hedge['percentile'])
+        if threshold is None or time.time() - request['startTime'] < threshold:
+            return
+
+        budget = self._hedge['budget']
+        if budget is not None and self._stats.get('hedge_cost') + self._hedge['cost'] > budget:
+            return
+
+        request['hedge'] = self._hedge_table.arm()
+        self._hedge['backup'].request_queue.put(request.pack(hedge=request['hedge']))
+        self._stats.add(hedged=1, hedge_cost=self._hedge['cost'])
 
     def _add_unsolved_task(self, response_obj):
         request = response_obj.request
         inst: recaptcha_manager.manager.BaseRequest = request['manager']
-        inst.request_created()
-        self.unsolved.append({'task_id': response_obj.captcha_id, 'startTime': time.time(), 'manager': inst,
-                              'timeRequested': time.time()-5, 'job': request['job']})
+        task = Task(request.ref, request.job_id, hedge=request.hedge if request.hedgeCopy else None,
+                    task_id=response_obj.captcha_id, startTime=time.time(), timeRequested=time.time()-5)
+
+        # Copies of hedged tasks are already counted by the original
+        if not request.get('hedgeCopy'):
+            inst.request_created()
+
+        self.unsolved.append(task)
+        self._scheduler.add(task)
 
     @staticmethod
     def _add_solved_task(response_obj):
         request = response_obj.request
         manager: recaptcha_manager.manager.BaseRequest = request['manager']
-        manager.response_queue.put(
+
+        # The manager counts the task as solved and hands the answer over to whoever is waiting for it at once
+        manager.deliver(
             {'captcha_id': request['task_id'], 'answer': response_obj.answer, 'error': None,
              'timeSolved': response_obj.time_solved, 'cost': response_obj.cost, 'timeDelivered': time.time(),
-             'timeRequested': request['timeRequested'], 'batch_id': request['job'].batch_id})
-
-        # We call requestsSolved to edit relevant counters.
-        manager.request_solved(response_obj.time_solved - request['timeRequested'])
+             'timeRequested': request['timeRequested'], 'batch_id': request['job'].batch_id},
+            response_obj.time_solved - request['timeRequested'])
 
     @staticmethod
     def _add_error(response_obj):
         request = response_obj.request
         manager: recaptcha_manager.manager.BaseRequest = request['manager']
-        manager.response_queue.put(
+
+        # The manager counts the task as done and hands the error over to whoever is waiting for it at once
+        manager.deliver(
             {'timeDelivered': time.time(), 'error': response_obj.error,
              'timeRequested': time.time(), 'batch_id': request['job'].batch_id})
 
-        # We call requestsSolved to edit relevant counters.
-        manager.request_solved(error=True)
-
     def _api_parse_request(self, d):
         raise NotImplementedError
 
@@ -464,12 +919,192 @@ class BaseService:
     def _api_fetch_answer(self, request):
         raise NotImplementedError
 
+    def _api_fetch_answers(self, requests):
+        """
+        Fetches the status of several tasks. Services which can report the status of many tasks in one request should
+        override this. By default, the status of each task is fetched separately through self._api_fetch_answer().
+
+        :param list requests: Tasks to fetch the status of
+        :returns: List of (tasks, future) pairs. Each future resolves to the response for the tasks paired with it. A
+                  response covering a single task is handled like the ones from self._api_fetch_answer(). A response
+                  covering more tasks should have a 'batch' attribute, listing a TaskStatus for every task whose status
+                  changed
+        :rtype: list
+        """
+
+        return [([request], self._api_fetch_answer(request)) for request in requests]
+
+
+class ServiceStats:
+    """
+    Statistics of a service, which all its worker processes update and any process can read
+
+    :meta private:
+    """
+
+    FIELDS = ('in_flight', 'solved', 'errors', 'cost', 'p50', 'p90', 'hedged', 'hedge_cost', 'hedge_won',
+              'hedge_lost')
+
+    def __init__(self):
+        self._array = multiprocessing.Array('d', len(self.FIELDS))
+        self._index = {field: i for i, field in enumerate(self.FIELDS)}
+
+    def add(self, **deltas):
+        with self._array.get_lock():
+            for field, delta in deltas.items():
+                self._array[self._index[field]] += delta
+
+    def set(self, **values):
+        with self._array.get_lock():
+            for field, value in values.items():
+                self._array[self._index[field]] = value
+
+    def get(self, field):
+        return self._array[self._index[field]]
+
+    def snapshot(self):
+        """
+        :rtype: dict
+        """
+
+        with self._array.get_lock():
+            return dict(zip(self.FIELDS, self._array[:]))
+
+
+class HedgeTable:
+    """
+    Keeps track of which hedged tasks were already delivered, so that only the first of the two copies of a task is.
+    Shared between a service and its backup.
+
+    Every hedged task gets a token, stored in one of SIZE slots. The slot holds the token while neither copy has been
+    delivered, and its negative once one has. Slots are reused once SIZE more tasks are hedged. If both copies of a
+    task are still unsettled by then, both are delivered, since dropping both would lose the task.
+
+    :meta private:
+    """
+
+    SIZE = 4096
+
+    def __init__(self):
+        self._slots = multiprocessing.Array('q', self.SIZE)
+        self._last = multiprocessing.Value('q', 0)
+
+    def arm(self):
+        """
+        Returns the token for a newly hedged task
+
+        :rtype: int
+        """
+
+        with self._slots.get_lock():
+            self._last.value += 1
+            token = self._last.value
+            self._slots[token % self.SIZE] = token
+        return token
+
+    def claim(self, token):
+        """
+        Marks the task as settled. Returns False if it already was
+
+        :rtype: bool
+        """
+
+        with self._slots.get_lock():
+            if self._slots[token % self.SIZE] == -token:
+                return False
+            if self._slots[token % self.SIZE] == token:
+                self._slots[token % self.SIZE] = -token
+            return True
+
+    def settled(self, token):
+        """
+        Whether the task was already settled
+
+        :rtype: bool
+        """
+
+        return self._slots[token % self.SIZE] == -token
+
+
+class ServiceGroup:
+    """
+    The processes started by spawn_process() when more than one worker is requested. Can be used in place of a single
+    process, including with BaseService.safe_join(). All workers stop together, once the service is stopped or any of
+    them raises an exception.
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+
+    def join(self, timeout=None):
+        """
+        Waits for all worker processes to finish, for at most timeout seconds in total
+
+        :param timeout: Maximum time to wait in seconds. Waits until all processes finish if None
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        for proc in self.processes:
+            proc.join(timeout=None if deadline is None else max(deadline - time.time(), 0))
+
+    def is_alive(self):
+        """
+        :return: Whether any of the worker processes is still running
+        :rtype: bool
+        """
+
+        return any(proc.is_alive() for proc in self.processes)
+
+    @property
+    def exitcode(self):
+        """
+        None if any worker process is still running. Otherwise, the first non-zero exitcode of the worker processes, or
+        0 if all of them exited normally
+        """
+
+        exitcodes = [proc.exitcode for proc in self.processes]
+        if None in exitcodes:
+            return None
+        return next((exitcode for exitcode in exitcodes if exitcode != 0), 0)
+
+
+class ServiceThread(threading.Thread):
+    """
+    Thread a service or router runs in when it is used within a single process. Can be used in place of a process,
+    including with BaseService.safe_join()
+    """
+
+    def __init__(self, target, kwargs):
+        super().__init__(target=target, kwargs=kwargs, daemon=True)
+
+    @property
+    def exitcode(self):
+        """
+        None if the service is still running, 0 otherwise. Exceptions raised by the service are available through
+        BaseService.get_exception(), like for processes
+        """
+
+        return None if self.is_alive() else 0
+
+
+class TaskStatus:
+    """
+    Stands in for a response object for a single task, when the status of many tasks is fetched in one request
+
+    :meta private:
+    """
+
+    pass
+
 
 class DummyFuture:
 
     def __init__(self, exc=None):
         self.exc = exc
 
+    def add_done_callback(self, fn):
+        fn(self)
+
     def result(self):
         if self.exc is None:
             return self
@@ -558,6 +1193,7 @@ class AntiCaptcha(BaseService):
 
             # This converts the response from the service's server to json. If request is successful, errorCode
             # doesn't exist, and we give the default value of None
+            self._check_server_error(response_obj)
             response_json = response_obj.json()
             error_code = response_json.get('errorCode', None)
 
@@ -616,6 +1252,7 @@ class AntiCaptcha(BaseService):
 
             # This converts the response from the service's server to json. If request is successful, errorCode
             # doesn't exist and we give the default value of None
+            self._check_server_error(response_obj)
             response_json = response_obj.json()
             error_code = response_json.get('errorCode', None)
 
@@ -712,6 +1349,9 @@ class TwoCaptcha(BaseService):
     cost = 0.003
     ID = 3421
 
+    # Maximum number of task ids whose status is fetched in one request
+    BATCH_SIZE = 100
+
     @classmethod
     def create_service(cls, key, request_queue):
         """
@@ -749,6 +1389,7 @@ class TwoCaptcha(BaseService):
 
             # This converts the response from the service's server to json. If request is successful, errorCode
             # doesn't exist and we give the default value of None
+            self._check_server_error(response_obj)
             response_json = response_obj.json()
             error_code = response_json['request']
 
@@ -761,8 +1402,9 @@ class TwoCaptcha(BaseService):
 
             elif error_code == 'ERROR_NO_SLOT_AVAILABLE':
 
-                # This happens when the there are too many captchas already being solved.
-                pass
+                # This happens when the there are too many captchas already being solved. The request is registered
+                # again later
+                self._append_data_for_overloaded(request, response_obj)
 
             elif error_code == 'ERROR_ZERO_BALANCE':
                 raise NoBalanceError('Balance insufficient')
@@ -800,43 +1442,89 @@ class TwoCaptcha(BaseService):
 
         def response_hook(response_obj, *args, **kwargs):
 
-            # This is the manager which created the request.
-            manager: recaptcha_manager.manager.BaseRequest = request['manager']
-
             # This converts the response from the service's server to json. If request is successful, errorCode
             # doesn't exist and we give the default value of None
+            self._check_server_error(response_obj)
             response_json = response_obj.json()
-            error_code = response_json['request']
 
             # Now we check the status of the captcha request based on what the server responded with
             if response_json['status'] == 1:
-                # We successfully got the g-recaptcha response. We add this to the response_queue along with the time
-                # it was solved, the time it was added to response_queue, id of the task and the cost for the captcha
-                answer = response_json['request']
-                cost = self.cost
-                time_solved = time.time() - 3
+                # We successfully got the g-recaptcha response
+                self._parse_status(request, response_obj, response_json['request'], solved=True)
+            else:
+                self._parse_status(request, response_obj, response_json['request'])
 
-                self._append_data_for_solved(request, response_obj, answer, time_solved, cost)
+            # We have to return this new response because we are adding an attribute (remove_request) if the request
+            # was successfully registered
+            return response_obj
+
+        return response_hook
 
-            elif error_code == 'ERROR_CAPTCHA_UNSOLVABLE':
+    def _api_parse_answers(self, requests):
+        """This factory function handles the response from the captcha service when requesting the status of several
+           tasks at once. It returns a response hook which uses the API provided by the service.
 
-                # For some reason, our captcha wasn't solved. So we mark the request as completed but add it back to
-                # the request_queue so that it can be registered again after we edit the relevant counters
-                self._append_data_for_failed(request, response_obj)
+           :param list requests: The tasks whose status was requested, in the order their ids were sent
+           :return: Response hook to be used with requests-futures
+           :rtype: method
+           :raises:
+                BadAPIKeyError: When server reports API Key is invalid
+                UnexpectedResponse: When the server responds with an unidentified error code
+        """
 
-            elif error_code == 'CAPCHA_NOT_READY':
-                # Still not solved
-                pass
+        def response_hook(response_obj, *args, **kwargs):
 
-            else:
+            # The server reports the status of every task, separated by '|' in the same order as the ids were sent.
+            # A status is the answer itself if the task was solved, and an error code otherwise
+            self._check_server_error(response_obj)
+            response_json = response_obj.json()
+            statuses = response_json['request'].split('|')
+
+            if response_json['request'] in ['ERROR_KEY_DOES_NOT_EXIST', 'ERROR_WRONG_USER_KEY']:
+                raise BadAPIKeyError('API Key provided is incorrect')
+
+            if len(statuses) != len(requests):
                 raise UnexpectedResponse('Unidentified status provided by server: {}'.format(response_json))
 
-            # We have to return this new response because we are adding an attribute (remove_request) if the request
-            # was successfully registered
+            response_obj.batch = []
+            for request, status in zip(requests, statuses):
+                task_status = TaskStatus()
+                solved = status not in ['CAPCHA_NOT_READY', 'ERROR_CAPTCHA_UNSOLVABLE'] and \
+                    not status.startswith('ERROR')
+                self._parse_status(request, task_status, status, solved=solved)
+                response_obj.batch.append(task_status)
+
             return response_obj
 
         return response_hook
 
+    def _parse_status(self, request, response_obj, status, solved=False):
+        """
+        Appends the status of a task reported by the server to a response object
+
+        :param dict request: The task whose status was reported
+        :param response_obj: The object where we are going to append data for this task
+        :param str status: The answer if the task was solved, otherwise the error code reported by the server
+        :param bool solved: Whether the task was solved
+        """
+
+        if solved:
+            # We add the answer along with the time it was solved and the cost for the captcha
+            self._append_data_for_solved(request, response_obj, status, time.time() - 3, self.cost)
+
+        elif status == 'ERROR_CAPTCHA_UNSOLVABLE':
+
+            # For some reason, our captcha wasn't solved. So we mark the request as completed but add it back to
+            # the request_queue so that it can be registered again after we edit the relevant counters
+            self._append_data_for_failed(request, response_obj)
+
+        elif status == 'CAPCHA_NOT_READY':
+            # Still not solved
+            pass
+
+        else:
+            raise UnexpectedResponse('Unidentified status provided by server: {}'.format(status))
+
     def _api_register_request(self, request):
         """Uses the captcha service API to create and send a request for task creation to server. The request is sent
            asynchronously and is attached with a response hook from self._api_parse_request() function
@@ -886,6 +1574,30 @@ class TwoCaptcha(BaseService):
         r = self.session.post(data, verify=False, timeout=7, hooks={'response': self._api_parse_answer(request)})
         return r
 
+    def _api_fetch_answers(self, requests):
+        """Fetches the status of tasks in batches of up to BATCH_SIZE ids per request. Each request is sent
+           asynchronously and is attached with a response hook from self._api_parse_answers() function
+
+           :param list requests: Tasks to fetch the status of
+           :returns: List of (tasks, future) pairs
+           :rtype: list"""
+
+        futures = []
+        for start in range(0, len(requests), self.BATCH_SIZE):
+            batch = requests[start:start + self.BATCH_SIZE]
+
+            # There is no need for the bulk endpoint if there is a single task
+            if len(batch) == 1:
+                futures.append((batch, self._api_fetch_answer(batch[0])))
+                continue
+
+            ids = ','.join(str(request['task_id']) for request in batch)
+            data = self.api_url + "res.php?key={}&action=get&ids={}&json=1".format(self.key, ids)
+            r = self.session.post(data, verify=False, timeout=7, hooks={'response': self._api_parse_answers(batch)})
+            futures.append((batch, r))
+
+        return futures
+
 
 class CapMonster(AntiCaptcha):
     """
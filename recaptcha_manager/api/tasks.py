@@ -0,0 +1,135 @@
+import os
+from recaptcha_manager.api import multiprocessing
+from recaptcha_manager.api.manager import PROXY_TYPES, BaseRequest
+
+# Proxies of the managers and copies of the jobs seen by this process so far, so that each is only set up once. Keyed
+# by the reference of the manager, and by the reference of the manager and the job id respectively
+_managers = {}
+_jobs = {}
+_pid = None
+
+
+def _check_pid():
+    """Proxies inherited by a forked child must not be shared with the parent, so caches start empty in every process"""
+
+    global _pid
+    if _pid != os.getpid():
+        _managers.clear()
+        _jobs.clear()
+        _pid = os.getpid()
+
+
+def resolve_manager(ref):
+    """
+    Returns a proxy of the manager a request was sent by
+
+    :param tuple ref: The reference of the manager, as found in requests. See BaseRequest.create_request()
+    :rtype: BaseRequest
+    """
+
+    # Managers used within a single process are referred to directly
+    if isinstance(ref, BaseRequest):
+        return ref
+
+    _check_pid()
+    if ref not in _managers:
+        typeid, address, ident = ref
+        token = multiprocessing.managers.Token(typeid, address, ident)
+        _managers[ref] = PROXY_TYPES[typeid](token, 'pickle')
+    return _managers[ref]
+
+
+def resolve_job(ref, job_id):
+    """
+    Returns the job with the given id, which was registered with the manager
+
+    :rtype: CaptchaJob
+    """
+
+    if isinstance(ref, BaseRequest):
+        return ref.get_job(job_id)
+
+    _check_pid()
+    if (ref, job_id) not in _jobs:
+        _jobs[(ref, job_id)] = resolve_manager(ref).get_job(job_id)
+    return _jobs[(ref, job_id)]
+
+
+class Task:
+    """
+    Record of a single captcha task kept by services, from the time its request is taken from request_queue until it
+    is solved. Fields are stored in slots to keep the record small, but can also be accessed like the keys of a
+    dictionary, as in request['job'], for the adapters of services. A field is only considered present (as in
+    'hedge' in request) if it is not None.
+
+    Requests travel through request_queue as tuples of (manager reference, job id, count, hedge token), which are much
+    smaller to send than the manager proxy and job themselves. See BaseRequest.create_request()
+
+    :meta private:
+    """
+
+    __slots__ = ('ref', 'job_id', 'manager', 'job', 'attempted', 'inFlight', 'cancelled', 'hedge', 'hedgeCopy',
+                 'task_id', 'startTime', 'timeRequested')
+
+    def __init__(self, ref, job_id, hedge=None, **fields):
+        for field in self.__slots__:
+            setattr(self, field, None)
+        self.ref = ref
+        self.job_id = job_id
+        self.manager = resolve_manager(ref)
+        self.job = resolve_job(ref, job_id)
+        if hedge is not None:
+            self.hedge, self.hedgeCopy = hedge, True
+        for field, value in fields.items():
+            setattr(self, field, value)
+
+    @classmethod
+    def unpack(cls, request):
+        """
+        Returns a task for each of the captcha tasks a request taken from request_queue asks for
+
+        :param tuple request: The request
+        :rtype: list
+        """
+
+        ref, job_id, count, hedge = request
+        return [cls(ref, job_id, hedge=hedge) for _ in range(count)]
+
+    @staticmethod
+    def split(request):
+        """
+        Splits a request for several captcha tasks into one for a single task and one for the rest
+
+        :rtype: tuple
+        """
+
+        ref, job_id, count, hedge = request
+        return (ref, job_id, 1, hedge), (ref, job_id, count - 1, hedge)
+
+    def pack(self, hedge=None):
+        """
+        Returns a request for the same captcha task, to be put in request_queue
+
+        :param int hedge: Token of the hedged task this is a copy of, if any
+        :rtype: tuple
+        """
+
+        if hedge is None and self.hedgeCopy:
+            hedge = self.hedge
+        return self.ref, self.job_id, 1, hedge
+
+    def __getitem__(self, field):
+        value = getattr(self, field, None) if field in self.__slots__ else None
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __setitem__(self, field, value):
+        setattr(self, field, value)
+
+    def __contains__(self, field):
+        return field in self.__slots__ and getattr(self, field) is not None
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None) if field in self.__slots__ else None
+        return default if value is None else value
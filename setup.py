@@ -14,14 +14,19 @@ setup(
     long_description_content_type="text/markdown",
     classifiers=[
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.5",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
+        "Programming Language :: Python :: 3.12",
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
         "Natural Language :: English",
         "Operating System :: Microsoft :: Windows",
     ],
-    python_requires='>=3.5',
+    python_requires='>=3.8',
     packages=['recaptcha_manager', 'recaptcha_manager.api'],
     install_requires=['requests-futures >=1.0.0',
-                      'multiprocess']
+                      'multiprocess'],
+    extras_require={'asyncio': ['aiohttp >=3.7']}
 )
@@ -1,13 +1,19 @@
 import recaptcha_manager.configuration
-from recaptcha_manager.api import AutoManager, generate_queue
+from recaptcha_manager.api import AutoManager, generate_queue, EWMA, SlidingWindow, HorizonController, TimeOfDayProfile
+import asyncio
 import queue
 import time
+import threading
 import unittest
 from recaptcha_manager.api import multiprocessing
 import recaptcha_manager.api.exceptions as exc
 from recaptcha_manager.api.services import DummyService
 
 
+class FastDummyService(DummyService):
+    POLL_INTERVAL = 0.5
+
+
 def worker_send(manager):
     manager.send_request(initial=1)
 
@@ -78,7 +84,10 @@ class TestAutoManager(unittest.TestCase):
                 l.append(request_queue.get(block=None))
             except queue.Empty:
                 break
-        self.assertEqual(5, len(l))
+
+        # All requests are sent in a single message
+        self.assertEqual(1, len(l))
+        self.assertEqual(5, l[0][2])
 
     def test_create_restore_point(self):
         import copy
@@ -95,6 +104,240 @@ class TestAutoManager(unittest.TestCase):
         inst.restore()
         self.assertEqual(inst.UseRate, original)
 
+    def test_get_requests(self):
+        request_queue = generate_queue()
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2')
+        service = FastDummyService.create_service('key', request_queue)
+        proc = service.spawn_process(workers=2)
+
+        # Requests are sent for all the captchas missing
+        captchas = manager.get_requests(4, max_block=20)
+        self.assertEqual(len(captchas), 4)
+        self.assertEqual(manager.get_used(), 4)
+        self.assertEqual(manager.UseRate['num'], 4)
+        self.assertEqual(manager.WaitingTime['num'], 4)
+
+        with self.assertRaises(exc.TimeOutError):
+            manager.get_requests(2, send_custom_reqs=False, max_block=1)
+
+        # Fewer are returned once no more are going to be solved
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2')
+        manager.send_request()
+        while manager.ReqsInQueue:
+            time.sleep(0.1)
+        manager.stop()
+        self.assertEqual(len(manager.get_requests(3, max_block=20)), 1)
+        with self.assertRaises(exc.Exhausted):
+            manager.get_requests(3)
+
+        service.stop()
+        proc.join()
+
+    def test_try_get_request(self):
+        request_queue = generate_queue()
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2')
+
+        # Requests are not sent when there are none being solved
+        self.assertIsNone(manager.try_get_request())
+        self.assertEqual(manager.being_solved(), 0)
+
+        service = FastDummyService.create_service('key', request_queue)
+        proc = service.spawn_process()
+        manager.send_request()
+        while manager.available() != 1:
+            time.sleep(0.1)
+        self.assertEqual(manager.try_get_request()['answer'], 'answer')
+        self.assertIsNone(manager.try_get_request())
+        self.assertEqual(manager.get_used(), 1)
+        self.assertEqual(manager.UseRate['num'], 1)
+
+        manager.stop()
+        with self.assertRaises(exc.Exhausted):
+            manager.try_get_request()
+
+        service.stop()
+        proc.join()
+
+        # Captchas already solved are discarded once the manager is force stopped
+        manager = AutoManager.create(generate_queue(in_process=True), 'https://s', '', 'v2')
+        manager.response_queue.put({'answer': 'answer', 'error': None, 'timeSolved': time.time()})
+        manager.force_stop()
+        with self.assertRaises(exc.Exhausted):
+            manager.try_get_request()
+        with self.assertRaises(exc.Exhausted):
+            manager.get_request()
+
+    def test_expiry(self):
+        request_queue = generate_queue()
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2', ttl=1)
+        service = FastDummyService.create_service('key', request_queue)
+        proc = service.spawn_process()
+        manager.send_request()
+        while manager.get_solved() != 1:
+            time.sleep(0.1)
+
+        # Expired captchas are no longer counted as available, and are discarded in the background
+        time.sleep(1)
+        self.assertEqual(manager.available(), 0)
+        start = time.time()
+        while manager.get_expired() != 1:
+            self.assertLess(time.time() - start, 10)
+            time.sleep(0.5)
+
+        # Requests are sent in their place
+        manager.get_request(max_block=20)
+        self.assertEqual(manager.get_used(), 1)
+
+        service.stop()
+        proc.join()
+
+    def test_estimator(self):
+        request_queue = generate_queue(in_process=True)
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2', initial=3, estimator=EWMA(half_life=5))
+        service = FastDummyService.create_service('key', request_queue)
+        service.spawn_process()
+
+        manager.send_request()
+        for _ in range(3):
+            time.sleep(0.2)
+            manager.get_request(max_block=20)
+
+        # Each statistic has an estimator of its own, which the rates are taken from
+        self.assertEqual(manager.estimators['SolveTime'].count, 3)
+        self.assertEqual(manager.estimators['UseRate'].count, 3)
+        self.assertEqual(manager.estimators['WaitingTime'].count, 3)
+        self.assertEqual(manager.get_solving_time(), manager.estimators['SolveTime'].mean)
+        self.assertEqual(manager.get_use_rate(), manager.estimators['UseRate'].mean)
+        self.assertGreater(manager.get_use_rate(), 0)
+
+        # Restore points restore the estimator as well
+        manager.create_restore_point()
+        manager.get_requests(2, max_block=20)
+        self.assertEqual(manager.estimators['UseRate'].count, 5)
+        manager.restore()
+        self.assertEqual(manager.estimators['UseRate'].count, 3)
+
+        service.stop()
+
+    def test_batch_use_rate(self):
+        request_queue = generate_queue(in_process=True)
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2', estimator=SlidingWindow(size=1))
+        service = FastDummyService.create_service('key', request_queue)
+        service.spawn_process(workers=4)
+
+        # Captchas used at once share the time since the last call, so that no gaps of zero are recorded
+        time.sleep(1)
+        manager.get_requests(4, max_block=20)
+        self.assertEqual(manager.estimators['UseRate'].count, 4)
+        self.assertGreater(manager.get_use_rate(), 0.2)
+        manager.send_request()
+        service.stop()
+
+        # Until the time between uses is known, initial number of requests are sent
+        manager = AutoManager.create(generate_queue(in_process=True), 'https://s', '', 'v2', initial=2)
+        manager.counters.add(ReqsUsed=3)
+        manager.send_request()
+        self.assertEqual(manager.ReqsInQueue, 2)
+
+    def test_service_level(self):
+        request_queue = generate_queue(in_process=True)
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2', service_level=0.95)
+
+        # Solve times of 20-29s, and a captcha used every 1-2s
+        for i in range(50):
+            manager.record_solve_time(20 + i % 10)
+        with manager.instance_lock:
+            for i in range(20):
+                manager.estimators['UseRate'].add(1 + i % 2, now=0)
+        manager.counters.add(ReqsUsed=3)
+
+        # 19 captchas are used on average during the 95th percentile of solve times, give or take 1.5
+        manager.send_request()
+        self.assertEqual(manager.ReqsInQueue, 22)
+
+        # Requests being solved count towards the target
+        manager.send_request()
+        self.assertEqual(manager.ReqsInQueue, 22)
+        manager.send_request(maximum=1)
+        self.assertEqual(manager.ReqsInQueue, 22)
+
+    def test_horizon(self):
+        def orders(**kwargs):
+            manager = AutoManager.create(generate_queue(in_process=True), 'https://s', '', 'v2', **kwargs)
+
+            # A captcha used every second, each solved in 10s
+            with manager.instance_lock:
+                manager.UseRate.update(num=10, total_time=10)
+                manager.SolveTime.update(num=1, total_time=10)
+            manager.counters.add(ReqsUsed=3)
+            manager.send_request()
+            return manager
+
+        # Requests are sent for the captchas used while they are solved, and HORIZON seconds worth on top
+        manager = orders()
+        self.assertEqual(manager.get_horizon(), 30)
+        self.assertEqual(manager.ReqsInQueue, 40)
+
+        manager = orders(controller=HorizonController(horizon=60))
+        self.assertEqual(manager.get_horizon(), 60)
+        self.assertEqual(manager.ReqsInQueue, 70)
+
+        # The horizon is not tuned beyond how long captchas stay valid
+        self.assertEqual(manager.controller.max_horizon, 120)
+
+    def test_forecaster(self):
+        manager = AutoManager.create(generate_queue(in_process=True), 'https://s', '', 'v2',
+                                     forecaster=TimeOfDayProfile(bucket=10, period=60))
+        with manager.instance_lock:
+            manager.UseRate.update(num=10, total_time=10)
+            manager.SolveTime.update(num=1, total_time=10)
+        manager.counters.add(ReqsUsed=3)
+
+        # Without history, the average time between uses is assumed to continue
+        manager.send_request()
+        self.assertEqual(manager.ReqsInQueue, 40)
+
+        # 20 captchas were used every 10s over the last period. The 20 used while a request is solved and the 60 used
+        # over the horizon after that are requested
+        manager = AutoManager.create(generate_queue(in_process=True), 'https://s', '', 'v2',
+                                     forecaster=TimeOfDayProfile(bucket=10, period=60))
+        with manager.instance_lock:
+            manager.UseRate.update(num=10, total_time=10)
+            manager.SolveTime.update(num=1, total_time=10)
+            now = time.time()
+            for i in range(6):
+                manager.forecaster.observe(20, now=now - 60 + i * 10)
+        manager.counters.add(ReqsUsed=3)
+        manager.send_request()
+        self.assertEqual(manager.ReqsInQueue, 80)
+
+        # Captchas handed over are recorded by the forecaster
+        manager.counters.add(ReqsInQueue=-80)
+        manager.response_queue.put({'answer': 'answer', 'error': None, 'timeSolved': time.time()})
+        manager.get_request(send_custom_reqs=False)
+        self.assertEqual(manager.forecaster._count, 1)
+
+    def test_reserve(self):
+        request_queue = generate_queue(in_process=True)
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2', ttl=50)
+
+        # Without solve times, requests are sent as early as they can be without captchas expiring
+        now = time.time()
+        self.assertAlmostEqual(manager.reserve(5, now + 200, hold=10), now + 160, delta=0.5)
+
+        # Requests are sent ahead of ready_at by the time all of them are solved in, with solve times of 20-39s
+        for solve_time in range(20, 40):
+            manager._solve_times.add(solve_time)
+        now = time.time()
+        self.assertAlmostEqual(manager.reserve(5, now + 40), now + 1, delta=0.5)
+        self.assertEqual(manager.ReqsInQueue, 0)
+        time.sleep(1.5)
+        self.assertEqual(manager.ReqsInQueue, 5)
+        self.assertEqual(request_queue.get(block=False)[2], 5)
+
+        # But not so early that captchas solved in 20s expire
+        self.assertAlmostEqual(manager.reserve(1, now + 100, hold=35), now + 65, delta=0.5)
+
     def test_statistics(self):
         request_queue = generate_queue()
         manager = AutoManager.create(request_queue, 'https://s', '', 'v2')
@@ -148,5 +391,53 @@ class TestAutoManager(unittest.TestCase):
         service.stop()
         proc.join()
 
+    def test_wakeup(self):
+        request_queue = generate_queue()
+        manager = AutoManager.create(request_queue, 'http://test.com', '', 'v2')
+        threading.Timer(1, manager.stop).start()
+
+        # Stopping the manager wakes up get_request() right away
+        start = time.time()
+        with self.assertRaises(exc.Exhausted):
+            manager.get_request(send_custom_reqs=False, max_block=20)
+        self.assertLess(time.time() - start, 1.5)
+
+        # As does an answer being delivered
+        manager = AutoManager.create(request_queue, 'http://test.com', '', 'v2')
+        service = FastDummyService.create_service('key', request_queue)
+        threading.Timer(1, lambda: service.spawn_process(exc_handler=print)).start()
+        start = time.time()
+        manager.get_request(max_block=20)
+        self.assertLess(time.time() - start, 3)
+        service.stop()
+
+    def test_async(self):
+        request_queue = generate_queue()
+        service = FastDummyService.create_service('key', request_queue)
+        service.spawn_process(exc_handler=print)
+        manager = AutoManager.create(request_queue, 'http://test.com', '', 'v2', initial=20)
+
+        async def consume():
+            await manager.asend_request()
+
+            # Many coroutines can wait at once, and each of them gets a captcha of its own
+            answers = await asyncio.gather(*[manager.aget_request(max_block=20) for _ in range(20)])
+            self.assertEqual(len({id(c) for c in answers}), 20)
+            self.assertEqual(manager.get_used(), 20)
+
+            with self.assertRaises(exc.TimeOutError):
+                await manager.aget_request(send_custom_reqs=False, max_block=1)
+
+            # Iteration stops once the manager is exhausted
+            other = AutoManager.create(request_queue, 'http://test.com', '', 'v2', initial=3)
+            await other.asend_request()
+            while other.ReqsInQueue:
+                await asyncio.sleep(0.1)
+            other.stop()
+            return [c async for c in other.aiter_requests(max_block=20)]
+
+        self.assertEqual(len(asyncio.run(consume())), 3)
+        service.stop()
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,61 @@
+import unittest
+import time
+from recaptcha_manager.api.breaker import CircuitBreaker
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open(self):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_time=30)
+        self.assertFalse(breaker.record_failure())
+        self.assertFalse(breaker.record_failure())
+
+        # A success resets the count, since only failures in a row open the circuit
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertTrue(breaker.admits())
+
+        self.assertTrue(breaker.record_failure())
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.admits())
+
+    def test_recovery(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.5, max_recovery_time=0.8)
+        breaker.record_failure()
+        time.sleep(0.6)
+        self.assertEqual(breaker.state, 'half-open')
+
+        # Only a single probe is let through
+        self.assertTrue(breaker.admits())
+        self.assertFalse(breaker.admits())
+
+        # The probe failed, so the circuit opens for longer
+        self.assertTrue(breaker.record_failure())
+        time.sleep(0.6)
+        self.assertEqual(breaker.state, 'open')
+        time.sleep(0.3)
+        self.assertEqual(breaker.state, 'half-open')
+
+        # The probe succeeded
+        self.assertTrue(breaker.admits())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertTrue(breaker.admits())
+        self.assertTrue(breaker.admits())
+
+    def test_release(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.5)
+        breaker.record_failure()
+        time.sleep(0.6)
+        self.assertTrue(breaker.admits())
+        breaker.release()
+        self.assertTrue(breaker.admits())
+
+        # A probe whose outcome never comes is given up on
+        time.sleep(0.6)
+        self.assertTrue(breaker.admits())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from recaptcha_manager.api.controller import HorizonController
+
+
+def simulate(controller, steps=200):
+    # Captchas are waited for when less than 20s worth are kept, and expire more often the more are kept beyond that
+    used = expired = 0
+    horizons = []
+    for step in range(1, steps + 1):
+        controller.observe_wait(max(0, 20 - controller.horizon) / 4, count=10)
+        used += 100
+        expired += round(max(0, controller.horizon - 20))
+        horizons.append(controller.update(used, expired, now=step * controller.interval))
+    return horizons
+
+
+class TestHorizonController(unittest.TestCase):
+    def test_adjustments(self):
+        controller = HorizonController(target_wait=1, target_expired=0.05, horizon=30, interval=10, gain=0.2)
+
+        # Nothing changes before interval seconds pass
+        self.assertEqual(controller.update(0, 0, now=0), 30)
+        controller.observe_wait(5)
+        self.assertEqual(controller.update(10, 0, now=5), 30)
+
+        # Long waits raise the horizon
+        self.assertAlmostEqual(controller.update(10, 0, now=10), 36)
+
+        # Expiries lower it
+        self.assertAlmostEqual(controller.update(20, 10, now=20), 28.8)
+
+        # Meeting both targets lowers it slowly, and it is not adjusted when no captchas were used
+        self.assertAlmostEqual(controller.update(30, 10, now=30), 27.36)
+        self.assertAlmostEqual(controller.update(30, 10, now=40), 27.36)
+
+    def test_bounds(self):
+        controller = HorizonController(horizon=10, min_horizon=8, max_horizon=11, interval=1)
+        controller.update(0, 0, now=0)
+        controller.update(1, 1, now=1)
+        self.assertEqual(controller.horizon, 8)
+        controller.observe_wait(10)
+        controller.update(2, 1, now=2)
+        controller.observe_wait(10)
+        controller.update(3, 1, now=3)
+        self.assertEqual(controller.horizon, 11)
+
+    def test_convergence(self):
+        # Settles just above the smallest horizon which meets the waiting time target, whether starting too high or
+        # too low
+        for horizon in (5, 100):
+            controller = HorizonController(target_wait=1, target_expired=0.05, horizon=horizon, min_horizon=1,
+                                           max_horizon=120)
+            horizons = simulate(controller)
+            for horizon in horizons[-50:]:
+                self.assertGreater(horizon, 14)
+                self.assertLess(horizon, 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+from recaptcha_manager.api import multiprocessing, generate_queue, AutoManager, ManualManager
+from recaptcha_manager.api.counters import SharedCounters
+from recaptcha_manager.api.services import DummyService
+
+
+def worker_add(manager, n):
+    for _ in range(n):
+        manager.counters.add(ReqsSolved=1, ReqsUsed=2)
+
+
+def worker_created(manager, n):
+    for _ in range(n):
+        manager.request_created()
+
+
+def worker_solved(manager, n):
+    for _ in range(n):
+        manager.request_solved(10)
+
+
+def worker_counters(name, rows, n):
+    counters = SharedCounters.attach(name, claim=lambda pid: rows.get())
+    for _ in range(n):
+        counters.add(ReqsUsed=1)
+
+
+class FewRowCounters(SharedCounters):
+    MAX_WRITERS = 3
+
+
+class TestSharedCounters(unittest.TestCase):
+    def test_add(self):
+        counters = SharedCounters.create()
+        try:
+            counters.add(ReqsInQueue=5)
+            counters.add(ReqsInQueue=-2, ReqsInUnsolvedList=2)
+            self.assertEqual(counters.get('ReqsInQueue'), 3)
+            self.assertEqual(counters.get('ReqsInUnsolvedList'), 2)
+            self.assertEqual(counters.get('ReqsSolved'), 0)
+        finally:
+            counters.unlink()
+
+    def test_claim_row(self):
+        counters = SharedCounters.create()
+        try:
+            attached = SharedCounters.attach(counters.name, claim=counters.claim_row)
+            attached.add(expired=1)
+            counters.add(expired=1)
+            self.assertEqual(attached.get('expired'), 2)
+            with self.assertRaises(RuntimeError):
+                attached.claim_row()
+        finally:
+            counters.unlink()
+
+    def test_multiple_proc(self):
+        request_queue = generate_queue()
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2')
+
+        tasks = []
+        for _ in range(3):
+            tasks.append(multiprocessing.Process(target=worker_add, args=(manager, 100)))
+            tasks[-1].start()
+        for task in tasks:
+            task.join()
+
+        self.assertEqual(manager.get_solved(), 300)
+        self.assertEqual(manager.get_used(), 600)
+
+    def test_fork_after_write(self):
+        request_queue = generate_queue()
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2')
+
+        # Writing before forking gives the parent a row, which the children inherit and must not reuse
+        manager.request_created()
+        tasks = []
+        for _ in range(4):
+            tasks.append(multiprocessing.Process(target=worker_created, args=(manager, 2000)))
+            tasks[-1].start()
+        for task in tasks:
+            task.join()
+
+        self.assertEqual(manager.ReqsInUnsolvedList, 8001)
+        self.assertEqual(manager.being_solved(), 0)
+        self.assertEqual(manager._callmethod('__getattribute__', ('ReqsInUnsolvedList',)), 8001)
+
+    def test_request_solved(self):
+        request_queue = generate_queue()
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2')
+        task = multiprocessing.Process(target=worker_solved, args=(manager, 3))
+        task.start()
+        task.join()
+
+        self.assertEqual(manager.get_solved(), 3)
+        self.assertEqual(manager.ReqsInUnsolvedList, -3)
+        self.assertEqual(manager.get_solving_time(), 10)
+
+    def test_service_process(self):
+        request_queue = generate_queue()
+        manager = ManualManager.create(request_queue)
+        batch_id = manager.send_request('https://test.com', 'key', 'v2', number=3)
+        service = DummyService.create_service('key', request_queue)
+        proc = service.spawn_process()
+        for _ in range(3):
+            manager.get_request(batch_id, max_block=10)
+
+        self.assertEqual(manager.being_solved(), 0)
+        self.assertEqual(manager.being_solved(batch_id), 0)
+        self.assertEqual(manager.get_solved(), 3)
+        self.assertEqual(manager.get_used(), 3)
+
+        service.stop()
+        proc.join()
+
+    def test_reclaim_rows(self):
+        counters = FewRowCounters.create()
+        try:
+            # Only two rows are free besides the one of the creator, so rows of exited processes must be reused
+            rows = multiprocessing.Queue()
+            for _ in range(4):
+                task = multiprocessing.Process(target=worker_counters, args=(counters.name, rows, 5))
+                task.start()
+                rows.put(counters.claim_row(task.pid))
+                task.join()
+            self.assertEqual(counters.get('ReqsUsed'), 20)
+        finally:
+            counters.unlink()
+
+    def test_flags(self):
+        request_queue = generate_queue()
+        manager = AutoManager.create(request_queue, 'https://s', '', 'v2')
+        self.assertFalse(manager.stop_new_requests)
+        manager.stop()
+        self.assertTrue(manager.stop_new_requests)
+        self.assertFalse(manager.finished)
+        manager.force_stop()
+        self.assertTrue(manager.finished)
+
+
+if __name__ == '__main__':
+    unittest.main()
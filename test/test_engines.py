@@ -0,0 +1,121 @@
+import unittest
+import json
+import time
+import threading
+import requests
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from recaptcha_manager.api import TwoCaptcha, ManualManager, generate_queue
+from recaptcha_manager.api.engines import AsyncSession, aiohttp
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Stands in for the 2Captcha API. Every request takes DELAY seconds to answer"""
+
+    DELAY = 0
+
+    def do_POST(self):
+        time.sleep(self.DELAY)
+        if self.path.startswith('/in.php'):
+            body = {'status': 1, 'request': '1234'}
+        elif self.path.startswith('/res.php'):
+            ids = parse_qs(urlparse(self.path).query).get('ids', ['0'])[0].split(',')
+            body = {'status': 1, 'request': '|'.join('token' for _ in ids)}
+        else:
+            body = {'status': 0, 'request': 'ERROR_WRONG_USER_KEY'}
+
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class SlowHandler(Handler):
+    DELAY = 1
+
+
+class FastTwoCaptcha(TwoCaptcha):
+    POLL_INTERVAL = 0.5
+
+
+def start_server(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}/'.format(server.server_address[1])
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class TestAsyncSession(unittest.TestCase):
+    def setUp(self):
+        self.server, self.url = start_server(SlowHandler)
+        self.session = AsyncSession()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_hooks(self):
+        def hook(response, *args, **kwargs):
+            response.parsed = response.json()['request']
+            return response
+
+        response = self.session.post(self.url + 'in.php', verify=False, timeout=7,
+                                     hooks={'response': hook}).result()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.parsed, '1234')
+
+    def test_concurrency(self):
+        # Each request takes a second, so these only finish quickly if they are all in flight at once
+        start = time.time()
+        futures = [self.session.post(self.url + 'res.php', timeout=7) for _ in range(100)]
+        for future in futures:
+            self.assertEqual(future.result().json()['request'], 'token')
+        self.assertLess(time.time() - start, 5)
+
+    def test_errors(self):
+        future = self.session.post(self.url + 'res.php', timeout=0.1)
+        with self.assertRaises(requests.exceptions.Timeout):
+            future.result()
+
+        future = self.session.post('http://127.0.0.1:1/', timeout=1)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            future.result()
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class TestAsyncEngine(unittest.TestCase):
+    def test_service(self):
+        server, url = start_server(Handler)
+        try:
+            request_queue = generate_queue()
+            service = FastTwoCaptcha.create_service('key', request_queue)
+            service.api_url = url
+            proc = service.spawn_process(engine='asyncio')
+
+            manager = ManualManager.create(request_queue)
+            batch_id = manager.send_request('https://test.com', 'key', 'v2', number=3)
+            for _ in range(3):
+                self.assertEqual(manager.get_request(batch_id=batch_id, max_block=10)['answer'], 'token')
+
+            service.stop()
+            proc.join(timeout=10)
+            self.assertEqual(proc.exitcode, 0)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_unknown_engine(self):
+        service = FastTwoCaptcha.create_service('key', generate_queue())
+        with self.assertRaises(AssertionError):
+            service.spawn_process(engine='gevent')
+
+
+if __name__ == '__main__':
+    unittest.main()
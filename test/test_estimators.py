@@ -0,0 +1,66 @@
+import random
+import unittest
+from recaptcha_manager.api.estimators import EWMA, SlidingWindow, P2Quantile
+
+
+class TestEstimators(unittest.TestCase):
+    def test_ewma(self):
+        estimator = EWMA(half_life=10)
+        self.assertEqual(estimator.mean, 0)
+
+        for t in range(10):
+            estimator.add(4, now=t)
+        self.assertAlmostEqual(estimator.mean, 4)
+        self.assertAlmostEqual(estimator.variance, 0)
+
+        # A sample weighing as much as all the older ones together moves the mean halfway
+        estimator.add(2, weight=estimator._weight, now=9)
+        self.assertAlmostEqual(estimator.mean, 3)
+        self.assertAlmostEqual(estimator.std, 1)
+
+        # The older samples weigh half as much a half-life later, however many there were. After a long pause, new
+        # samples take over quickly
+        estimator.add(10, weight=estimator._weight / 2, now=19)
+        self.assertAlmostEqual(estimator.mean, 6.5)
+        estimator.add(10, now=300)
+        self.assertGreater(estimator.mean, 9.99)
+
+    def test_weights(self):
+        estimator = EWMA(half_life=10)
+        estimator.add(6, now=0)
+        estimator.add(0, weight=2, now=0)
+        self.assertAlmostEqual(estimator.mean, 2)
+        self.assertEqual(estimator.count, 3)
+
+    def test_sliding_window(self):
+        estimator = SlidingWindow(size=3)
+        for value in (100, 1, 2, 3):
+            estimator.add(value)
+        self.assertEqual(estimator.mean, 2)
+        self.assertAlmostEqual(estimator.variance, 2 / 3)
+
+        estimator.add(8, weight=3)
+        self.assertAlmostEqual(estimator.mean, 5.8)
+        self.assertEqual(estimator.count, 7)
+
+    def test_p2_quantile(self):
+        quantile = P2Quantile(0.95)
+        self.assertEqual(quantile.value, 0)
+        for value in (5, 1, 3):
+            quantile.add(value)
+        self.assertEqual(quantile.value, 5)
+
+        # Heavy-tailed samples, such as solve times
+        rng = random.Random(1)
+        samples = [rng.lognormvariate(3, 0.6) for _ in range(5000)]
+        quantile = P2Quantile(0.95)
+        for value in samples:
+            quantile.add(value)
+
+        expected = sorted(samples)[int(0.95 * len(samples))]
+        self.assertLess(abs(quantile.value - expected) / expected, 0.02)
+        self.assertEqual(quantile.count, 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
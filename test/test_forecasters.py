@@ -0,0 +1,51 @@
+import unittest
+from recaptcha_manager.api.forecasters import TimeOfDayProfile, HoltWinters
+
+
+class TestForecasters(unittest.TestCase):
+    def test_time_of_day_profile(self):
+        profile = TimeOfDayProfile(bucket=10, period=100, alpha=0.5)
+        self.assertIsNone(profile.forecast(0, 10, now=0))
+
+        # 20 captchas are used in the 6th bucket of every period, and 2 in the others
+        for period in range(3):
+            for bucket in range(10):
+                profile.observe(20 if bucket == 5 else 2, now=period * 100 + bucket * 10)
+        profile.observe(0, now=300)
+
+        self.assertAlmostEqual(profile.forecast(300, 350, now=300), 10)
+        self.assertAlmostEqual(profile.forecast(350, 360, now=300), 20)
+        self.assertAlmostEqual(profile.forecast(345, 355, now=300), 11)
+
+        # Recent periods weigh more, and buckets in which nothing was used count as well
+        profile.observe(0, now=400)
+        self.assertAlmostEqual(profile.forecast(450, 460, now=400), 10)
+
+    def test_unseen_buckets(self):
+        # Times of the period not seen yet are predicted from the average of the others
+        profile = TimeOfDayProfile(bucket=10, period=100)
+        profile.observe(4, now=0)
+        profile.observe(8, now=10)
+        profile.observe(0, now=20)
+        self.assertAlmostEqual(profile.forecast(50, 60, now=20), 6)
+
+    def test_holt_winters(self):
+        forecaster = HoltWinters(bucket=1, season=4, alpha=0.5, beta=0.2, gamma=0.5)
+
+        # The average is predicted until a season was seen
+        forecaster.observe(2, now=0)
+        forecaster.observe(4, now=1)
+        self.assertAlmostEqual(forecaster.forecast(2, 3, now=2), 3)
+
+        # A seasonal pattern on top of a rising trend
+        for t in range(2, 200):
+            forecaster.observe(t * 0.1 + (10 if t % 4 == 0 else 0), now=t)
+        forecaster.observe(0, now=200)
+
+        self.assertAlmostEqual(forecaster.forecast(200, 201, now=200), 30, delta=1)
+        self.assertAlmostEqual(forecaster.forecast(201, 202, now=200), 20.1, delta=1)
+        self.assertAlmostEqual(forecaster.forecast(204, 205, now=200), 30.4, delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import queue
+import time
+from recaptcha_manager.api.inventory import Inventory
+
+
+def captcha(age, answer='answer'):
+    return {'answer': answer, 'error': None, 'timeSolved': time.time() - age}
+
+
+class TestInventory(unittest.TestCase):
+    def test_order(self):
+        inventory = Inventory(ttl=120)
+        inventory.put(captcha(10, 'newer'))
+        inventory.put(captcha(50, 'older'))
+        error = {'error': ValueError(), 'timeRequested': time.time()}
+        inventory.put(error)
+        self.assertEqual(inventory.qsize(), 3)
+
+        # Errors are handed out first, then the captchas which expire soonest
+        self.assertIs(inventory.peek(), error)
+        self.assertIs(inventory.get(block=False), error)
+        self.assertEqual(inventory.get(block=False)['answer'], 'older')
+        self.assertEqual(inventory.get(block=False)['answer'], 'newer')
+        with self.assertRaises(queue.Empty):
+            inventory.get(block=False)
+        self.assertIsNone(inventory.peek())
+
+    def test_expiry(self):
+        inventory = Inventory(ttl=1)
+        inventory.put(captcha(0.5, 'first'))
+        inventory.put(captcha(0, 'second'))
+        inventory.put(captcha(5, 'expired'))
+        self.assertEqual(inventory.qsize(), 2)
+        self.assertEqual([c['answer'] for c in inventory.evict()], ['expired'])
+        self.assertEqual(inventory.evict(), [])
+
+        # Captchas which expire are skipped, and can still be collected afterwards
+        time.sleep(0.6)
+        self.assertEqual(inventory.get(block=False)['answer'], 'second')
+        self.assertEqual([c['answer'] for c in inventory.evict()], ['first'])
+        self.assertTrue(inventory.empty())
+
+    def test_blocking_get(self):
+        inventory = Inventory()
+        with self.assertRaises(queue.Empty):
+            inventory.get(timeout=0.2)
+        inventory.put('')
+        self.assertEqual(inventory.get(timeout=0.2), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
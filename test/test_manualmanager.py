@@ -1,8 +1,10 @@
+import asyncio
 import queue
 import time
+import threading
 import unittest
 from recaptcha_manager.api import multiprocessing
-from recaptcha_manager.api.manager import ManualManager
+from recaptcha_manager.api.manager import ManualManager, ManagerServer
 from recaptcha_manager.api.services import DummyService
 from recaptcha_manager.api import generate_queue
 from recaptcha_manager.api.exceptions import InvalidBatchID, BadDomainError, TimeOutError, EmptyError, Exhausted
@@ -15,6 +17,12 @@ def worker_get(manager, id):
     manager.get_request(batch_id=id, max_block=10)
 
 
+class SlowManager(ManualManager):
+    def poll_request(self, state, batch_id, force_return=True):
+        time.sleep(0.5)
+        return super().poll_request(state, batch_id, force_return)
+
+
 class TestManualManager(unittest.TestCase):
     def test_create(self):
         request_queue = ''
@@ -79,6 +87,97 @@ class TestManualManager(unittest.TestCase):
         service.stop()
         proc.join()
 
+    def test_get_requests(self):
+        request_queue = generate_queue()
+        manager = ManualManager.create(request_queue)
+        service = DummyService.create_service('xxx', request_queue)
+        proc = service.spawn_process(workers=2)
+
+        with self.assertRaises(InvalidBatchID):
+            manager.get_requests('invalid_id', 2)
+
+        id = manager.send_request('https://test.com', 'xxx', 'v2', number=5)
+        self.assertEqual(len(manager.get_requests(id, 3, max_block=20)), 3)
+        self.assertEqual(manager.get_used(), 3)
+
+        # Fewer are returned if no more are being solved
+        self.assertEqual(len(manager.get_requests(id, 5, max_block=20)), 2)
+        with self.assertRaises(EmptyError):
+            manager.get_requests(id, 2)
+
+        # Or if time runs out
+        manager.send_request('https://test.com', 'xxx', 'v2', number=1)
+        self.assertEqual(len(manager.get_requests(id, 2, max_block=15, force_return=False)), 1)
+        with self.assertRaises(TimeOutError):
+            manager.get_requests(id, 2, max_block=1, force_return=False)
+
+        service.stop()
+        proc.join()
+
+    def test_try_get_request(self):
+        request_queue = generate_queue(in_process=True)
+        manager = ManualManager.create(request_queue)
+        service = DummyService.create_service('xxx', request_queue)
+
+        with self.assertRaises(InvalidBatchID):
+            manager.try_get_request('invalid_id')
+
+        id = manager.send_request('https://test.com', 'xxx', 'v2')
+        self.assertIsNone(manager.try_get_request(id))
+
+        service.spawn_process()
+        while manager.available(id) != 1:
+            time.sleep(0.5)
+        self.assertEqual(manager.try_get_request(id)['answer'], 'answer')
+        self.assertIsNone(manager.try_get_request(id))
+        self.assertEqual(manager.get_used(), 1)
+
+        manager.stop()
+        with self.assertRaises(Exhausted):
+            manager.try_get_request(id)
+        service.stop()
+
+    def test_expiry(self):
+        request_queue = generate_queue(in_process=True)
+        manager = ManualManager.create(request_queue, ttl={'v2': 1})
+        service = DummyService.create_service('xxx', request_queue)
+        service.spawn_process(workers=2)
+
+        id = manager.send_request('https://test.com', 'xxx', 'v2', number=2)
+        while manager.available(id) != 2:
+            time.sleep(0.1)
+
+        # Expired captchas are no longer counted, or waited for
+        time.sleep(1)
+        self.assertEqual(manager.available(id), 0)
+        self.assertEqual(manager.being_solved(id), 0)
+        self.assertEqual(manager.get_expired(), 2)
+        with self.assertRaises(EmptyError):
+            manager.get_request(id)
+        service.stop()
+
+    def test_reserve(self):
+        request_queue = generate_queue(in_process=True)
+        manager = ManualManager.create(request_queue)
+        for solve_time in range(20, 40):
+            manager._solve_times.add(solve_time)
+
+        # Requests are sent once there is just enough time left for all of them to be solved
+        id = manager.reserve('https://test.com', 'xxx', 'v2', 2, ready_at=time.time() + 40)
+        self.assertEqual(manager.ReqsInQueue, 0)
+        self.assertEqual(manager.being_solved(id), 2)
+        time.sleep(1.5)
+        self.assertEqual(manager.ReqsInQueue, 2)
+        self.assertEqual(request_queue.get(block=False)[2], 2)
+
+        # Reservations given up because the manager was stopped are no longer waited for
+        manager.reserve('https://test.com', 'xxx', 'v2', 3, ready_at=time.time() + 41)
+        manager.stop()
+        self.assertEqual(manager.being_solved(id), 5)
+        time.sleep(2.5)
+        self.assertEqual(manager.being_solved(id), 2)
+        self.assertEqual(manager.ReqsInQueue, 2)
+
     def test_stop(self):
         request_queue = generate_queue()
         manager = ManualManager.create(request_queue)
@@ -119,6 +218,121 @@ class TestManualManager(unittest.TestCase):
         service.stop()
         proc.join()
 
+    def test_wakeup(self):
+        request_queue = generate_queue()
+        manager = ManualManager.create(request_queue)
+        batch_id = manager.send_request('https://test.com', 'key', 'v2', number=2)
+
+        # Both requests were sent in a single message
+        request = request_queue.get()
+        self.assertEqual(request[2], 2)
+        job = manager.get_job(request[1])
+
+        # Waiters wake up as soon as an answer for their batch_id is delivered
+        manager.request_created()
+        threading.Timer(1, manager.deliver, args=({'answer': 'token', 'error': None, 'batch_id': batch_id}, 1)).start()
+        start = time.time()
+        self.assertEqual(manager.get_request(batch_id=batch_id, max_block=20)['answer'], 'token')
+        self.assertLess(time.time() - start, 1.5)
+
+        # Or once there is nothing left to wait for
+        threading.Timer(1, manager.request_cancelled, args=(job, False)).start()
+        start = time.time()
+        with self.assertRaises(EmptyError):
+            manager.get_request(batch_id=batch_id, max_block=20)
+        self.assertLess(time.time() - start, 1.5)
+
+    def test_server(self):
+        server = ManagerServer.create()
+        try:
+            request_queue = generate_queue(server)
+            children = len(multiprocessing.active_children())
+
+            # Hosted managers do not start any processes of their own
+            managers = [ManualManager.create(request_queue, server=server) for _ in range(5)]
+            self.assertEqual(len(multiprocessing.active_children()), children)
+
+            service = DummyService.create_service('key', request_queue)
+            proc = service.spawn_process()
+            batch_ids = [manager.send_request('https://test.com', 'key', 'v2', number=2) for manager in managers]
+            for manager, batch_id in zip(managers, batch_ids):
+                for _ in range(2):
+                    manager.get_request(batch_id=batch_id, max_block=20)
+                self.assertEqual(manager.being_solved() + manager.available(), 0)
+
+            service.stop()
+            proc.join()
+        finally:
+            server.shutdown()
+
+    def test_in_process(self):
+        request_queue = generate_queue(in_process=True)
+        manager = ManualManager.create(request_queue)
+        self.assertIsInstance(manager, ManualManager)
+
+        # The service runs in threads, so no processes are started at all
+        children = len(multiprocessing.active_children())
+        service = DummyService.create_service('key', request_queue)
+        group = service.spawn_process(workers=2)
+        self.assertEqual(len(multiprocessing.active_children()), children)
+
+        batch_id = manager.send_request('https://test.com', 'key', 'v2', number=4)
+        for _ in range(4):
+            self.assertEqual(manager.get_request(batch_id=batch_id, max_block=20)['answer'], 'answer')
+        self.assertEqual(manager.being_solved() + manager.available(), 0)
+
+        service.stop()
+        group.join(timeout=10)
+        self.assertEqual(group.exitcode, 0)
+
+    def test_async(self):
+        request_queue = generate_queue(in_process=True)
+        manager = ManualManager.create(request_queue)
+        service = DummyService.create_service('key', request_queue)
+        service.spawn_process(workers=2)
+
+        async def consume():
+            batch_id = await manager.asend_request('https://test.com', 'key', 'v2', number=10)
+            other_id = await manager.asend_request('https://other.com', 'key', 'v2', number=2)
+
+            # Coroutines only receive captchas of the batch_id they wait for
+            answers = await asyncio.gather(*[manager.aget_request(batch_id, max_block=20) for _ in range(10)],
+                                           *[manager.aget_request(other_id, max_block=20) for _ in range(2)])
+            self.assertEqual([c['batch_id'] for c in answers], [batch_id] * 10 + [other_id] * 2)
+
+            with self.assertRaises(EmptyError):
+                await manager.aget_request(batch_id)
+            with self.assertRaises(InvalidBatchID):
+                await manager.aget_request('xxx')
+
+            manager.send_request('https://test.com', 'key', 'v2', number=3)
+            return [c async for c in manager.aiter_requests(batch_id, max_block=20)]
+
+        self.assertEqual(len(asyncio.run(consume())), 3)
+        service.stop()
+
+    def test_async_timeout(self):
+        request_queue = generate_queue(in_process=True)
+        manager = SlowManager.create(request_queue)
+        service = DummyService.create_service('key', request_queue)
+        service.spawn_process()
+
+        id = manager.send_request('https://test.com', 'key', 'v2')
+        while manager.available(id) != 1:
+            time.sleep(0.1)
+
+        # A captcha taken for a coroutine which timed out in the meantime is given back to the manager
+        async def consume():
+            with self.assertRaises(TimeOutError):
+                await manager.aget_request(id, max_block=0.2)
+            await asyncio.sleep(1)
+
+        asyncio.run(consume())
+        self.assertEqual(manager.available(id), 1)
+        self.assertEqual(manager.get_used(), 0)
+        self.assertEqual(manager.get_request(id)['answer'], 'answer')
+        service.stop()
+
     def test_clear_requests(self):
         request_queue = generate_queue()
         service = DummyService.create_service('', request_queue, error='LowBidError')
@@ -0,0 +1,95 @@
+import unittest
+from recaptcha_manager.api import ServiceRouter, ManualManager, generate_queue
+from recaptcha_manager.api.services import DummyService
+
+
+class CheapService(DummyService):
+    POLL_INTERVAL = 0.5
+    cost = 0.001
+
+
+class ExpensiveService(DummyService):
+    POLL_INTERVAL = 0.5
+    cost = 0.003
+
+
+class TestServiceRouter(unittest.TestCase):
+    def test_choose(self):
+        cheap = CheapService.create_service('', generate_queue())
+        expensive = ExpensiveService.create_service('', generate_queue())
+        router = ServiceRouter.create(generate_queue(), [expensive, cheap], max_in_flight=2)
+        self.assertIs(router.choose(), cheap)
+
+        # Services whose circuit is open are skipped
+        cheap.use_circuit_breaker(failure_threshold=1)
+        cheap._breaker.record_failure()
+        self.assertIs(router.choose(), expensive)
+        cheap._breaker = None
+
+        # A slow service loses to a quicker one even if it is cheaper
+        cheap._stats.set(p50=30)
+        self.assertIs(router.choose(), expensive)
+
+        # As does one where tasks keep failing
+        cheap._stats.set(p50=0)
+        cheap._stats.add(solved=1, errors=3, cost=0.001)
+        self.assertIs(router.choose(), expensive)
+
+        # Services which are full or stopped are skipped
+        expensive._stats.add(in_flight=2)
+        self.assertIs(router.choose(), cheap)
+        cheap.stop()
+        self.assertIsNone(router.choose())
+
+    def test_create(self):
+        request_queue = generate_queue()
+        service = CheapService.create_service('', request_queue)
+        ServiceRouter.create(request_queue, [service])
+        self.assertIsNot(service.request_queue, request_queue)
+
+        service.stop()
+        with self.assertRaises(RuntimeError):
+            ServiceRouter.create(request_queue, [service])
+
+    def test_route(self):
+        request_queue = generate_queue()
+        cheap = CheapService.create_service('', request_queue)
+        expensive = ExpensiveService.create_service('', request_queue)
+        router = ServiceRouter.create(request_queue, [expensive, cheap], max_in_flight=5)
+        group = router.spawn_process()
+
+        try:
+            manager = ManualManager.create(request_queue)
+            batch_id = manager.send_request('http://test.com', '', 'v2', number=20)
+            for _ in range(20):
+                manager.get_request(batch_id=batch_id, max_block=20)
+
+            # The cheaper service is preferred, but the other one takes what it has no room for
+            self.assertGreater(cheap.get_stats()['solved'], 0)
+            self.assertEqual(cheap.get_stats()['solved'] + expensive.get_stats()['solved'], 20)
+        finally:
+            router.stop()
+            group.join(timeout=10)
+        self.assertEqual(group.exitcode, 0)
+
+    def test_route_in_process(self):
+        request_queue = generate_queue(in_process=True)
+        cheap = CheapService.create_service('', request_queue)
+        expensive = ExpensiveService.create_service('', request_queue)
+        router = ServiceRouter.create(request_queue, [expensive, cheap], max_in_flight=5)
+        group = router.spawn_process()
+
+        try:
+            manager = ManualManager.create(request_queue)
+            batch_id = manager.send_request('http://test.com', '', 'v2', number=10)
+            for _ in range(10):
+                manager.get_request(batch_id=batch_id, max_block=20)
+            self.assertEqual(cheap.get_stats()['solved'] + expensive.get_stats()['solved'], 10)
+        finally:
+            router.stop()
+            group.join(timeout=10)
+        self.assertEqual(group.exitcode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from recaptcha_manager.api.manager import CaptchaJob
+from recaptcha_manager.api.scheduler import PollScheduler, SolveTimeModel
+
+
+def make_task(start, captcha_type='v2'):
+    return {'startTime': start, 'job': CaptchaJob('https://test.com', '', captcha_type, None, None, False)}
+
+
+class TestSolveTimeModel(unittest.TestCase):
+    def test_default_interval(self):
+        model = SolveTimeModel(default_interval=6)
+        self.assertEqual(model.first_delay(), 6)
+        self.assertEqual(model.next_delay(age=6, last_delay=6), 6)
+
+    def test_learned_delays(self):
+        model = SolveTimeModel()
+        for solve_time in range(20, 40):
+            model.add(solve_time)
+
+        # The first poll waits until the quickest tasks are likely done
+        self.assertEqual(model.first_delay(), 24)
+
+        # Polls are frequent while most tasks finish, then back off for stragglers
+        self.assertEqual(model.next_delay(age=26, last_delay=24), model.FAST_INTERVAL)
+        self.assertEqual(model.next_delay(age=40, last_delay=4), 8)
+        self.assertEqual(model.next_delay(age=80, last_delay=16), model.MAX_INTERVAL)
+
+
+class TestPollScheduler(unittest.TestCase):
+    def test_order(self):
+        scheduler = PollScheduler(default_interval=6)
+        first, second = make_task(0), make_task(1)
+        scheduler.add(second, now=1)
+        scheduler.add(first, now=0)
+
+        self.assertEqual(scheduler.next_due(), 6)
+        self.assertEqual(scheduler.pop_due(now=5), [])
+        self.assertEqual(scheduler.pop_due(now=6), [first])
+        self.assertEqual(scheduler.pop_due(now=7), [second])
+        self.assertIsNone(scheduler.next_due())
+
+        scheduler.reschedule(first, now=7)
+        self.assertEqual(scheduler.next_due(), 13)
+
+    def test_discard(self):
+        scheduler = PollScheduler(default_interval=6)
+        task = make_task(0)
+        scheduler.add(task, now=0)
+        scheduler.discard(task)
+
+        self.assertEqual(len(scheduler), 0)
+        self.assertIsNone(scheduler.next_due())
+        self.assertEqual(scheduler.pop_due(now=10), [])
+
+    def test_solved(self):
+        scheduler = PollScheduler(default_interval=6)
+        for i in range(10):
+            task = make_task(0, 'v3')
+            scheduler.add(task, now=0)
+            scheduler.solved(task, time_solved=10 + i, now=30)
+
+        # Only v3 tasks were observed, so v2 tasks keep the default interval
+        self.assertEqual(scheduler.model('v3').first_delay(), 12)
+        self.assertEqual(scheduler.model('v2').first_delay(), 6)
+
+        # Reported solve times are kept between the registration of the task and the time it was found solved
+        task = make_task(100, 'v2')
+        scheduler.add(task, now=100)
+        scheduler.solved(task, time_solved=0, now=105)
+        self.assertEqual(scheduler.model('v2').samples[-1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
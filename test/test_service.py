@@ -1,8 +1,13 @@
 import unittest
 import time
-from recaptcha_manager.api import AntiCaptcha, generate_queue, AutoManager, multiprocessing
+import threading
+from concurrent.futures import Future
+from recaptcha_manager.api import AntiCaptcha, TwoCaptcha, generate_queue, AutoManager, ManualManager, multiprocessing
 from recaptcha_manager.api.exceptions import BadDomainError, BadSiteKeyError, BadAPIKeyError, NoBalanceError, LowBidError, Errors
-from recaptcha_manager.api.services import DummyService
+from recaptcha_manager.api.exceptions import UnexpectedResponse, ServiceUnavailableError
+from recaptcha_manager.api.services import DummyService, DummyFuture
+from recaptcha_manager.api.tasks import Task
+from recaptcha_manager.api.exceptions import TimeOutError
 
 
 def check_error(child_conn, service):
@@ -23,6 +28,54 @@ class AntiCaptchaBadURL(AntiCaptcha):
     api_url = 'urlWithMissingSchema'
 
 
+class FastDummyService(DummyService):
+    POLL_INTERVAL = 0.5
+
+
+class SlowRegisterService(FastDummyService):
+    """Takes 8 seconds to register tasks for http://slow.com"""
+
+    def _api_register_request(self, request):
+        response = super()._api_register_request(request)
+        if request['job'].url != 'http://slow.com':
+            return response
+
+        future = Future()
+        threading.Timer(8, future.set_result, args=(response,)).start()
+        return future
+
+
+class ExpensiveDummyService(FastDummyService):
+    cost = 0.01
+
+
+class NeverSolveService(FastDummyService):
+    """Registers tasks but never solves them"""
+
+    def _api_fetch_answer(self, request):
+        return DummyFuture()
+
+
+class FakeResponse:
+    def __init__(self, response_json, status_code=200):
+        self.response_json = response_json
+        self.status_code = status_code
+
+    def json(self):
+        return self.response_json
+
+
+class FakeSession:
+    """Records the urls requested instead of sending them"""
+
+    def __init__(self):
+        self.urls = []
+
+    def post(self, url, **kwargs):
+        self.urls.append(url)
+        return url
+
+
 class MyClass:
     @staticmethod
     def exc_handler():
@@ -169,6 +222,218 @@ class TestService(unittest.TestCase):
         p.join(timeout=10)
         proc.join(timeout=10)
 
+    def test_wakeup(self):
+        request_queue = generate_queue()
+        service = FastDummyService.create_service('', request_queue)
+        proc = service.spawn_process()
+        manager = ManualManager.create(request_queue)
+
+        # The service should pick up the request as soon as it is sent, rather than on its next cycle
+        time.sleep(1)
+        start = time.time()
+        batch_id = manager.send_request('http://test.com', '', 'v2', number=1)
+        manager.get_request(batch_id=batch_id, max_block=10)
+        self.assertLess(time.time() - start, 2)
+
+        service.stop()
+        proc.join(timeout=10)
+        self.assertIsNotNone(proc.exitcode)
+
+    def test_slow_registration(self):
+        request_queue = generate_queue()
+        service = SlowRegisterService.create_service('', request_queue)
+        proc = service.spawn_process()
+        manager = ManualManager.create(request_queue)
+
+        # A slow registration should not hold back the answers for other tasks
+        time.sleep(1)
+        start = time.time()
+        manager.send_request('http://slow.com', '', 'v2', number=1)
+        batch_id = manager.send_request('http://test.com', '', 'v2', number=1)
+        manager.get_request(batch_id=batch_id, max_block=10)
+        self.assertLess(time.time() - start, 4)
+
+        service.stop()
+        proc.join(timeout=15)
+        self.assertIsNotNone(proc.exitcode)
+
+    def test_workers(self):
+        request_queue = generate_queue()
+        service = FastDummyService.create_service('', request_queue)
+        group = service.spawn_process(workers=3)
+        manager = ManualManager.create(request_queue)
+        batch_id = manager.send_request('http://test.com', '', 'v2', number=30)
+        for _ in range(30):
+            manager.get_request(batch_id=batch_id, max_block=10)
+
+        self.assertEqual(len(group.processes), 3)
+        self.assertTrue(service.is_alive())
+        self.assertEqual(manager.get_used(), 30)
+
+        service.stop()
+        self.assertEqual(service.safe_join(group, max_block=10), 0)
+        self.assertFalse(service.is_alive())
+
+    def test_workers_error(self):
+        request_queue = generate_queue()
+        service = DummyService.create_service('', request_queue, error='LowBidError')
+        group = service.spawn_process(workers=2)
+        manager = ManualManager.create(request_queue)
+        manager.send_request('http://test.com', '', 'v2', number=10)
+
+        # An exception in one worker stops all of them, and the requests they held are cleared
+        group.join(timeout=10)
+        self.assertIsNotNone(group.exitcode)
+        self.assertEqual(manager.available() + manager.being_solved(), 0)
+        with self.assertRaises(LowBidError):
+            service.get_exception()
+
+    def test_hedging(self):
+        primary = NeverSolveService.create_service('', generate_queue())
+        backup = FastDummyService.create_service('', generate_queue())
+        primary.hedge_with(backup, percentile=0.5)
+
+        # Pretend the primary service usually solves tasks within a tenth of a second
+        primary._scheduler.model('v2').samples.extend([0.1] * 10)
+        procs = [primary.spawn_process(), backup.spawn_process()]
+
+        try:
+            manager = ManualManager.create(primary.request_queue)
+            batch_id = manager.send_request('http://test.com', '', 'v2', number=2)
+            for _ in range(2):
+                manager.get_request(batch_id=batch_id, max_block=10)
+
+            self.assertEqual(manager.being_solved(batch_id), 0)
+            self.assertEqual(manager.get_used(), 2)
+            self.assertEqual(primary.get_stats()['hedged'], 2)
+            self.assertEqual(backup.get_stats()['hedge_won'], 2)
+        finally:
+            primary.stop()
+            backup.stop()
+            for proc in procs:
+                proc.join(timeout=10)
+
+        # The original tasks were settled by the copies, so stopping the services must not cancel them again
+        self.assertEqual(manager.being_solved(), 0)
+
+    def test_hedging_budget(self):
+        primary = NeverSolveService.create_service('', generate_queue())
+        backup = ExpensiveDummyService.create_service('', generate_queue())
+        primary.hedge_with(backup, percentile=0.5, budget=0.015)
+        primary._scheduler.model('v2').samples.extend([0.1] * 10)
+        procs = [primary.spawn_process(), backup.spawn_process()]
+
+        try:
+            manager = ManualManager.create(primary.request_queue)
+            batch_id = manager.send_request('http://test.com', '', 'v2', number=2)
+            manager.get_request(batch_id=batch_id, max_block=10)
+
+            # The budget only covers one copy
+            with self.assertRaises(TimeOutError):
+                manager.get_request(batch_id=batch_id, max_block=3)
+            self.assertEqual(primary.get_stats()['hedged'], 1)
+        finally:
+            primary.stop()
+            backup.stop()
+            for proc in procs:
+                proc.join(timeout=10)
+
+    def test_circuit_breaker(self):
+        request_queue = generate_queue()
+        failing = FastDummyService.create_service('', request_queue, error='ServiceUnavailableError')
+        healthy = FastDummyService.create_service('', request_queue)
+        failing.use_circuit_breaker(failure_threshold=2, recovery_time=30)
+        procs = [failing.spawn_process()]
+
+        try:
+            manager = ManualManager.create(request_queue)
+            batch_id = manager.send_request('http://test.com', '', 'v2', number=5)
+
+            # The failing service does not terminate, and hands its requests over to the healthy one once its circuit
+            # opens
+            deadline = time.time() + 10
+            while failing.circuit_state() != 'open' and time.time() < deadline:
+                time.sleep(0.1)
+            self.assertEqual(failing.circuit_state(), 'open')
+            self.assertTrue(failing.is_alive())
+
+            procs.append(healthy.spawn_process())
+            for _ in range(5):
+                manager.get_request(batch_id=batch_id, max_block=10)
+            self.assertEqual(healthy.get_stats()['solved'], 5)
+        finally:
+            failing.stop()
+            healthy.stop()
+            for proc in procs:
+                proc.join(timeout=10)
+        self.assertEqual(manager.being_solved(), 0)
+
+    def test_server_error(self):
+        service = TwoCaptcha.create_service('key', generate_queue())
+        hook = service._api_parse_answer({'task_id': 1})
+        with self.assertRaises(ServiceUnavailableError):
+            hook(FakeResponse({}, status_code=503))
+
+    def test_tasks(self):
+        request_queue = generate_queue()
+        manager = ManualManager.create(request_queue)
+        manager.send_request('http://test.com', '', 'v2', number=3)
+
+        # Requests only carry references to the manager and the job
+        request = request_queue.get()
+        tasks = Task.unpack(request)
+        self.assertEqual(len(tasks), 3)
+        self.assertEqual(tasks[0]['job'].url, 'http://test.com')
+        self.assertEqual(tasks[0]['manager'].being_solved(), 3)
+        self.assertIs(tasks[0]['job'], tasks[1]['job'])
+
+        self.assertEqual(Task.split(request), (request[:2] + (1, None), request[:2] + (2, None)))
+        self.assertEqual(tasks[0].pack(hedge=5), request[:2] + (1, 5))
+
+        # Tasks can be used like the dictionaries they replace
+        task = tasks[0]
+        self.assertNotIn('hedge', task)
+        self.assertIsNone(task.get('hedge'))
+        task['hedge'] = 5
+        self.assertIn('hedge', task)
+        self.assertEqual(task['hedge'], 5)
+        with self.assertRaises(KeyError):
+            task['task_id']
+
+    def test_batch_fetch(self):
+        service = TwoCaptcha.create_service('key', generate_queue())
+        service.session = FakeSession()
+        tasks = [{'task_id': i} for i in range(250)]
+
+        futures = service._api_fetch_answers(tasks)
+        self.assertEqual([len(batch) for batch, _ in futures], [100, 100, 50])
+        self.assertIn('ids=0,1,2', service.session.urls[0])
+        self.assertIn('ids=200,', service.session.urls[2])
+
+        # A single task is fetched on its own
+        futures = service._api_fetch_answers(tasks[:1])
+        self.assertEqual(futures[0][0], tasks[:1])
+        self.assertIn('&id=0&', service.session.urls[-1])
+
+    def test_batch_parse(self):
+        service = TwoCaptcha.create_service('key', generate_queue())
+        tasks = [{'task_id': i} for i in range(3)]
+        hook = service._api_parse_answers(tasks)
+
+        response = hook(FakeResponse({'status': 1, 'request': 'CAPCHA_NOT_READY|token|ERROR_CAPTCHA_UNSOLVABLE'}))
+        self.assertFalse(hasattr(response.batch[0], 'remove_request'))
+        self.assertIs(response.batch[1].request, tasks[1])
+        self.assertEqual(response.batch[1].answer, 'token')
+        self.assertTrue(response.batch[1].remove_request)
+        self.assertIs(response.batch[2].request, tasks[2])
+        self.assertFalse(response.batch[2].remove_request)
+
+        with self.assertRaises(BadAPIKeyError):
+            hook(FakeResponse({'status': 0, 'request': 'ERROR_WRONG_USER_KEY'}))
+
+        with self.assertRaises(UnexpectedResponse):
+            hook(FakeResponse({'status': 1, 'request': 'token|token'}))
+
 
 if __name__ == '__main__':
     unittest.main()